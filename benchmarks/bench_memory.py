@@ -0,0 +1,161 @@
+"""
+Пам'ять на розсилку: записи планувальника до і після компактного SpamJob,
+а також розмір БД з текстами в spam_tasks і в окремій таблиці messages.
+
+    python benchmarks/bench_memory.py [--tasks 100000] [--texts 50]
+
+Розсилки — як у великого акаунта: --texts різних текстів-нагадувань на всі
+розсилки, кілька типових розкладів, сотні чатів. Обидві схеми читають ті самі
+рядки з БД і ставлять розсилки в Scheduler, як _rehydrate; рядки після цього
+звільняються. Кожна схема — в окремому процесі, щоб спільні кеші не змішувались.
+
+  before — окремий Schedule і власна копія тексту на кожну розсилку, поля
+           надолуження в кожному записі (як було до спільних записів);
+  after  — SpamJob.from_row: спільні Schedule і тексти, CatchUp лише за потреби.
+
+Метрики: B/task — приріст Python-купи (tracemalloc) на розсилку;
+DB B/task — розмір файлу БД після VACUUM на розсилку.
+"""
+import argparse
+import asyncio
+import gc
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+from schedule import Schedule  # noqa: E402
+from scheduler import Scheduler  # noqa: E402
+
+ACCOUNT = 'bench'
+
+
+class _LegacyJob:
+    """Запис розсилки до компактного SpamJob."""
+    __slots__ = ('tid', 'cid', 'msg', 'total', 'sent', 'schedule', 'original', 'media', 'cname',
+                 'backlog', 'gap', 'resume_at')
+
+    def __init__(self, tid, cid, msg, total, sent, schedule, original=None, media=None) -> None:
+        self.tid = tid
+        self.cid = cid
+        self.msg = msg
+        self.total = total
+        self.sent = sent
+        self.schedule = schedule
+        self.original = original
+        self.media = media
+        self.cname = None
+        self.backlog = 0
+        self.gap = 0
+        self.resume_at = 0
+
+    @classmethod
+    def from_row(cls, r) -> '_LegacyJob':
+        weekdays = [int(d) for d in r['weekdays'].split(',')] if r['weekdays'] else None
+        return cls(r['task_id'], r['chat_id'], r['message'], r['total_count'], r['sent_count'],
+                   Schedule(r['delay'], r['scheduled_time'], weekdays), media=r['media_id'])
+
+
+def _rows(n: int, texts: int, seed: int = 1) -> list[tuple]:
+    rng = random.Random(seed)
+    bodies = [f"Нагадування №{i}: не забудьте оплатити рахунок до кінця тижня, "
+              f"деталі — в закріпленому повідомленні." for i in range(texts)]
+    schedules = ((3600, None, None), (86400, 540, None), (86400, 870, '0,2,4'), (600, None, None))
+    now = int(time.time())
+    rows = []
+    for i in range(1, n + 1):
+        delay, tod, weekdays = rng.choice(schedules)
+        rows.append((str(i), -1000 - rng.randrange(500), rng.choice(bodies), delay, 1000,
+                     rng.randrange(100), now, weekdays, tod, now + rng.randrange(86400)))
+    return rows
+
+
+def _build(n: int, texts: int) -> None:
+    """БД поточної схеми з n активними розсилками."""
+    database.init_db(ACCOUNT)
+    conn = sqlite3.connect(database.get_db_path(ACCOUNT))
+    rows = _rows(n, texts)
+    conn.executemany("INSERT OR IGNORE INTO messages (hash, body) VALUES (?, ?)",
+                     [(database.message_hash(r[2]), r[2]) for r in rows])
+    conn.executemany(
+        "INSERT INTO spam_tasks (task_id, chat_id, msg_hash, delay, total_count, sent_count, start_time, "
+        "weekdays, scheduled_time, next_fire_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [(r[0], r[1], database.message_hash(r[2]), *r[3:]) for r in rows])
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+
+
+def _db_sizes(n: int, texts: int) -> tuple[float, float]:
+    """Розмір БД на розсилку: текст у кожному рядку spam_tasks проти таблиці messages."""
+    path = os.path.join('data', 'legacy.db')
+    conn = sqlite3.connect(path)
+    conn.execute(database._SPAM_TASKS_SQL)
+    conn.execute("ALTER TABLE spam_tasks ADD COLUMN next_fire_at INTEGER")
+    conn.executemany(
+        "INSERT INTO spam_tasks (task_id, chat_id, message, delay, total_count, sent_count, start_time, "
+        "weekdays, scheduled_time, next_fire_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", _rows(n, texts))
+    database._migrate_2(conn)
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    return os.path.getsize(path) / n, os.path.getsize(database.get_db_path(ACCOUNT)) / n
+
+
+async def _measure(mode: str) -> float:
+    import main
+    job_cls = main.SpamJob if mode == 'after' else _LegacyJob
+    db = database.DB(ACCOUNT)
+    scheduler = Scheduler(None)
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    rows = db.get_all_spam_tasks('active')
+    for r in rows:
+        job = job_cls.from_row(r)
+        scheduler.add(job.tid, r['next_fire_at'], job)
+    n = len(rows)
+    del rows, r, job
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    db.close()
+    return used / n
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--tasks', type=int, default=100_000)
+    ap.add_argument('--texts', type=int, default=50, help='скільки різних текстів на всі розсилки')
+    ap.add_argument('--child', choices=('before', 'after'))
+    args = ap.parse_args()
+
+    if args.child:
+        print(asyncio.run(_measure(args.child)))
+        return
+
+    os.chdir(tempfile.mkdtemp(prefix='bench_memory_'))
+    _build(args.tasks, args.texts)
+    per_task = {}
+    for mode in ('before', 'after'):
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', mode,
+                              '--tasks', str(args.tasks)], capture_output=True, text=True, check=True)
+        per_task[mode] = float(out.stdout.strip().splitlines()[-1])
+    db_before, db_after = _db_sizes(args.tasks, args.texts)
+
+    print(f"{'':>8}{'B/task':>10}{'DB B/task':>12}")
+    print(f"{'before':>8}{per_task['before']:>10.0f}{db_before:>12.0f}")
+    print(f"{'after':>8}{per_task['after']:>10.0f}{db_after:>12.0f}")
+    print(f"\n{args.tasks} розсилок, {args.texts} текстів: пам'ять −{1 - per_task['after'] / per_task['before']:.0%},"
+          f" БД −{1 - db_after / db_before:.0%}")
+
+
+if __name__ == '__main__':
+    main()
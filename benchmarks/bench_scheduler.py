@@ -0,0 +1,121 @@
+"""
+Порівняння планувальника на купі (scheduler.Scheduler) зі старою схемою
+"одна asyncio.Task зі sleep на кожну розсилку".
+
+    python benchmarks/bench_scheduler.py [--sizes 10000,100000] [--window 2]
+
+Кожен сценарій запускається в окремому процесі, щоб RSS не змішувався.
+Вимірюється:
+  - sched CPU  — процесорний час на постановку N розсилок у розклад;
+  - mem        — приріст Python-купи (tracemalloc) після постановки;
+  - fire CPU   — процесорний час, поки всі N спрацьовують у вікні --window секунд;
+  - peak RSS   — пікова резидентна пам'ять процесу.
+"""
+import argparse
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import Scheduler  # noqa: E402
+
+
+async def _bench_tasks(n: int, window: float) -> tuple[float, int, float]:
+    """Стара схема: окрема задача зі своїм sleep на кожну розсилку."""
+    fired = 0
+    done = asyncio.Event()
+
+    async def spam(when: float) -> None:
+        nonlocal fired
+        await asyncio.sleep(max(0.0, when - time.time()))
+        fired += 1
+        if fired == n:
+            done.set()
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    cpu0 = time.process_time()
+    start = time.time() + 1
+    tasks = [asyncio.create_task(spam(start + window * i / n)) for i in range(n)]
+    await asyncio.sleep(0)
+    sched_cpu = time.process_time() - cpu0
+    mem = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+
+    cpu0 = time.process_time()
+    await done.wait()
+    fire_cpu = time.process_time() - cpu0
+    await asyncio.gather(*tasks)
+    return sched_cpu, mem, fire_cpu
+
+
+async def _bench_heap(n: int, window: float) -> tuple[float, int, float]:
+    """Нова схема: одна купа дедлайнів на акаунт."""
+    fired = 0
+    done = asyncio.Event()
+
+    async def handler(key: str, payload) -> None:
+        nonlocal fired
+        fired += 1
+        if fired == n:
+            done.set()
+        return None
+
+    sched = Scheduler(handler, workers=4)
+    sched.start()
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    cpu0 = time.process_time()
+    start = time.time() + 1
+    for i in range(n):
+        sched.add(str(i), start + window * i / n, None)
+    await asyncio.sleep(0)
+    sched_cpu = time.process_time() - cpu0
+    mem = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+
+    cpu0 = time.process_time()
+    await done.wait()
+    fire_cpu = time.process_time() - cpu0
+    sched.stop()
+    return sched_cpu, mem, fire_cpu
+
+
+def _child(design: str, n: int, window: float) -> None:
+    fn = _bench_tasks if design == 'tasks' else _bench_heap
+    sched_cpu, mem, fire_cpu = asyncio.run(fn(n, window))
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{design} {n} {sched_cpu:.3f} {mem} {fire_cpu:.3f} {rss_kb}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--sizes', default='10000,100000')
+    ap.add_argument('--window', type=float, default=2.0)
+    ap.add_argument('--child', nargs=2, metavar=('DESIGN', 'N'))
+    args = ap.parse_args()
+
+    if args.child:
+        _child(args.child[0], int(args.child[1]), args.window)
+        return
+
+    print(f"{'design':<8}{'N':>8}{'sched CPU':>12}{'mem':>12}{'fire CPU':>12}{'peak RSS':>12}")
+    for n in (int(x) for x in args.sizes.split(',')):
+        for design in ('tasks', 'heap'):
+            out = subprocess.run(
+                [sys.executable, __file__, '--child', design, str(n), '--window', str(args.window)],
+                capture_output=True, text=True, check=True,
+            ).stdout.split()
+            _, _, sched_cpu, mem, fire_cpu, rss = out
+            print(f"{design:<8}{n:>8}{float(sched_cpu):>11.3f}s{int(mem) / 2**20:>10.1f}MB"
+                  f"{float(fire_cpu):>11.3f}s{int(rss) / 1024:>10.1f}MB")
+
+
+if __name__ == '__main__':
+    main()
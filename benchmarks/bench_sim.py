@@ -0,0 +1,159 @@
+"""
+Бенчмарк акаунта у віртуальному часі (benchmarks/sim.py).
+
+    python benchmarks/bench_sim.py [--sizes 1000,10000,100000] [--hours 1] [--rate 1000] [--workers 4]
+
+Для кожного N в окремому процесі: реальний Account з реальною SQLite-БД
+у тимчасовій теці, FakeClient замість Telegram. Розсилки з інтервалами
+від 1 хв до 1 год стартують рівномірно і працюють --hours віртуальних годин.
+
+Метрики:
+  sched/s  — розсилок поставлено в розклад за секунду реального часу (БД + купа);
+  sends/s  — відправлень за секунду реального часу симуляції;
+  drift    — запізнення відправлення відносно запланованого (p50/p99/max, віртуальні с);
+  db/send  — операцій БД на одне відправлення;
+  RSS      — пікова резидентна пам'ять процесу.
+
+Стеля пропускної здатності — приблизно workers / latency відправлень за секунду;
+якщо потрібний темп вищий, drift росте — так видно, скільки воркерів потрібно.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sim import FakeClient, VirtualClock, run_virtual  # noqa: E402
+
+
+def _pct(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def _scenario(n: int, hours: float, rate: float, latency: float, flood_every: int,
+                    workers: int) -> dict:
+    import main
+    from schedule import Schedule
+
+    main.SEND_WORKERS = workers
+
+    client = FakeClient(latency=latency, flood_every=flood_every, record=False)
+    acc = main.Account('sim', 0, '', '', client=client, flush_ms=1000, flush_every=50)
+    acc.governor.rate = rate
+    acc.governor.burst = max(1, int(rate))
+
+    planned: dict[str, float] = {}
+    drift: list[float] = []
+
+    def observer(key: str, when: float, now: float) -> None:
+        planned[key] = when
+
+    real_send = client.send_message
+
+    async def send_message(peer, text):
+        msg = await real_send(peer, text)
+        pid = getattr(peer, 'user_id', None)
+        if pid is not None and str(pid) in planned:
+            drift.append(time.time() - planned[str(pid)])
+        return msg
+
+    client.send_message = send_message
+    acc.scheduler.observer = observer
+
+    await acc.start()
+
+    rng = random.Random(n)
+    now = time.time()
+    t0 = time.perf_counter()
+    for _ in range(n):
+        tid = await acc.db.make_task_id()
+        delay = rng.randint(60, 3600)
+        await acc.db.add_spam_task(tid, int(tid), 'ping', delay, 10_000, int(now))
+        job = main.SpamJob(tid, int(tid), 'ping', 10_000, 0, Schedule(delay))
+        acc.scheduler.add(tid, now + rng.random() * delay, job)
+    sched_rate = n / (time.perf_counter() - t0)
+
+    ops0 = acc.db.stats()['ops']
+    t0 = time.perf_counter()
+    await asyncio.sleep(hours * 3600)
+    real = time.perf_counter() - t0
+    ops = acc.db.stats()['ops'] - ops0
+    sends = len(drift)
+    # Під віртуальним годинником стрибків бути не може: інакше якийсь модуль узяв справжній час
+    jumps = acc.metrics.total('userbot_clock_jumps_total')
+    await acc.stop()
+    await acc.db.close()
+
+    return {
+        'sched_rate': sched_rate,
+        'send_rate': sends / real if real else 0.0,
+        'sends': sends,
+        'drift_p50': _pct(drift, 0.5),
+        'drift_p99': _pct(drift, 0.99),
+        'drift_max': max(drift, default=0.0),
+        'db_per_send': ops / sends if sends else 0.0,
+        'floods': client.floods,
+        'jumps': int(jumps),
+    }
+
+
+def _child(n: int, args) -> None:
+    # Консольні логи акаунта не потрібні — лише рядок результату
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        os.chdir(tmp)
+        r = run_virtual(lambda: _scenario(n, args.hours, args.rate, args.latency, args.flood_every,
+                                          args.workers), VirtualClock())
+        # Логи акаунта пише окремий потік: дописуємо їх, поки stdout перенаправлений
+        import event_log
+        event_log.close_writer()
+    r['rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(' '.join(f"{k}={v}" for k, v in r.items()))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--sizes', default='1000,10000,100000')
+    ap.add_argument('--hours', type=float, default=1.0)
+    ap.add_argument('--rate', type=float, default=1000.0, help='SEND_RATE акаунта в симуляції')
+    ap.add_argument('--latency', type=float, default=0.05, help='затримка API, віртуальні с')
+    ap.add_argument('--workers', type=int, default=4, help='SEND_WORKERS акаунта в симуляції')
+    ap.add_argument('--flood-every', type=int, default=0, help='кожен N-й виклик API — FloodWait')
+    ap.add_argument('--child', type=int)
+    args = ap.parse_args()
+
+    if args.child:
+        _child(args.child, args)
+        return
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    print(f"{'N':>7}{'sched/s':>10}{'sends':>9}{'sends/s':>10}{'drift p50':>11}{'p99':>8}"
+          f"{'max':>8}{'db/send':>9}{'RSS':>9}{'jumps':>7}")
+    for n in (int(x) for x in args.sizes.split(',')):
+        cmd = [sys.executable, os.path.abspath(__file__), '--child', str(n),
+               '--hours', str(args.hours), '--rate', str(args.rate),
+               '--latency', str(args.latency), '--flood-every', str(args.flood_every),
+               '--workers', str(args.workers)]
+        env = dict(os.environ, PYTHONPATH=root)
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True, env=env).stdout
+        r = dict(kv.split('=', 1) for kv in out.split())
+        print(f"{n:>7}{float(r['sched_rate']):>10.0f}{int(r['sends']):>9}{float(r['send_rate']):>10.0f}"
+              f"{float(r['drift_p50']):>10.2f}s{float(r['drift_p99']):>7.2f}s{float(r['drift_max']):>7.2f}s"
+              f"{float(r['db_per_send']):>9.2f}{float(r['rss_mb']):>7.0f}MB{int(r['jumps']):>7}")
+        if int(r['jumps']):
+            print(f"[WARN] {n}: планувальник бачив стрибки годинника — час симуляції не підмінено, цифри недійсні",
+                  file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
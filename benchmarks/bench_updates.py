@@ -0,0 +1,181 @@
+"""
+Вартість вхідних оновлень: звичайний TelegramClient проти OutgoingOnlyClient.
+
+    python benchmarks/bench_updates.py [--updates 100000] [--chats 50] [--users 5000] [--outgoing 0.005]
+    python benchmarks/bench_updates.py --save stream.bin     # записати згенерований потік
+    python benchmarks/bench_updates.py --stream stream.bin   # відтворити записаний потік
+
+Потік — послідовність серіалізованих (TL) контейнерів Updates, як їх
+отримує клієнт: повідомлення в завантажених групах від різних людей,
+«друкує», статуси в мережі, прочитання, редагування і зрідка — вихідні
+повідомлення самого акаунта. Файл: для кожного контейнера 4 байти довжини
+(little-endian) і його байти.
+
+Обидва клієнти без з'єднання, з тими самими обробниками, що й Account
+(CommandRouter і EntityCache). Для кожного контейнера виконується те, що
+Telethon робить після MessageBox: _preprocess_updates і задача
+_dispatch_update на кожне оновлення.
+
+Метрики:
+  parse     — CPU на розбір TL (однаковий для обох, для порівняння);
+  dispatch  — CPU на _preprocess_updates + _dispatch_update;
+  tasks     — скільки задач _dispatch_update створено;
+  entities  — сутностей у кеші клієнта (потрапляють у сесію);
+  dropped   — відкинуто оновлень.
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telethon import TelegramClient  # noqa: E402
+from telethon.extensions import BinaryReader  # noqa: E402
+from telethon.sessions import MemorySession  # noqa: E402
+from telethon.tl import types  # noqa: E402
+
+from entity_cache import EntityCache  # noqa: E402
+from router import CommandRouter  # noqa: E402
+from update_filter import OutgoingOnlyClient  # noqa: E402
+
+SELF_ID = 1
+
+
+def generate(n: int, chats: int, users: int, outgoing: float, seed: int = 1) -> list[bytes]:
+    rng = random.Random(seed)
+    date = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    channels = [types.Channel(1000 + i, f"group {i}", types.ChatPhotoEmpty(), date,
+                              megagroup=True, access_hash=rng.getrandbits(63)) for i in range(chats)]
+    people = [types.User(10_000 + i, access_hash=rng.getrandbits(63), first_name=f"user {i}",
+                         username=f"user{i}") for i in range(users)]
+    pts = {c.id: 1 for c in channels}
+    msg_id = {c.id: 1 for c in channels}
+    stream = []
+    for _ in range(n):
+        ch = rng.choice(channels)
+        user = rng.choice(people)
+        peer = types.PeerChannel(ch.id)
+        kind = rng.random()
+        if kind < outgoing:
+            msg_id[ch.id] += 1
+            pts[ch.id] += 1
+            text = rng.choice(('!status', '!help', 'ok'))
+            update = types.UpdateNewChannelMessage(
+                types.Message(msg_id[ch.id], peer, date, out=True, message=text,
+                              from_id=types.PeerUser(SELF_ID)), pts[ch.id], 1)
+            users_of = []
+        elif kind < 0.55:
+            msg_id[ch.id] += 1
+            pts[ch.id] += 1
+            text = ' '.join(rng.choice(('привіт', 'ок', 'дякую', 'так', 'ні', 'хто', 'коли', '👍'))
+                            for _ in range(rng.randint(1, 12)))
+            update = types.UpdateNewChannelMessage(
+                types.Message(msg_id[ch.id], peer, date, message=text,
+                              from_id=types.PeerUser(user.id)), pts[ch.id], 1)
+            users_of = [user]
+        elif kind < 0.75:
+            update = types.UpdateChannelUserTyping(ch.id, types.PeerUser(user.id),
+                                                   types.SendMessageTypingAction())
+            users_of = [user]
+        elif kind < 0.88:
+            update = types.UpdateUserStatus(user.id, types.UserStatusOnline(date))
+            users_of = [user]
+        elif kind < 0.95:
+            pts[ch.id] += 1
+            update = types.UpdateReadChannelInbox(ch.id, msg_id[ch.id], 0, pts[ch.id])
+            users_of = []
+        else:
+            pts[ch.id] += 1
+            update = types.UpdateEditChannelMessage(
+                types.Message(msg_id[ch.id], peer, date, message='виправлено',
+                              from_id=types.PeerUser(user.id), edit_date=date), pts[ch.id], 1)
+            users_of = [user]
+        stream.append(bytes(types.Updates([update], users_of, [ch], date, 0)))
+    return stream
+
+
+def save(path: str, stream: list[bytes]) -> None:
+    with open(path, 'wb') as f:
+        for blob in stream:
+            f.write(struct.pack('<I', len(blob)))
+            f.write(blob)
+
+
+def load(path: str) -> list[bytes]:
+    stream = []
+    with open(path, 'rb') as f:
+        while head := f.read(4):
+            stream.append(f.read(struct.unpack('<I', head)[0]))
+    return stream
+
+
+async def replay(cls, stream: list[bytes]) -> dict:
+    client = cls(MemorySession(), 1, 'bench')
+    client._mb_entity_cache.set_self_user(SELF_ID, False, 1)
+    CommandRouter('!').register(client)
+    EntityCache(client).register()
+
+    parse = dispatch = 0.0
+    tasks = 0
+    for blob in stream:
+        t0 = time.process_time()
+        container = BinaryReader(blob).tgread_object()
+        t1 = time.process_time()
+        pending = [asyncio.ensure_future(client._dispatch_update(u))
+                   for u in client._preprocess_updates(container.updates, container.users, container.chats)]
+        if pending:
+            await asyncio.gather(*pending)
+        dispatch += time.process_time() - t1
+        parse += t1 - t0
+        tasks += len(pending)
+    return {
+        'parse': parse,
+        'dispatch': dispatch,
+        'tasks': tasks,
+        'entities': len(client._mb_entity_cache.hash_map),
+        'dropped': getattr(client, 'updates_dropped', 0),
+    }
+
+
+async def run(stream: list[bytes]) -> None:
+    print(f"{'client':>12}{'updates':>9}{'parse':>9}{'dispatch':>10}{'µs/upd':>8}{'tasks':>8}"
+          f"{'entities':>10}{'dropped':>9}")
+    results = {}
+    for name, cls in (('Telethon', TelegramClient), ('outgoing', OutgoingOnlyClient)):
+        r = results[name] = await replay(cls, stream)
+        print(f"{name:>12}{len(stream):>9}{r['parse']:>8.2f}s{r['dispatch']:>9.2f}s"
+              f"{r['dispatch'] / len(stream) * 1e6:>8.1f}{r['tasks']:>8}{r['entities']:>10}{r['dropped']:>9}")
+    base, new = results['Telethon'], results['outgoing']
+    if base['dispatch']:
+        print(f"\nCPU на диспетчеризацію: −{1 - new['dispatch'] / base['dispatch']:.0%}"
+              f" ({base['dispatch'] - new['dispatch']:.2f}с на {len(stream)} оновлень)")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--updates', type=int, default=100_000)
+    ap.add_argument('--chats', type=int, default=50)
+    ap.add_argument('--users', type=int, default=5000)
+    ap.add_argument('--outgoing', type=float, default=0.005, help='частка вихідних повідомлень')
+    ap.add_argument('--stream', help='відтворити записаний потік замість генерації')
+    ap.add_argument('--save', help='записати згенерований потік у файл і вийти')
+    args = ap.parse_args()
+
+    if args.stream:
+        stream = load(args.stream)
+    else:
+        stream = generate(args.updates, args.chats, args.users, args.outgoing)
+    if args.save:
+        save(args.save, stream)
+        print(f"Записано {len(stream)} контейнерів у {args.save}")
+        return
+    asyncio.run(run(stream))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""
+Симуляція акаунта без Telegram і без реального очікування.
+
+VirtualClock + VirtualTimeLoop: коли event loop'у нічого робити, він не спить,
+а одразу переводить віртуальний годинник до найближчого таймера. time.time()
+і time.monotonic() на час симуляції підмінюються віртуальними, тож Scheduler,
+SendGovernor, LogQueue і Schedule працюють без змін.
+
+FakeClient записує send/edit/delete, додає налаштовувану затримку API
+і вміє кидати FloodWaitError.
+"""
+import asyncio
+import contextlib
+import os
+import selectors
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telethon import errors  # noqa: E402
+from telethon.tl import types  # noqa: E402
+
+import database  # noqa: E402
+
+
+class VirtualClock:
+    def __init__(self, start: float | None = None) -> None:
+        self.start = start if start is not None else time.time()
+        self.offset = 0.0
+
+    def time(self) -> float:
+        return self.start + self.offset
+
+    def monotonic(self) -> float:
+        return 1_000_000.0 + self.offset
+
+    def advance(self, seconds: float) -> None:
+        if seconds > 0:
+            self.offset += seconds
+
+
+def _db_busy() -> bool:
+    return any(w.inflight for w in list(database._workers.values()))
+
+
+class _VirtualSelector:
+    """Обгортка селектора: замість сну переводить віртуальний час уперед."""
+
+    def __init__(self, real: selectors.BaseSelector, clock: VirtualClock) -> None:
+        self._real = real
+        self._clock = clock
+
+    def select(self, timeout=None):
+        events = self._real.select(0)
+        if events:
+            return events
+        # Потік БД ще працює — чекаємо його по-справжньому, час не рухаємо
+        if _db_busy():
+            return self._real.select(0.05 if timeout is None else min(timeout, 0.05))
+        if timeout is None:
+            return self._real.select(0.01)
+        self._clock.advance(timeout)
+        return []
+
+    def __getattr__(self, name):
+        return getattr(self._real, name)
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    def __init__(self, clock: VirtualClock) -> None:
+        self.clock = clock
+        super().__init__(selector=_VirtualSelector(selectors.DefaultSelector(), clock))
+
+    def time(self) -> float:
+        return self.clock.monotonic()
+
+
+@contextlib.contextmanager
+def patched_time(clock: VirtualClock):
+    real_time, real_monotonic = time.time, time.monotonic
+    time.time, time.monotonic = clock.time, clock.monotonic
+    try:
+        yield
+    finally:
+        time.time, time.monotonic = real_time, real_monotonic
+
+
+def run_virtual(coro_fn, clock: VirtualClock | None = None):
+    """Виконує coro_fn() у віртуальному часі."""
+    clock = clock or VirtualClock()
+    loop = VirtualTimeLoop(clock)
+    try:
+        with patched_time(clock):
+            return loop.run_until_complete(coro_fn())
+    finally:
+        loop.close()
+
+
+# --- Фейковий клієнт ---
+
+class FakeMessage:
+    def __init__(self, client: 'FakeClient', peer, text: str) -> None:
+        self._client = client
+        self.peer = peer
+        self.text = text
+
+    async def edit(self, text: str) -> None:
+        await self._client._call('edit', self.peer, text)
+
+    async def delete(self) -> None:
+        await self._client._call('delete', self.peer, self.text)
+
+
+class FakeClient:
+    """
+    Замінник TelegramClient для Account.
+    calls — список (дія, віртуальний час, peer id, текст).
+    flood_every=N — кожен N-й виклик кидає FloodWaitError(flood_seconds).
+    """
+
+    def __init__(self, latency: float = 0.05, flood_every: int = 0, flood_seconds: int = 10,
+                 record: bool = True) -> None:
+        self.latency = latency
+        self.flood_every = flood_every
+        self.flood_seconds = flood_seconds
+        self.record = record
+        self.flood_sleep_threshold = 0
+        self.calls: list[tuple[str, float, int | str, str]] = []
+        self.counts: dict[str, int] = {}
+        self.floods = 0
+        self.handlers = []
+        self._n = 0
+        self._disconnected = asyncio.Event()
+
+    async def _call(self, kind: str, peer, text: str) -> None:
+        self._n += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.flood_every and self._n % self.flood_every == 0:
+            self.floods += 1
+            raise errors.FloodWaitError(request=None, capture=self.flood_seconds)
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        if self.record:
+            self.calls.append((kind, time.time(), _peer_id(peer), text))
+
+    # --- API, яке використовує Account ---
+
+    def on(self, event):
+        def decorator(fn):
+            self.handlers.append((event, fn))
+            return fn
+        return decorator
+
+    async def connect(self) -> None:
+        pass
+
+    async def is_user_authorized(self) -> bool:
+        return True
+
+    async def start(self, phone=None) -> None:
+        pass
+
+    async def get_me(self):
+        return types.User(id=1, is_self=True, first_name='sim', username='sim')
+
+    async def iter_dialogs(self, limit=None):
+        return
+        yield
+
+    async def get_entity(self, cid: int):
+        return types.User(id=cid, access_hash=cid, first_name=f"chat {cid}")
+
+    async def send_message(self, peer, text: str) -> FakeMessage:
+        await self._call('send', peer, text)
+        return FakeMessage(self, peer, text)
+
+    async def disconnect(self) -> None:
+        self._disconnected.set()
+
+    async def run_until_disconnected(self) -> None:
+        await self._disconnected.wait()
+
+
+def _peer_id(peer) -> int | str:
+    if isinstance(peer, types.InputPeerUser):
+        return peer.user_id
+    return peer if isinstance(peer, (int, str)) else repr(peer)
@@ -0,0 +1,221 @@
+# control_api.py
+import asyncio
+import hmac
+import itertools
+import json
+import os
+from urllib.parse import parse_qs, urlsplit
+
+_REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 401: 'Unauthorized',
+            404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+            500: 'Internal Server Error'}
+# Скільки рядків NDJSON збирається в один chunk потокової відповіді
+_STREAM_CHUNK = 500
+_MAX_BODY = 1 << 20
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class ControlAPI:
+    """
+    Локальне керування розсилками без Telegram: HTTP/1.1 на 127.0.0.1 або Unix-сокеті
+    в тому ж процесі, що й акаунти. Списки беруться зі стану в пам'яті (планувальник,
+    кеш чатів), тому не витрачають ліміти API акаунта.
+
+        GET  /accounts
+        GET  /accounts/<акаунт>/tasks?status=active|paused|all&after=<id>&limit=<n>
+        GET  /accounts/<акаунт>/tasks?stream=1       — усі розсилки, NDJSON частинами
+        GET  /accounts/<акаунт>/tasks/<id>
+        POST /accounts/<акаунт>/tasks                — JSON, див. Account.create_from_spec
+        POST /accounts/<акаунт>/tasks/<id>/pause|resume|stop
+
+    Якщо задано token, кожен запит має нести заголовок Authorization: Bearer <token>.
+    """
+
+    def __init__(self, accounts: dict, host: str = '127.0.0.1', port: int = 0,
+                 socket_path: str | None = None, token: str | None = None) -> None:
+        self.accounts = accounts
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.token = token
+        self._server: asyncio.AbstractServer | None = None
+        self.requests = 0
+
+    async def start(self) -> str:
+        if self.socket_path:
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            self._server = await asyncio.start_unix_server(self._serve, path=self.socket_path)
+            os.chmod(self.socket_path, 0o600)
+            return self.socket_path
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            if self.socket_path and os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    # --- HTTP ---
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            try:
+                method, path, headers, body = await self._read_request(reader)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+            except (ApiError, ValueError) as e:
+                await self._json(writer, getattr(e, 'status', 400), {'error': str(e)})
+                return
+            self.requests += 1
+            try:
+                if self.token and not hmac.compare_digest(
+                        headers.get('authorization', ''), f"Bearer {self.token}"):
+                    raise ApiError(401, 'потрібен токен')
+                await self._route(writer, method, path, body)
+            except ApiError as e:
+                await self._json(writer, e.status, {'error': str(e)})
+            except ValueError as e:
+                await self._json(writer, 400, {'error': str(e)})
+            except Exception as e:
+                # Помилка сервера, а не запиту
+                await self._json(writer, 500, {'error': f"{type(e).__name__}: {e}"})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader):
+        head = await reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        method, target, _ = lines[0].split(' ', 2)
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                k, v = line.split(':', 1)
+                headers[k.strip().lower()] = v.strip()
+        length = int(headers.get('content-length', '0'))
+        if length > _MAX_BODY or length < 0:
+            raise ApiError(413, 'тіло запиту завелике')
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target, headers, body
+
+    @staticmethod
+    async def _json(writer: asyncio.StreamWriter, status: int, obj) -> None:
+        data = json.dumps(obj, ensure_ascii=False).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data)
+        await writer.drain()
+
+    @staticmethod
+    async def _stream(writer: asyncio.StreamWriter, records) -> None:
+        """
+        NDJSON з chunked-кодуванням: записи серіалізуються частинами, а не однією відповіддю.
+        Якщо після заголовків 200 стається помилка, останнім рядком іде {"error": ...},
+        а завершальний chunk не надсилається — клієнт бачить обірваний потік.
+        """
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson; charset=utf-8\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+        try:
+            while batch := list(itertools.islice(records, _STREAM_CHUNK)):
+                data = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in batch).encode()
+                writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                await writer.drain()
+        except ConnectionError:
+            raise
+        except Exception as e:
+            data = (json.dumps({'error': f"{type(e).__name__}: {e}"}, ensure_ascii=False) + '\n').encode()
+            writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+            await writer.drain()
+            return
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    # --- Маршрути ---
+
+    def _account(self, name: str):
+        account = self.accounts.get(name)
+        if account is None:
+            raise ApiError(404, f"акаунт {name} не знайдено")
+        return account
+
+    async def _route(self, writer, method: str, target: str, body: bytes) -> None:
+        url = urlsplit(target)
+        parts = [p for p in url.path.split('/') if p]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        if parts == ['accounts']:
+            if method != 'GET':
+                raise ApiError(405, 'лише GET')
+            await self._json(writer, 200, {'accounts': [a.summary() for a in self.accounts.values()]})
+            return
+        if len(parts) < 3 or parts[0] != 'accounts' or parts[2] != 'tasks':
+            raise ApiError(404, 'невідомий шлях')
+        account = self._account(parts[1])
+
+        if len(parts) == 3:
+            if method == 'GET':
+                await self._list(writer, account, query)
+            elif method == 'POST':
+                spec = json.loads(body or b'{}')
+                if not isinstance(spec, dict):
+                    raise ApiError(400, 'очікується JSON-об\'єкт')
+                tid = await account.create_from_spec(spec)
+                await self._json(writer, 201, await account.task_record(tid))
+            else:
+                raise ApiError(405, 'лише GET або POST')
+            return
+
+        tid = parts[3]
+        if len(parts) == 4 and method == 'GET':
+            record = await account.task_record(tid)
+            if record is None:
+                raise ApiError(404, f"[{tid}] не знайдено")
+            await self._json(writer, 200, record)
+            return
+        if len(parts) != 5 or method != 'POST':
+            raise ApiError(405 if len(parts) == 4 else 404, 'невідомий запит')
+
+        action = parts[4]
+        if action == 'pause':
+            ok = await account.pause_task(tid)
+        elif action == 'stop':
+            ok = await account.stop_task(tid)
+        elif action == 'resume':
+            result = await account.resume_task(tid)
+            if result == 'finished':
+                await self._json(writer, 200, {'id': tid, 'status': 'finished'})
+                return
+            ok = result == 'resumed'
+        else:
+            raise ApiError(404, f"невідома дія {action}")
+        if not ok:
+            raise ApiError(404, f"[{tid}] не знайдено" + (" або не призупинена" if action == 'resume' else ""))
+        await self._json(writer, 200, await account.task_record(tid) or {'id': tid, 'status': 'stopped'})
+
+    async def _list(self, writer, account, query: dict) -> None:
+        status = query.get('status', 'all')
+        if status not in ('active', 'paused', 'all'):
+            raise ApiError(400, 'status: active | paused | all')
+        after = query.get('after', '')
+        records = await account.task_records(status, after)
+        if query.get('stream') == '1':
+            await self._stream(writer, records)
+            return
+        limit = max(1, min(int(query.get('limit', '100')), 1000))
+        page = list(itertools.islice(records, limit + 1))
+        more = len(page) > limit
+        page = page[:limit]
+        await self._json(writer, 200, {'tasks': page, 'next': page[-1]['id'] if more else None})
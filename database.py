@@ -1,82 +1,289 @@
 # database.py
+import asyncio
+import concurrent.futures
+import hashlib
+import heapq
+import json
+import queue
 import sqlite3
 import os
+import threading
+import time
 
 
 def get_db_path(account_id: str) -> str:
     return os.path.join('data', account_id, 'userbot.db')
 
 
+_SPAM_TASKS_SQL = """
+    CREATE TABLE spam_tasks (
+        task_id TEXT PRIMARY KEY,
+        chat_id INTEGER NOT NULL,
+        message TEXT NOT NULL,
+        delay INTEGER NOT NULL,
+        total_count INTEGER NOT NULL,
+        sent_count INTEGER NOT NULL DEFAULT 0,
+        start_time INTEGER NOT NULL,
+        status TEXT NOT NULL DEFAULT 'active',
+        last_sent_time INTEGER NOT NULL DEFAULT 0,
+        weekdays TEXT,
+        scheduled_time INTEGER,
+        cron TEXT
+    )
+"""
+
+# Значення для колонок, яких могло не бути у старих схемах spam_tasks
+_LEGACY_DEFAULTS = {
+    'sent_count': "0",
+    'start_time': "CAST(strftime('%s','now') AS INTEGER)",
+    'status': "'active'",
+    'last_sent_time': "0",
+    'weekdays': "NULL",
+    'scheduled_time': "NULL",
+    'cron': "NULL",
+}
+
+
+def message_hash(body: str) -> bytes:
+    """Ключ тексту розсилки в таблиці messages."""
+    return hashlib.blake2b(body.encode(), digest_size=16).digest()
+
+
+def _columns(c: sqlite3.Connection, table: str) -> list[str]:
+    return [r[1] for r in c.execute(f"PRAGMA table_info({table})")]
+
+
+def _migrate_1(c: sqlite3.Connection) -> None:
+    """Базова схема; приймає таблиці, створені до появи user_version."""
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS config (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS entities (
+            peer_id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            entity_id INTEGER NOT NULL,
+            access_hash INTEGER,
+            name TEXT NOT NULL,
+            updated_at INTEGER NOT NULL
+        )
+    """)
+
+    cols = _columns(c, 'spam_tasks')
+    if not cols:
+        c.execute(_SPAM_TASKS_SQL)
+    elif 'task_id' not in cols:
+        # Найстаріша схема без task_id: стара таблиця лишається як spam_tasks_legacy,
+        # рядки переносяться в нову з id (або rowid) як task_id
+        c.execute("ALTER TABLE spam_tasks RENAME TO spam_tasks_legacy")
+        c.execute(_SPAM_TASKS_SQL)
+        if {'chat_id', 'message', 'delay', 'total_count'} <= set(cols):
+            target = _columns(c, 'spam_tasks')
+            src = ["CAST(" + ('id' if 'id' in cols else 'rowid') + " AS TEXT)"]
+            for col in target[1:]:
+                src.append(col if col in cols else _LEGACY_DEFAULTS[col])
+            c.execute(
+                f"INSERT OR IGNORE INTO spam_tasks ({', '.join(target)}) "
+                f"SELECT {', '.join(src)} FROM spam_tasks_legacy"
+            )
+    else:
+        if 'status' not in cols:
+            c.execute("ALTER TABLE spam_tasks ADD COLUMN status TEXT NOT NULL DEFAULT 'active'")
+        if 'last_sent_time' not in cols:
+            c.execute("ALTER TABLE spam_tasks ADD COLUMN last_sent_time INTEGER NOT NULL DEFAULT 0")
+        if 'weekdays' not in cols:
+            c.execute("ALTER TABLE spam_tasks ADD COLUMN weekdays TEXT")
+        if 'scheduled_time' not in cols:
+            c.execute("ALTER TABLE spam_tasks ADD COLUMN scheduled_time INTEGER")
+        if 'cron' not in cols:
+            c.execute("ALTER TABLE spam_tasks ADD COLUMN cron TEXT")
+
+
+def _migrate_2(c: sqlite3.Connection) -> None:
+    """Індекси під вибірки за статусом і за чатом."""
+    c.execute("CREATE INDEX IF NOT EXISTS idx_spam_tasks_status ON spam_tasks(status)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_spam_tasks_chat ON spam_tasks(chat_id)")
+
+
+def _migrate_3(c: sqlite3.Connection) -> None:
+    """Збережений час наступного відправлення."""
+    c.execute("ALTER TABLE spam_tasks ADD COLUMN next_fire_at INTEGER")
+
+
+def _migrate_4(c: sqlite3.Connection) -> None:
+    """Політика надолуження пропущених відправлень (NULL — типова для акаунта)."""
+    c.execute("ALTER TABLE spam_tasks ADD COLUMN catchup TEXT")
+
+
+def _migrate_5(c: sqlite3.Connection) -> None:
+    """Медіа розсилок: збережене посилання на файл у Telegram і локальна копія."""
+    c.execute("""
+        CREATE TABLE media (
+            media_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            file_id INTEGER NOT NULL,
+            access_hash INTEGER NOT NULL,
+            file_reference BLOB NOT NULL,
+            size INTEGER NOT NULL DEFAULT 0,
+            path TEXT,
+            src_chat INTEGER,
+            src_msg INTEGER,
+            UNIQUE (kind, file_id)
+        )
+    """)
+    c.execute("ALTER TABLE spam_tasks ADD COLUMN media_id INTEGER")
+
+
+def _migrate_6(c: sqlite3.Connection) -> None:
+    """Знімок сесії Telethon (SESSION_BACKEND=db)."""
+    c.execute("""
+        CREATE TABLE session (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            data BLOB NOT NULL,
+            updated_at INTEGER NOT NULL
+        )
+    """)
+
+
+def _migrate_7(c: sqlite3.Connection) -> None:
+    """
+    Тексти розсилок — в окрему таблицю messages за хешем вмісту:
+    однаковий текст у багатьох розсилках зберігається один раз.
+    """
+    c.create_function('message_hash', 1, message_hash, deterministic=True)
+    c.execute("""
+        CREATE TABLE messages (
+            hash BLOB PRIMARY KEY,
+            body TEXT NOT NULL
+        ) WITHOUT ROWID
+    """)
+    c.execute("INSERT OR IGNORE INTO messages (hash, body) SELECT message_hash(message), message FROM spam_tasks")
+    c.execute("""
+        CREATE TABLE spam_tasks_new (
+            task_id TEXT PRIMARY KEY,
+            chat_id INTEGER NOT NULL,
+            msg_hash BLOB NOT NULL REFERENCES messages(hash),
+            delay INTEGER NOT NULL,
+            total_count INTEGER NOT NULL,
+            sent_count INTEGER NOT NULL DEFAULT 0,
+            start_time INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'active',
+            last_sent_time INTEGER NOT NULL DEFAULT 0,
+            weekdays TEXT,
+            scheduled_time INTEGER,
+            cron TEXT,
+            next_fire_at INTEGER,
+            catchup TEXT,
+            media_id INTEGER
+        )
+    """)
+    cols = [col for col in _columns(c, 'spam_tasks_new') if col != 'msg_hash']
+    c.execute(
+        f"INSERT INTO spam_tasks_new (msg_hash, {', '.join(cols)}) "
+        f"SELECT message_hash(message), {', '.join(cols)} FROM spam_tasks"
+    )
+    c.execute("DROP TABLE spam_tasks")
+    c.execute("ALTER TABLE spam_tasks_new RENAME TO spam_tasks")
+    _migrate_2(c)
+    c.execute("CREATE INDEX idx_spam_tasks_msg ON spam_tasks(msg_hash)")
+
+
+# Міграції виконуються по порядку; номер схеми = кількість застосованих.
+# Нові зміни схеми — тільки новою функцією в кінці списку.
+MIGRATIONS = [_migrate_1, _migrate_2, _migrate_3, _migrate_4, _migrate_5, _migrate_6, _migrate_7]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
 def init_db(account_id: str) -> None:
     db_path = get_db_path(account_id)
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
 
-    with sqlite3.connect(db_path) as conn:
-        c = conn.cursor()
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS config (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL
-            )
-        """)
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS spam_tasks (
-                task_id TEXT PRIMARY KEY,
-                chat_id INTEGER NOT NULL,
-                message TEXT NOT NULL,
-                delay INTEGER NOT NULL,
-                total_count INTEGER NOT NULL,
-                sent_count INTEGER NOT NULL DEFAULT 0,
-                start_time INTEGER NOT NULL,
-                status TEXT NOT NULL DEFAULT 'active',
-                last_sent_time INTEGER NOT NULL DEFAULT 0,
-                weekdays TEXT,
-                scheduled_time INTEGER
-            )
-        """)
-        
-        # Міграція старих таблиць
-        c.execute("PRAGMA table_info(spam_tasks)")
-        cols = [r[1] for r in c.fetchall()]
-        
-        if 'task_id' not in cols:
-            c.execute("DROP TABLE spam_tasks")
-            c.execute("""
-                CREATE TABLE spam_tasks (
-                    task_id TEXT PRIMARY KEY,
-                    chat_id INTEGER NOT NULL,
-                    message TEXT NOT NULL,
-                    delay INTEGER NOT NULL,
-                    total_count INTEGER NOT NULL,
-                    sent_count INTEGER NOT NULL DEFAULT 0,
-                    start_time INTEGER NOT NULL,
-                    status TEXT NOT NULL DEFAULT 'active',
-                    last_sent_time INTEGER NOT NULL DEFAULT 0,
-                    weekdays TEXT,
-                    scheduled_time INTEGER
-                )
-            """)
-        else:
-            if 'status' not in cols:
-                c.execute("ALTER TABLE spam_tasks ADD COLUMN status TEXT NOT NULL DEFAULT 'active'")
-            if 'last_sent_time' not in cols:
-                c.execute("ALTER TABLE spam_tasks ADD COLUMN last_sent_time INTEGER NOT NULL DEFAULT 0")
-            if 'weekdays' not in cols:
-                c.execute("ALTER TABLE spam_tasks ADD COLUMN weekdays TEXT")
-            if 'scheduled_time' not in cols:
-                c.execute("ALTER TABLE spam_tasks ADD COLUMN scheduled_time INTEGER")
-        
-        conn.commit()
+    # isolation_level=None — транзакціями керуємо явно
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+
+        # WAL перемикається один раз і зберігається у файлі БД
+        conn.execute("PRAGMA journal_mode=WAL")
+        while version < SCHEMA_VERSION:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Версію перечитуємо під блокуванням: міграцію міг уже виконати інший процес
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                if version < SCHEMA_VERSION:
+                    MIGRATIONS[version](conn)
+                    version += 1
+                    conn.execute(f"PRAGMA user_version = {version}")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+    finally:
+        conn.close()
+
+
+def read_session(account_id: str) -> bytes | None:
+    """Знімок сесії з БД акаунта; читається синхронно до створення клієнта."""
+    path = get_db_path(account_id)
+    if not os.path.exists(path):
+        return None
+    conn = sqlite3.connect(path)
+    try:
+        r = conn.execute("SELECT data FROM session WHERE id = 0").fetchone()
+    except sqlite3.OperationalError:
+        # Схема ще не оновлена — знімка немає
+        return None
+    finally:
+        conn.close()
+    return r[0] if r else None
 
 
 class DB:
-    """Обгортка над БД конкретного акаунта."""
+    """
+    Обгортка над БД конкретного акаунта.
+    Тримає одне довгоживуче з'єднання: sqlite3 кешує підготовлені
+    запити на рівні з'єднання, тож однаковий SQL не компілюється повторно.
 
-    def __init__(self, account_id: str) -> None:
+    Прогрес розсилок (update_sent_count, set_next_fire) пишеться відкладено: оновлення
+    накопичуються в пам'яті і скидаються однією транзакцією кожні
+    flush_ms мілісекунд або після flush_every оновлень.
+    Гарантія: після аварійного завершення процесу повторно можуть піти
+    не більше ніж flush_every - 1 відправлень, і лише ті, що відбулися
+    за останні flush_ms мс (за умови, що flush() викликається таймером).
+    """
+
+    def __init__(self, account_id: str, flush_ms: int = 1000, flush_every: int = 50) -> None:
         self.path = get_db_path(account_id)
+        self.flush_ms = flush_ms
+        self.flush_every = max(1, flush_every)
+        self._db: sqlite3.Connection | None = None
+        # task_id -> (sent_count, last_sent_time, next_fire_at); None — не змінювати
+        self._dirty: dict[str, tuple[int | None, int | None, int | None]] = {}
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        # Вільні id менші за _next_id (мін-купа); будується один раз при першому виділенні
+        self._free_ids: list[int] | None = None
+        self._next_id = 1
+        self._ids_lock = threading.Lock()
 
     def _conn(self) -> sqlite3.Connection:
-        return sqlite3.connect(self.path)
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, cached_statements=256)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        return self._db
+
+    def close(self) -> None:
+        self.flush()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
 
     # --- Конфігурація ---
 
@@ -92,38 +299,82 @@ class DB:
 
     # --- Завдання спаму ---
 
+    # Рядок розсилки разом з текстом (колонка message, як до винесення текстів у messages)
+    _TASKS_SQL = "SELECT t.*, m.body AS message FROM spam_tasks t JOIN messages m ON m.hash = t.msg_hash"
+
+    @staticmethod
+    def _drop_orphans(conn: sqlite3.Connection, hashes) -> None:
+        """Видаляє тексти, на які більше не посилається жодна розсилка."""
+        conn.executemany(
+            "DELETE FROM messages WHERE hash = ? AND NOT EXISTS "
+            "(SELECT 1 FROM spam_tasks WHERE msg_hash = ?)", [(h, h) for h in set(hashes)]
+        )
+
     def add_spam_task(self, task_id: str, chat_id: int, message: str, delay: int, 
                       total_count: int, start_time: int, weekdays: list[int] | None = None,
-                      scheduled_time: int | None = None) -> None:
+                      scheduled_time: int | None = None, cron: str | None = None,
+                      media_id: int | None = None) -> None:
         weekdays_str = ','.join(map(str, weekdays)) if weekdays else None
+        msg_hash = message_hash(message)
         with self._conn() as conn:
+            conn.execute("INSERT OR IGNORE INTO messages (hash, body) VALUES (?, ?)", (msg_hash, message))
             conn.execute("""
                 INSERT INTO spam_tasks
-                    (task_id, chat_id, message, delay, total_count, sent_count, start_time, status, last_sent_time, weekdays, scheduled_time)
-                VALUES (?, ?, ?, ?, ?, 0, ?, 'active', 0, ?, ?)
-            """, (task_id, chat_id, message, delay, total_count, start_time, weekdays_str, scheduled_time))
+                    (task_id, chat_id, msg_hash, delay, total_count, sent_count, start_time, status, last_sent_time, weekdays, scheduled_time, cron, media_id)
+                VALUES (?, ?, ?, ?, ?, 0, ?, 'active', 0, ?, ?, ?, ?)
+            """, (task_id, chat_id, msg_hash, delay, total_count, start_time, weekdays_str, scheduled_time, cron, media_id))
             conn.commit()
 
     def get_spam_task(self, task_id: str):
+        self.flush()
         with self._conn() as conn:
-            conn.row_factory = sqlite3.Row
-            return conn.execute("SELECT * FROM spam_tasks WHERE task_id = ?", (task_id,)).fetchone()
+            return conn.execute(f"{self._TASKS_SQL} WHERE t.task_id = ?", (task_id,)).fetchone()
 
     def get_all_spam_tasks(self, status: str = None):
+        self.flush()
         with self._conn() as conn:
-            conn.row_factory = sqlite3.Row
             if status:
-                return conn.execute("SELECT * FROM spam_tasks WHERE status = ?", (status,)).fetchall()
-            return conn.execute("SELECT * FROM spam_tasks").fetchall()
+                return conn.execute(f"{self._TASKS_SQL} WHERE t.status = ?", (status,)).fetchall()
+            return conn.execute(self._TASKS_SQL).fetchall()
 
-    def update_sent_count(self, task_id: str, sent_count: int) -> None:
-        import time
+    def count_tasks(self, status: str) -> int:
         with self._conn() as conn:
-            conn.execute(
-                "UPDATE spam_tasks SET sent_count = ?, last_sent_time = ? WHERE task_id = ?",
-                (sent_count, int(time.time()), task_id)
+            return conn.execute("SELECT COUNT(*) FROM spam_tasks WHERE status = ?", (status,)).fetchone()[0]
+
+    def update_sent_count(self, task_id: str, sent_count: int, next_fire_at: int | None = None) -> None:
+        """Відкладений запис прогресу. Див. flush()."""
+        self._dirty[task_id] = (sent_count, int(time.time()), next_fire_at)
+        self._pending += 1
+        if (self._pending >= self.flush_every
+                or (time.monotonic() - self._last_flush) * 1000 >= self.flush_ms):
+            self.flush()
+
+    def flush(self) -> None:
+        """Скидає накопичений прогрес однією транзакцією."""
+        self._last_flush = time.monotonic()
+        self._pending = 0
+        if not self._dirty:
+            return
+        rows = [(sent, ts, nxt, tid) for tid, (sent, ts, nxt) in self._dirty.items()]
+        with self._conn() as conn:
+            conn.executemany(
+                "UPDATE spam_tasks SET sent_count = COALESCE(?, sent_count), "
+                "last_sent_time = COALESCE(?, last_sent_time), "
+                "next_fire_at = COALESCE(?, next_fire_at) WHERE task_id = ?", rows
             )
-            conn.commit()
+        # Лише після коміту: якщо транзакція впала (SQLITE_BUSY, диск), прогрес лишається в буфері
+        self._dirty.clear()
+
+    def set_next_fire(self, task_id: str, next_fire_at: int) -> None:
+        """Відкладений запис запланованого часу (разом із прогресом при flush)."""
+        sent, ts, _ = self._dirty.get(task_id, (None, None, None))
+        self._dirty[task_id] = (sent, ts, next_fire_at)
+
+    def set_catchup(self, task_id: str, policy: str | None) -> bool:
+        with self._conn() as conn:
+            return conn.execute(
+                "UPDATE spam_tasks SET catchup = ? WHERE task_id = ?", (policy, task_id)
+            ).rowcount > 0
 
     def set_task_status(self, task_id: str, status: str) -> None:
         with self._conn() as conn:
@@ -131,15 +382,428 @@ class DB:
             conn.commit()
 
     def remove_spam_task(self, task_id: str) -> None:
+        self._dirty.pop(task_id, None)
         with self._conn() as conn:
-            conn.execute("DELETE FROM spam_tasks WHERE task_id = ?", (task_id,))
+            deleted = conn.execute("DELETE FROM spam_tasks WHERE task_id = ? RETURNING msg_hash", (task_id,)).fetchall()
+            self._drop_orphans(conn, [r[0] for r in deleted])
             conn.commit()
+        if deleted:
+            self.release_task_id(task_id)
+
+    # --- Масові операції (кожна — одна транзакція) ---
+
+    def remove_tasks(self, ids: list[str] | None = None, chat_id: int | None = None) -> list[str]:
+        """
+        Видаляє розсилки з ids (None — усі), за потреби лише в чаті chat_id.
+        Повертає id видалених.
+        """
+        where, params = self._task_filter(ids, chat_id)
+        with self._conn() as conn:
+            rows = conn.execute(f"DELETE FROM spam_tasks{where} RETURNING task_id, msg_hash", params).fetchall()
+            self._drop_orphans(conn, [r[1] for r in rows])
+        removed = [r[0] for r in rows]
+        for tid in removed:
+            self._dirty.pop(tid, None)
+            self.release_task_id(tid)
+        return removed
+
+    def set_status_where(self, status_from: str, status_to: str,
+                         chat_id: int | None = None) -> list[str]:
+        """Переводить усі розсилки зі статусу status_from у status_to. Повертає їхні id."""
+        self.flush()
+        where, params = self._task_filter(None, chat_id)
+        where += " AND status = ?" if where else " WHERE status = ?"
+        with self._conn() as conn:
+            return [r[0] for r in conn.execute(
+                f"UPDATE spam_tasks SET status = ?{where} RETURNING task_id", (status_to, *params, status_from)
+            ).fetchall()]
+
+    def fetch_resumable(self, chat_id: int | None = None) -> list:
+        """
+        Відновлює призупинені розсилки: завершені видаляються,
+        решта стає 'active' і повертається рядками.
+        """
+        self.flush()
+        where, params = self._task_filter(None, chat_id)
+        where += " AND status = 'paused'" if where else " WHERE status = 'paused'"
+        with self._conn() as conn:
+            done = conn.execute(
+                f"DELETE FROM spam_tasks{where} AND sent_count >= total_count RETURNING task_id, msg_hash", params
+            ).fetchall()
+            self._drop_orphans(conn, [r[1] for r in done])
+            resumed = [r[0] for r in conn.execute(
+                f"UPDATE spam_tasks SET status = 'active'{where} RETURNING task_id", params
+            ).fetchall()]
+            rows = conn.execute(
+                f"{self._TASKS_SQL} WHERE t.task_id IN (SELECT value FROM json_each(?))", (json.dumps(resumed),)
+            ).fetchall()
+        finished = [r[0] for r in done]
+        for tid in finished:
+            self.release_task_id(tid)
+        return rows
+
+    @staticmethod
+    def _task_filter(ids: list[str] | None, chat_id: int | None) -> tuple[str, tuple]:
+        clauses, params = [], []
+        if ids is not None:
+            clauses.append(f"task_id IN ({','.join('?' * len(ids))})")
+            params.extend(ids)
+        if chat_id is not None:
+            clauses.append("chat_id = ?")
+            params.append(chat_id)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), tuple(params)
+
+    # --- Сесія ---
+
+    def save_session(self, data: bytes) -> None:
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO session (id, data, updated_at) VALUES (0, ?, ?)",
+                         (data, int(time.time())))
+
+    # --- Медіа ---
+
+    def find_media(self, kind: str, file_id: int) -> int | None:
+        with self._conn() as conn:
+            r = conn.execute("SELECT media_id FROM media WHERE kind = ? AND file_id = ?", (kind, file_id)).fetchone()
+            return r[0] if r else None
+
+    def get_media(self, media_id: int):
+        with self._conn() as conn:
+            return conn.execute("SELECT * FROM media WHERE media_id = ?", (media_id,)).fetchone()
+
+    def add_media(self, kind: str, file_id: int, access_hash: int, file_reference: bytes, size: int,
+                  path: str | None, src_chat: int | None, src_msg: int | None) -> int:
+        with self._conn() as conn:
+            return conn.execute(
+                "INSERT INTO media (kind, file_id, access_hash, file_reference, size, path, src_chat, src_msg) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (kind, file_id, access_hash, file_reference, size, path, src_chat, src_msg)
+            ).lastrowid
+
+    def update_media_ref(self, media_id: int, file_id: int, access_hash: int, file_reference: bytes,
+                         src_chat: int | None, src_msg: int | None) -> None:
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE media SET file_id = ?, access_hash = ?, file_reference = ?, src_chat = ?, src_msg = ? "
+                "WHERE media_id = ?",
+                (file_id, access_hash, file_reference, src_chat, src_msg, media_id)
+            )
+
+    def set_media_path(self, media_id: int, path: str) -> bool:
+        """Шлях до локальної копії; False — запис уже видалено (prune)."""
+        with self._conn() as conn:
+            return conn.execute("UPDATE media SET path = ? WHERE media_id = ?", (path, media_id)).rowcount > 0
+
+    def prune_media(self) -> list[str | None]:
+        """Видаляє медіа без розсилок. Повертає шляхи їхніх локальних копій."""
+        with self._conn() as conn:
+            return [r[0] for r in conn.execute(
+                "DELETE FROM media WHERE media_id NOT IN "
+                "(SELECT media_id FROM spam_tasks WHERE media_id IS NOT NULL) RETURNING path"
+            ).fetchall()]
+
+    # --- Кеш сутностей ---
+
+    def get_entities(self):
+        with self._conn() as conn:
+            return conn.execute("SELECT * FROM entities").fetchall()
+
+    def save_entity(self, peer_id: int, kind: str, entity_id: int, access_hash: int | None,
+                    name: str, updated_at: int) -> None:
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entities (peer_id, kind, entity_id, access_hash, name, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (peer_id, kind, entity_id, access_hash, name, updated_at)
+            )
+
+    def delete_entity(self, peer_id: int) -> None:
+        with self._conn() as conn:
+            conn.execute("DELETE FROM entities WHERE peer_id = ?", (peer_id,))
+
+    # --- Ідентифікатори завдань ---
 
     def make_task_id(self) -> str:
-        """Найменше вільне число з натурального ряду."""
-        tasks = self.get_all_spam_tasks()
-        used = {int(t['task_id']) for t in tasks if t['task_id'].isdigit()}
+        """
+        Найменше вільне число з натурального ряду.
+        Виданий id одразу вважається зайнятим, тож дві команди поспіль не отримають однаковий.
+        """
+        with self._ids_lock:
+            if self._free_ids is None:
+                self._load_ids()
+            if self._free_ids:
+                n = heapq.heappop(self._free_ids)
+            else:
+                n = self._next_id
+                self._next_id += 1
+            return str(n)
+
+    def _load_ids(self) -> None:
+        used = sorted(
+            int(r[0]) for r in self._conn().execute("SELECT task_id FROM spam_tasks")
+            if r[0].isdigit()
+        )
+        free = []
         n = 1
-        while n in used:
-            n += 1
-        return str(n)
\ No newline at end of file
+        for u in used:
+            free.extend(range(n, u))
+            n = u + 1
+        heapq.heapify(free)
+        self._free_ids = free
+        self._next_id = n
+
+    def release_unused_id(self, task_id: str) -> None:
+        if self._conn().execute("SELECT 1 FROM spam_tasks WHERE task_id = ?", (task_id,)).fetchone() is None:
+            self.release_task_id(task_id)
+
+    def release_task_id(self, task_id: str) -> None:
+        """Повертає id у вільні: розсилку видалено або її так і не створили."""
+        if not task_id.isdigit():
+            return
+        with self._ids_lock:
+            if self._free_ids is not None and int(task_id) < self._next_id:
+                heapq.heappush(self._free_ids, int(task_id))
+
+
+# --- Асинхронний доступ ---
+
+class _DBWorker(threading.Thread):
+    """Окремий потік-виконавець для одного файлу БД. Запити виконуються по черзі."""
+
+    def __init__(self, path: str) -> None:
+        super().__init__(name=f"db:{path}", daemon=True)
+        self.path = path
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        # submitted пише лише event loop, done — лише цей потік
+        self.submitted = 0
+        self.done = 0
+        self.ops = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.busy_total = 0.0
+        # observer(назва операції, секунди від постановки в чергу до завершення); з observer_loop
+        # виклик передається в цей цикл (call_soon_threadsafe), інакше — виконується в цьому потоці
+        self.observer = None
+        self.observer_loop: asyncio.AbstractEventLoop | None = None
+        self.observer_errors = 0
+
+    @property
+    def inflight(self) -> int:
+        """Запити, поставлені в чергу і ще не завершені."""
+        return self.submitted - self.done
+
+    def submit(self, fn, *args) -> concurrent.futures.Future:
+        fut = concurrent.futures.Future()
+        self.submitted += 1
+        self.queue.put((fn, args, fut, time.monotonic()))
+        return fut
+
+    def run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            fn, args, fut, queued_at = item
+            started = time.monotonic()
+            waited = started - queued_at
+            self.ops += 1
+            self.wait_total += waited
+            if waited > self.wait_max:
+                self.wait_max = waited
+            if not fut.set_running_or_notify_cancel():
+                self.done += 1
+                continue
+            try:
+                result = fn(*args)
+            except BaseException as e:
+                self.busy_total += time.monotonic() - started
+                self.done += 1
+                fut.set_exception(e)
+            else:
+                self.busy_total += time.monotonic() - started
+                self.done += 1
+                fut.set_result(result)
+            if self.observer is not None:
+                self._observe(getattr(fn, '__name__', 'other'), time.monotonic() - queued_at)
+
+    def _observe(self, op: str, seconds: float) -> None:
+        # Помилка спостерігача (або закритий цикл) не повинна зупинити потік: інакше всі запити повиснуть
+        try:
+            if self.observer_loop is None:
+                self.observer(op, seconds)
+            else:
+                self.observer_loop.call_soon_threadsafe(self.observer, op, seconds)
+        except Exception:
+            self.observer_errors += 1
+
+
+_workers: dict[str, _DBWorker] = {}
+_workers_lock = threading.Lock()
+
+
+def _get_worker(path: str) -> _DBWorker:
+    key = os.path.abspath(path)
+    with _workers_lock:
+        w = _workers.get(key)
+        if w is None or not w.is_alive():
+            w = _workers[key] = _DBWorker(key)
+            w.start()
+        return w
+
+
+class AsyncDB:
+    """
+    Асинхронний фасад над DB для event loop.
+    Усі запити до файлу БД виконуються в одному виділеному потоці з чергою,
+    тож повільний диск не блокує відправлення інших акаунтів.
+    """
+
+    def __init__(self, account_id: str, flush_ms: int = 1000, flush_every: int = 50) -> None:
+        self.account_id = account_id
+        self.sync = DB(account_id, flush_ms=flush_ms, flush_every=flush_every)
+        self._worker = _get_worker(self.sync.path)
+
+    @property
+    def flush_ms(self) -> int:
+        return self.sync.flush_ms
+
+    def run(self, fn, *args):
+        """Виконує fn(*args) у потоці БД і повертає awaitable."""
+        return asyncio.wrap_future(self._worker.submit(fn, *args))
+
+    def submit(self, fn, *args) -> concurrent.futures.Future:
+        """Ставить fn(*args) у чергу потоку БД без очікування (фонові записи)."""
+        return self._worker.submit(fn, *args)
+
+    def set_observer(self, fn, loop: asyncio.AbstractEventLoop | None = None) -> None:
+        """
+        fn(назва операції, секунди) після кожної операції. З loop — викликається в цьому циклі
+        (стан, яким володіє цикл, як-от Metrics, не змінюється з потоку БД), без нього — в потоці БД.
+        """
+        self._worker.observer_loop = loop
+        self._worker.observer = fn
+
+    def stats(self) -> dict:
+        w = self._worker
+        return {
+            'queue': w.queue.qsize(),
+            'ops': w.ops,
+            'wait_avg_ms': w.wait_total / w.ops * 1000 if w.ops else 0.0,
+            'wait_max_ms': w.wait_max * 1000,
+            'busy_ms': w.busy_total * 1000,
+        }
+
+    async def init(self) -> None:
+        await self.run(init_db, self.account_id)
+
+    async def close(self) -> None:
+        await self.run(self.sync.close)
+        with _workers_lock:
+            if _workers.get(self._worker.path) is self._worker:
+                del _workers[self._worker.path]
+        self._worker.queue.put(None)
+
+    # --- Конфігурація ---
+
+    async def set_config(self, key: str, value) -> None:
+        await self.run(self.sync.set_config, key, value)
+
+    async def get_config(self, key: str, default=None):
+        return await self.run(self.sync.get_config, key, default)
+
+    # --- Завдання спаму ---
+
+    async def add_spam_task(self, task_id: str, chat_id: int, message: str, delay: int,
+                            total_count: int, start_time: int, weekdays: list[int] | None = None,
+                            scheduled_time: int | None = None, cron: str | None = None,
+                            media_id: int | None = None) -> None:
+        await self.run(self.sync.add_spam_task, task_id, chat_id, message, delay,
+                       total_count, start_time, weekdays, scheduled_time, cron, media_id)
+
+    async def get_spam_task(self, task_id: str):
+        return await self.run(self.sync.get_spam_task, task_id)
+
+    async def get_all_spam_tasks(self, status: str = None):
+        return await self.run(self.sync.get_all_spam_tasks, status)
+
+    async def count_tasks(self, status: str) -> int:
+        return await self.run(self.sync.count_tasks, status)
+
+    async def update_sent_count(self, task_id: str, sent_count: int, next_fire_at: int | None = None) -> None:
+        await self.run(self.sync.update_sent_count, task_id, sent_count, next_fire_at)
+
+    async def flush(self) -> None:
+        await self.run(self.sync.flush)
+
+    async def set_task_status(self, task_id: str, status: str) -> None:
+        await self.run(self.sync.set_task_status, task_id, status)
+
+    async def remove_spam_task(self, task_id: str) -> None:
+        await self.run(self.sync.remove_spam_task, task_id)
+
+    def set_next_fire(self, task_id: str, next_fire_at: int) -> None:
+        """Без очікування: черга потоку БД зберігає порядок відносно інших запитів."""
+        self._worker.submit(self.sync.set_next_fire, task_id, next_fire_at)
+
+    def save_session(self, data: bytes) -> None:
+        """Без очікування: знімок сесії пишеться у фоні."""
+        self._worker.submit(self.sync.save_session, data)
+
+    async def set_catchup(self, task_id: str, policy: str | None) -> bool:
+        return await self.run(self.sync.set_catchup, task_id, policy)
+
+    async def remove_tasks(self, ids: list[str] | None = None, chat_id: int | None = None) -> list[str]:
+        return await self.run(self.sync.remove_tasks, ids, chat_id)
+
+    async def set_status_where(self, status_from: str, status_to: str,
+                               chat_id: int | None = None) -> list[str]:
+        return await self.run(self.sync.set_status_where, status_from, status_to, chat_id)
+
+    async def fetch_resumable(self, chat_id: int | None = None) -> list:
+        return await self.run(self.sync.fetch_resumable, chat_id)
+
+    async def make_task_id(self) -> str:
+        return await self.run(self.sync.make_task_id)
+
+    def release_task_id(self, task_id: str) -> None:
+        """
+        Без очікування: спрацьовує й тоді, коли команду вже скасовано.
+        id звільняється, лише якщо рядка з ним немає — вставка могла завершитись у потоці БД.
+        """
+        self._worker.submit(self.sync.release_unused_id, task_id)
+
+    # --- Медіа ---
+
+    async def find_media(self, kind: str, file_id: int) -> int | None:
+        return await self.run(self.sync.find_media, kind, file_id)
+
+    async def get_media(self, media_id: int):
+        return await self.run(self.sync.get_media, media_id)
+
+    async def add_media(self, kind: str, file_id: int, access_hash: int, file_reference: bytes, size: int,
+                        path: str | None, src_chat: int | None, src_msg: int | None) -> int:
+        return await self.run(self.sync.add_media, kind, file_id, access_hash, file_reference, size,
+                              path, src_chat, src_msg)
+
+    async def update_media_ref(self, media_id: int, file_id: int, access_hash: int, file_reference: bytes,
+                               src_chat: int | None, src_msg: int | None) -> None:
+        await self.run(self.sync.update_media_ref, media_id, file_id, access_hash, file_reference,
+                       src_chat, src_msg)
+
+    async def set_media_path(self, media_id: int, path: str) -> bool:
+        return await self.run(self.sync.set_media_path, media_id, path)
+
+    async def prune_media(self) -> list[str | None]:
+        return await self.run(self.sync.prune_media)
+
+    # --- Кеш сутностей ---
+
+    async def get_entities(self):
+        return await self.run(self.sync.get_entities)
+
+    async def save_entity(self, peer_id: int, kind: str, entity_id: int, access_hash: int | None,
+                          name: str, updated_at: int) -> None:
+        await self.run(self.sync.save_entity, peer_id, kind, entity_id, access_hash, name, updated_at)
+
+    async def delete_entity(self, peer_id: int) -> None:
+        await self.run(self.sync.delete_entity, peer_id)
@@ -0,0 +1,132 @@
+# entity_cache.py
+import asyncio
+import collections
+import time
+
+from telethon import events, utils
+from telethon.tl import types
+
+
+def display_name(entity, cid: int) -> str:
+    return getattr(entity, 'title', None) or getattr(entity, 'first_name', None) or f"ID:{cid}"
+
+
+def _peer_to_row(peer) -> tuple[str, int, int | None]:
+    if isinstance(peer, types.InputPeerUser):
+        return 'user', peer.user_id, peer.access_hash
+    if isinstance(peer, types.InputPeerChannel):
+        return 'channel', peer.channel_id, peer.access_hash
+    if isinstance(peer, types.InputPeerChat):
+        return 'chat', peer.chat_id, None
+    return 'self', 0, None
+
+
+def _row_to_peer(kind: str, entity_id: int, access_hash: int | None):
+    if kind == 'user':
+        return types.InputPeerUser(entity_id, access_hash)
+    if kind == 'channel':
+        return types.InputPeerChannel(entity_id, access_hash)
+    if kind == 'chat':
+        return types.InputPeerChat(entity_id)
+    return types.InputPeerSelf()
+
+
+class EntityCache:
+    """
+    LRU-кеш сутностей чатів з TTL: InputPeer + ім'я для логів.
+    За наявності db записи зберігаються в таблиці entities і
+    підхоплюються після перезапуску без повторних get_entity.
+    """
+
+    def __init__(self, client, db=None, size: int = 1024, ttl: int = 6 * 3600) -> None:
+        self.client = client
+        self.db = db
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # cid -> (InputPeer, ім'я, час отримання)
+        self._items: collections.OrderedDict[int, tuple[object, str, float]] = collections.OrderedDict()
+
+    async def load(self) -> None:
+        """Підтягує збережені сутності з БД."""
+        if self.db is None:
+            return
+        expire = time.time() - self.ttl
+        for r in await self.db.get_entities():
+            if r['updated_at'] > expire:
+                peer = _row_to_peer(r['kind'], r['entity_id'], r['access_hash'])
+                self._items[r['peer_id']] = (peer, r['name'], r['updated_at'])
+        while len(self._items) > self.size:
+            self._items.popitem(last=False)
+
+    def register(self) -> None:
+        """Скидає кеш, коли Telegram повідомляє про зміну чату чи користувача."""
+        self.client.on(events.Raw(types=[types.UpdateUserName, types.UpdateUser,
+                                    types.UpdateChannel, types.UpdateChat]))(self._on_peer_update)
+        self.client.on(events.ChatAction(func=lambda e: e.new_title is not None))(self._on_title)
+
+    async def _on_peer_update(self, update) -> None:
+        if isinstance(update, (types.UpdateUserName, types.UpdateUser)):
+            self.invalidate(update.user_id)
+        elif isinstance(update, types.UpdateChannel):
+            self.invalidate(utils.get_peer_id(types.PeerChannel(update.channel_id)))
+        elif isinstance(update, types.UpdateChat):
+            self.invalidate(utils.get_peer_id(types.PeerChat(update.chat_id)))
+
+    async def _on_title(self, e) -> None:
+        self.invalidate(e.chat_id)
+
+    def _get(self, cid: int):
+        item = self._items.get(cid)
+        if item is None or item[2] + self.ttl < time.time():
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._items.move_to_end(cid)
+        return item
+
+    async def _resolve(self, cid: int):
+        item = self._get(cid)
+        if item is None:
+            entity = await self.client.get_entity(cid)
+            item = await self.put(cid, entity)
+        return item
+
+    async def put(self, cid: int, entity) -> tuple[object, str, float]:
+        item = (utils.get_input_peer(entity), display_name(entity, cid), time.time())
+        self._items[cid] = item
+        self._items.move_to_end(cid)
+        if len(self._items) > self.size:
+            self._items.popitem(last=False)
+        if self.db is not None:
+            kind, entity_id, access_hash = _peer_to_row(item[0])
+            await self.db.save_entity(cid, kind, entity_id, access_hash, item[1], int(item[2]))
+        return item
+
+    def invalidate(self, cid: int) -> None:
+        if self._items.pop(cid, None) is not None and self.db is not None:
+            asyncio.ensure_future(self.db.delete_entity(cid))
+
+    async def input_peer(self, cid: int):
+        return (await self._resolve(cid))[0]
+
+    async def name(self, cid: int) -> str:
+        try:
+            return (await self._resolve(cid))[1]
+        except Exception:
+            return f"ID:{cid}"
+
+    def cached_name(self, cid: int) -> str | None:
+        """Ім'я з кешу без звернення до Telegram і без впливу на статистику."""
+        item = self._items.get(cid)
+        return item[1] if item else None
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._items),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
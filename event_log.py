@@ -0,0 +1,187 @@
+# event_log.py
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+LEVELS = {'debug': 10, 'info': 20, 'warn': 30, 'error': 40}
+LOG_FILE = 'events.jsonl'
+
+
+def format_text(record: dict) -> str:
+    """Рядок для консолі в звичному вигляді: [акаунт] [РІВЕНЬ] текст."""
+    level = record['level']
+    prefix = '' if level == 'info' else f"[{level.upper()}] "
+    return f"[{record.get('name', record['account'])}] {prefix}{record['msg']}"
+
+
+def print_log(msg: str, level: str = 'info', event: str = 'log', **fields) -> None:
+    """Запасний логер із сигнатурою Account._log — для модулів, яким логер не передали."""
+    print(msg if level == 'info' else f"[{level.upper()}] {msg}")
+
+
+class LogWriter(threading.Thread):
+    """
+    Потік-письменник логів процесу. Записи (словники) ставляться в чергу без очікування,
+    а серіалізація в JSON, запис у файли з ротацією і вивід у stdout — у цьому потоці,
+    тож повільний споживач stdout (tty, docker json-file) не зупиняє event loop.
+
+    Черга обмежена: коли в ній більше ніж limit // 2 записів, debug відкидаються,
+    більше ніж limit — відкидається все; відкинуті рахуються в dropped.
+    stdout: text — звичні рядки, json — ті самі JSON-рядки, що й у файлі, off — нічого.
+    """
+
+    def __init__(self, stdout: str = 'text', max_bytes: int = 10 << 20, backups: int = 5,
+                 limit: int = 10000) -> None:
+        super().__init__(name='log-writer', daemon=True)
+        self.stdout = stdout
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.limit = limit
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        # submitted і dropped пише лише event loop, done і errors — лише цей потік
+        self.submitted = 0
+        self.done = 0
+        self.dropped = 0
+        self.errors = 0
+        # шлях -> [файл, розмір]
+        self._files: dict[str, list] = {}
+
+    @property
+    def backlog(self) -> int:
+        return self.submitted - self.done
+
+    def submit(self, path: str | None, record: dict, level: int) -> bool:
+        backlog = self.submitted - self.done
+        if backlog >= self.limit or (level < LEVELS['info'] and backlog >= self.limit // 2):
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        self.queue.put((path, record))
+        return True
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Дописує чергу і закриває файли."""
+        self.queue.put(None)
+        self.join(timeout)
+
+    def run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            path, record = item
+            try:
+                self._write(path, record)
+            except (OSError, ValueError, TypeError):
+                self.errors += 1
+            self.done += 1
+            # Скидаємо буфери, лише коли черга спорожніла: під навантаженням — пачками
+            if self.queue.empty():
+                self._flush()
+        self._flush()
+        for f, _ in self._files.values():
+            f.close()
+        self._files.clear()
+
+    def _write(self, path: str | None, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        if path is not None:
+            self._append(path, line)
+        if self.stdout == 'text':
+            sys.stdout.write(format_text(record) + '\n')
+        elif self.stdout == 'json':
+            sys.stdout.write(line)
+
+    def _append(self, path: str, line: str) -> None:
+        entry = self._files.get(path)
+        if entry is None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            f = open(path, 'a', encoding='utf-8')
+            entry = self._files[path] = [f, f.tell()]
+        data = line.encode()
+        if entry[1] and entry[1] + len(data) > self.max_bytes:
+            entry[0].close()
+            self._rotate(path)
+            entry[0] = open(path, 'a', encoding='utf-8')
+            entry[1] = 0
+        entry[0].write(line)
+        entry[1] += len(data)
+
+    def _rotate(self, path: str) -> None:
+        """events.jsonl -> events.jsonl.1 -> ... -> events.jsonl.<backups> (найстаріший видаляється)."""
+        if self.backups <= 0:
+            os.remove(path)
+            return
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{path}.{i}"):
+                os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+        os.replace(path, f"{path}.1")
+
+    def _flush(self) -> None:
+        for f, _ in self._files.values():
+            f.flush()
+        if self.stdout != 'off':
+            try:
+                sys.stdout.flush()
+            except (OSError, ValueError):
+                self.errors += 1
+
+
+_writer: LogWriter | None = None
+_writer_lock = threading.Lock()
+
+
+def get_writer(**config) -> LogWriter:
+    """Спільний для процесу потік-письменник; config застосовується при першому виклику."""
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = LogWriter(**config)
+            _writer.start()
+        return _writer
+
+
+def close_writer() -> None:
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
+
+
+class EventLog:
+    """
+    Логер акаунта: JSON-рядки в data/<акаунт>/logs/events.jsonl з полями
+    ts, level, account, event, msg і довільними (tid, planned, actual...).
+    name — ім'я для консолі (@username), пишеться, якщо відрізняється від account.
+    Записи нижче рівня level відкидаються ще до черги.
+    """
+
+    def __init__(self, writer: LogWriter, account: str, folder: str, level: str = 'info') -> None:
+        self.writer = writer
+        self.account = account
+        self.name = account
+        self.path = os.path.join(folder, LOG_FILE)
+        self._level = LEVELS[level]
+        self.level = level
+
+    def set_level(self, level: str) -> None:
+        self._level = LEVELS[level]
+        self.level = level
+
+    def enabled(self, level: str) -> bool:
+        return LEVELS[level] >= self._level
+
+    def log(self, level: str, event: str, msg: str, **fields) -> None:
+        lv = LEVELS[level]
+        if lv < self._level:
+            return
+        record = {'ts': round(time.time(), 3), 'level': level, 'account': self.account,
+                  'event': event, 'msg': msg}
+        if self.name != self.account:
+            record['name'] = self.name
+        record.update(fields)
+        self.writer.submit(self.path, record, lv)
@@ -0,0 +1,104 @@
+# governor.py
+import asyncio
+import time
+
+from telethon import errors
+
+
+class SendGovernor:
+    """
+    Єдина точка відправлень акаунта.
+    Token bucket тримає темп у межах лімітів Telegram (rate <= 0 — без обмеження), а FloodWait
+    ставить на паузу всі відправлення акаунта на вказаний сервером час.
+    Повідомлення лог-чату не витрачають токени і не стоять у черзі за розсилками — лише чекають паузу.
+    """
+
+    def __init__(self, rate: float = 1.0, burst: int = 5) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+        self.waiting = 0
+        # sent — доставлені повідомлення розсилок; skipped — fn повернула False;
+        # log_sent — повідомлення лог-чату
+        self.sent = 0
+        self.skipped = 0
+        self.log_sent = 0
+        self.throttled = 0.0
+        self.flood_waits = 0
+        self.flood_seconds = 0
+
+    @property
+    def paused_for(self) -> float:
+        return max(0.0, self._paused_until - time.monotonic())
+
+    def pause(self, seconds: float) -> None:
+        """Глобальна пауза відправлень (FloodWait)."""
+        self.flood_waits += 1
+        self.flood_seconds += int(seconds)
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def _wait_pause(self) -> None:
+        while (left := self.paused_for) > 0:
+            await asyncio.sleep(left)
+
+    async def acquire(self) -> None:
+        """Чекає на дозвіл відправити одне повідомлення. Черга — у порядку надходження."""
+        self.waiting += 1
+        started = time.monotonic()
+        try:
+            async with self._lock:
+                while True:
+                    now = time.monotonic()
+                    if now < self._paused_until:
+                        await asyncio.sleep(self._paused_until - now)
+                        continue
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    await asyncio.sleep((1 - self._tokens) / self.rate)
+        finally:
+            self.waiting -= 1
+            self.throttled += time.monotonic() - started
+
+    async def send(self, fn, *args, retry: bool = False, log: bool = False, **kwargs):
+        """
+        Виконує відправлення fn(*args, **kwargs) через governor.
+        FloodWaitError ставить паузу і прокидається далі, або (retry=True)
+        відправлення повторюється після паузи.
+        log=True — повідомлення лог-чату, рахується окремо від розсилок.
+        """
+        while True:
+            if log or self.rate <= 0:
+                await self._wait_pause()
+            else:
+                await self.acquire()
+            try:
+                result = await fn(*args, **kwargs)
+                if log:
+                    self.log_sent += 1
+                elif result is False:
+                    self.skipped += 1
+                else:
+                    self.sent += 1
+                return result
+            except errors.FloodWaitError as e:
+                self.pause(e.seconds)
+                if not retry:
+                    raise
+
+    def stats(self) -> dict:
+        return {
+            'waiting': self.waiting,
+            'sent': self.sent,
+            'skipped': self.skipped,
+            'log_sent': self.log_sent,
+            'throttled_s': self.throttled,
+            'paused_s': self.paused_for,
+            'flood_waits': self.flood_waits,
+            'flood_s': self.flood_seconds,
+        }
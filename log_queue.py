@@ -0,0 +1,143 @@
+# log_queue.py
+import asyncio
+import collections
+import time
+from typing import Awaitable, Callable
+
+# Обмеження Telegram на довжину одного повідомлення
+TG_MAX_LEN = 4096
+# Скільки розсилок показувати поіменно в одному дайджесті
+DIGEST_MAX_TASKS = 50
+
+
+def split_message(text: str, limit: int = TG_MAX_LEN) -> list[str]:
+    """Ріже текст на частини не довші за limit, по межах рядків де можливо."""
+    if len(text) <= limit:
+        return [text]
+    parts = []
+    buf = ''
+    for line in text.splitlines(keepends=True):
+        while len(line) > limit:
+            if buf:
+                parts.append(buf)
+                buf = ''
+            parts.append(line[:limit])
+            line = line[limit:]
+        if len(buf) + len(line) > limit:
+            parts.append(buf)
+            buf = ''
+        buf += line
+    if buf:
+        parts.append(buf)
+    return parts
+
+
+def format_span(seconds: float) -> str:
+    seconds = int(round(seconds))
+    if seconds < 120:
+        return f"{seconds}с"
+    return f"{seconds // 60}хв"
+
+
+class LogQueue:
+    """
+    Асинхронна черга логів акаунта.
+    Відправлення ніколи не чекають на лог: записи складаються в чергу,
+    а окрема задача шле їх у лог-чат.
+    mode='digest' — події відправлень збираються в періодичний дайджест,
+    mode='event' — кожна подія окремим повідомленням, як раніше.
+    """
+
+    def __init__(self, send: Callable[[str], Awaitable[None]], mode: str = 'digest',
+                 interval: float = 60.0, maxsize: int = 500) -> None:
+        self._send = send
+        self.mode = mode
+        self.interval = interval
+        self.maxsize = maxsize
+        self._pending: collections.deque[str] = collections.deque()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        # Дайджест: tid -> кількість відправлень і підпис (назва чату)
+        self._counts: dict[str, int] = {}
+        self._labels: dict[str, str] = {}
+        self._events = 0
+        self._since = time.monotonic()
+        self.dropped = 0
+        self._dropped_unreported = 0
+
+    def put(self, text: str) -> None:
+        """Ставить повідомлення в чергу. При переповненні — відкидає і рахує."""
+        if len(self._pending) >= self.maxsize:
+            self.dropped += 1
+            self._dropped_unreported += 1
+            return
+        self._pending.append(text)
+        self._wakeup.set()
+
+    def event(self, tid: str, label: str, text: str) -> None:
+        """Подія відправлення: окремим повідомленням або в дайджест, залежно від режиму."""
+        if self.mode == 'event':
+            self.put(text)
+            return
+        self._events += 1
+        self._counts[tid] = self._counts.get(tid, 0) + 1
+        self._labels[tid] = label
+
+    def qsize(self) -> int:
+        return len(self._pending)
+
+    def _take_digest(self) -> str | None:
+        elapsed = time.monotonic() - self._since
+        self._since = time.monotonic()
+        if not self._events:
+            return None
+        counts, labels, events = self._counts, self._labels, self._events
+        self._counts, self._labels, self._events = {}, {}, 0
+
+        lines = [f"📤 {events} відправлень за {format_span(elapsed)} · розсилок: {len(counts)}\n"]
+        top = sorted(counts.items(), key=lambda kv: -kv[1])
+        for tid, n in top[:DIGEST_MAX_TASKS]:
+            lines.append(f"• [{tid}] ×{n} · {labels[tid]}\n")
+        if len(top) > DIGEST_MAX_TASKS:
+            lines.append(f"… і ще {len(top) - DIGEST_MAX_TASKS}\n")
+        return ''.join(lines)
+
+    def _collect(self, force_digest: bool = False) -> None:
+        if force_digest or time.monotonic() - self._since >= self.interval:
+            digest = self._take_digest()
+            if digest:
+                self._pending.append(digest)
+        if self._dropped_unreported:
+            self._pending.append(f"⚠️ Черга логів переповнена, пропущено {self._dropped_unreported}")
+            self._dropped_unreported = 0
+
+    async def _drain(self) -> None:
+        while self._pending:
+            for part in split_message(self._pending.popleft()):
+                await self._send(part)
+
+    async def _run(self) -> None:
+        while True:
+            timeout = max(0.0, self.interval - (time.monotonic() - self._since))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            self._collect()
+            await self._drain()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self, timeout: float = 5.0) -> None:
+        """Зупиняє чергу, відправляючи залишок (з обмеженням часу)."""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self._collect(force_digest=True)
+        try:
+            await asyncio.wait_for(self._drain(), timeout)
+        except asyncio.TimeoutError:
+            pass
@@ -1,12 +1,93 @@
-from telethon import TelegramClient, events
+from telethon import TelegramClient, errors
 import asyncio
+import contextlib
+import functools
+import itertools
 import re
 import os
 import time
 import signal
+import sys
 import datetime
 
-from database import DB, init_db
+from database import AsyncDB, read_session
+from entity_cache import EntityCache
+from event_log import LEVELS, EventLog, close_writer, get_writer
+from control_api import ControlAPI
+from governor import SendGovernor
+from log_queue import LogQueue
+from media_cache import MediaCache
+from metrics import API_BUCKETS, DB_BUCKETS, DRIFT_BUCKETS, Metrics, MetricsExporter
+from profiler import LoopWatchdog, profile
+from router import CommandRouter
+from schedule import ALL_DAYS, Schedule, mask_to_weekdays
+from scheduler import Scheduler
+from session_store import SnapshotSession, write_file
+from update_filter import OutgoingOnlyClient
+import supervisor
+
+# Розмір пулу воркерів, що виконують відправлення, на кожен акаунт
+SEND_WORKERS = int(os.getenv('SEND_WORKERS', '4'))
+# Темп відправлень акаунта: повідомлень за секунду і розмір пачки
+# 0 — без обмеження темпу (як до SendGovernor); FloodWait обробляється завжди
+SEND_RATE = float(os.getenv('SEND_RATE', '0'))
+SEND_BURST = int(os.getenv('SEND_BURST', '5'))
+# Кеш сутностей чатів: час життя запису (с) і чи зберігати його в БД акаунта
+ENTITY_CACHE_TTL = int(os.getenv('ENTITY_CACHE_TTL', str(6 * 3600)))
+ENTITY_CACHE_PERSIST = os.getenv('ENTITY_CACHE_PERSIST', '1') == '1'
+# Медіа розсилок: найбільший файл (МБ), для якого у фоні зберігається локальна копія
+MEDIA_LOCAL_MAX_MB = float(os.getenv('MEDIA_LOCAL_MAX_MB', '20'))
+# Що робити з відправленнями, пропущеними під час простою (skip | one | all | spread)
+CATCHUP_POLICIES = ('skip', 'one', 'all', 'spread')
+CATCHUP_POLICY = os.getenv('CATCHUP_POLICY', 'one')
+# Інтервал між надолуженнями після рестарту (мс), щоб не впертися в ліміти
+STARTUP_STAGGER_MS = int(os.getenv('STARTUP_STAGGER_MS', str(int(1000 / SEND_RATE) if SEND_RATE > 0 else 1000)))
+# Скільки акаунтів стартують одночасно і як довго (с) чекати між повторними спробами старту
+START_CONCURRENCY = int(os.getenv('START_CONCURRENCY', '4'))
+START_RETRY_BASE = int(os.getenv('START_RETRY_BASE', '5'))
+START_RETRY_MAX = int(os.getenv('START_RETRY_MAX', '300'))
+# Кількість процесів-воркерів; 1 — усі акаунти в одному процесі (див. supervisor.py)
+PROCESS_WORKERS = int(os.getenv('PROCESS_WORKERS', '1'))
+WORKER_HEALTH_SEC = float(os.getenv('WORKER_HEALTH_SEC', '30'))
+# Сесія Telethon: sqlite — стандартний файл session.session (як і раніше);
+# за бажанням file — у пам'яті зі знімками в session.json, db — зі знімками в userbot.db
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'sqlite')
+SESSION_SNAPSHOT_SEC = float(os.getenv('SESSION_SNAPSHOT_SEC', '60'))
+# Локальний control API (control_api.py): порт на 127.0.0.1 або шлях Unix-сокета; 0/порожньо — вимкнено
+CONTROL_HOST = os.getenv('CONTROL_HOST', '127.0.0.1')
+CONTROL_PORT = int(os.getenv('CONTROL_PORT', '0'))
+CONTROL_SOCKET = os.getenv('CONTROL_SOCKET', '')
+CONTROL_TOKEN = os.getenv('CONTROL_TOKEN', '')
+# Експорт метрик у форматі Prometheus: порт на CONTROL_HOST і/або файл; 0/порожньо — вимкнено
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+METRICS_FILE = os.getenv('METRICS_FILE', '')
+METRICS_INTERVAL = float(os.getenv('METRICS_INTERVAL', '15'))
+# Відкидати оновлення, що не стосуються вихідних команд, ще до диспетчеризації
+OUTGOING_ONLY = os.getenv('OUTGOING_ONLY', '0') == '1'
+# Як довго (с) планувальник спить одним шматком, перш ніж звірити годинник, і який зсув вважати стрибком
+CLOCK_CHECK_SEC = float(os.getenv('CLOCK_CHECK_SEC', '60'))
+CLOCK_JUMP_SEC = float(os.getenv('CLOCK_JUMP_SEC', '2'))
+# Структурований лог (event_log.py): JSON-рядки в data/<акаунт>/logs з ротацією; stdout: text | json | off
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'info')
+LOG_STDOUT = os.getenv('LOG_STDOUT', 'text')
+LOG_FILE_MB = float(os.getenv('LOG_FILE_MB', '10'))
+LOG_FILE_BACKUPS = int(os.getenv('LOG_FILE_BACKUPS', '5'))
+LOG_QUEUE = int(os.getenv('LOG_QUEUE', '10000'))
+# Сторож event loop (profiler.py): поріг блокування (мс), після якого знімається стек
+LOOP_WATCHDOG = os.getenv('LOOP_WATCHDOG', '1') == '1'
+LOOP_LAG_WARN_MS = int(os.getenv('LOOP_LAG_WARN_MS', '250'))
+# Профілювати перші N секунд після старту (0 — вимкнено); файл — у data/<перший акаунт>/
+PROFILE_ON_START = float(os.getenv('PROFILE_ON_START', '0'))
+PROFILE_MAX_SEC = 600
+# Найменша затримка між відправленнями (с) — однакова для !spam і control API
+MIN_DELAY = 1
+
+# Вхід з кодом читає консоль — такі акаунти авторизуються по одному
+_LOGIN_LOCK = asyncio.Lock()
+# Один сторож на процес: цикл спільний для всіх акаунтів
+WATCHDOG: LoopWatchdog | None = None
+
+WD_NAMES = ('пн', 'вт', 'ср', 'чт', 'пт', 'сб', 'нд')
 
 # ============ ПАРСИНГ ============
 
@@ -72,6 +153,17 @@ def parse_weekdays(days_str: str) -> list[int] | None:
     return sorted(result) if result else None
 
 
+def _spec_int(value) -> int | None:
+    """Ціле з JSON: число або рядок з цифр. bool — підклас int, тож true/false відкидаються."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and re.fullmatch(r'-?\d+', value.strip()):
+        return int(value)
+    return None
+
+
 def parse_command(text: str) -> tuple[str, int, int, tuple[int, int] | None, list[int] | None] | None:
     """
     !spam <текст> <затримка> <кількість> [час] [дні]
@@ -123,7 +215,7 @@ def parse_command(text: str) -> tuple[str, int, int, tuple[int, int] | None, lis
 
     # delay — останній токен що залишився перед message
     delay = parse_time(tokens[-1])
-    if delay is None:
+    if delay is None or delay < MIN_DELAY:
         return None
     tokens = tokens[:-1]
 
@@ -152,8 +244,55 @@ def format_time(seconds: int) -> str:
         return f"{d}д" + (f" {h}г" if h else "")
 
 
-def parse_weekdays_from_db(s: str | None) -> list[int] | None:
-    return [int(d) for d in s.split(',')] if s else None
+def format_boot(phases: dict[str, float]) -> str:
+    """Звіт про старт: загальний час і тривалість кожної фази."""
+    total = sum(phases.values())
+    return f"{total:.2f}с: " + " · ".join(f"{k} {v:.2f}с" for k, v in phases.items())
+
+
+def format_workers(status: dict) -> str:
+    """Рядок !status про воркери супервізора (data/workers/status.json)."""
+    workers = status.get('workers', [])
+    if not workers:
+        return ""
+    alive = sum(w['alive'] for w in workers)
+    states = [a.get('state') for w in workers for a in w['accounts'].values()]
+    restarts = sum(w['restarts'] for w in workers)
+    return (f"\n🧩 Воркери: {alive}/{len(workers)} · акаунти {states.count('running')}/{len(states)}"
+            f" · перезапусків {restarts}")
+
+
+def format_metrics(m: Metrics, watchdog: LoopWatchdog | None = None) -> str:
+    """Зведення !metrics; квантилі — верхні межі кошиків гістограм."""
+    def ms(v: float) -> str:
+        if v < 0.01:
+            return f"{v * 1000:.1f} мс"
+        return f"{v * 1000:.0f} мс" if v < 1 else f"{v:.1f}с"
+
+    errors_by_type = sorted(((dict(labels).get('type', '?'), v) for (name, labels), v in m.counters.items()
+                             if name == 'userbot_send_errors_total'), key=lambda x: -x[1])
+    lines = [f"📤 Відправлень: {m.total('userbot_sends_total'):.0f}"
+             f" · помилок: {sum(v for _, v in errors_by_type):.0f}"]
+    if errors_by_type:
+        lines.append("  " + ", ".join(f"{t} {v:.0f}" for t, v in errors_by_type))
+    for title, name in (("⏱ Запізнення", 'userbot_send_drift_seconds'),
+                        ("🌐 API", 'userbot_api_latency_seconds'),
+                        ("🗄 БД", 'userbot_db_latency_seconds')):
+        h = m.merged(name)
+        if h and h.count:
+            lines.append(f"{title}: p50 ≤{ms(h.quantile(0.5))} · p99 ≤{ms(h.quantile(0.99))}"
+                         f" · макс. {ms(h.max)} ({h.count})")
+    active = m.gauges.get(('userbot_tasks', (('status', 'active'),)), 0)
+    paused = m.gauges.get(('userbot_tasks', (('status', 'paused'),)), 0)
+    lines.append(f"📋 Розсилки: активних {active:.0f} · на паузі {paused:.0f}")
+    if watchdog is not None:
+        lag = watchdog.metrics.merged('userbot_loop_lag_seconds')
+        if lag and lag.count:
+            lines.append(f"🔄 Цикл: затримка p99 ≤{ms(lag.quantile(0.99))} · макс. {ms(lag.max)}"
+                         f" · блокувань {watchdog.metrics.total('userbot_loop_blocked_total'):.0f}")
+        for site, count, total, worst in watchdog.top(3):
+            lines.append(f"  {site}: {count}× · разом {ms(total)} · макс. {ms(worst)}")
+    return "📈 Метрики\n\n" + "\n".join(lines)
 
 
 def calculate_next_send_time(last_sent: int, delay: int, weekdays: list[int] | None) -> int:
@@ -161,73 +300,12 @@ def calculate_next_send_time(last_sent: int, delay: int, weekdays: list[int] | N
     Рахує наступний час відправлення після першого.
     scheduled_time більше не потрібен — він лише для першого відправлення.
     """
-    next_time = last_sent + delay
-
-    if not weekdays:
-        return next_time
-
-    # Перевіряємо чи день підходить
-    next_dt = datetime.datetime.fromtimestamp(next_time)
-    if next_dt.weekday() in weekdays:
-        return next_time
-
-    # Зсуваємо на наступний дозволений день, зберігаючи час доби
-    target_time = next_dt.time()
-    current_date = next_dt.date()
-    current_wd = next_dt.weekday()
-
-    days_ahead = next((wd - current_wd for wd in sorted(weekdays) if wd > current_wd), None)
-    if days_ahead is None:
-        days_ahead = 7 - current_wd + weekdays[0]
-
-    target_dt = datetime.datetime.combine(
-        current_date + datetime.timedelta(days=days_ahead), target_time
-    )
-    return int(target_dt.timestamp())
+    return Schedule(delay, None, weekdays).next_after(last_sent)
 
 
 def get_first_send_time(scheduled_time: int | None, weekdays: list[int] | None) -> int:
     """Рахує час першого відправлення."""
-    now = datetime.datetime.now()
-    
-    if not scheduled_time:
-        # Без фіксованого часу — відправляємо одразу якщо день підходить
-        if not weekdays or now.weekday() in weekdays:
-            return int(now.timestamp())
-        
-        # Шукаємо наступний дозволений день о 00:00
-        current_wd = now.weekday()
-        days_ahead = next((wd - current_wd for wd in sorted(weekdays) if wd > current_wd), None)
-        if days_ahead is None:
-            days_ahead = 7 - current_wd + weekdays[0]
-        
-        target_dt = datetime.datetime.combine(now.date() + datetime.timedelta(days=days_ahead), datetime.time(0, 0))
-        return int(target_dt.timestamp())
-    
-    # Є фіксований час
-    h, mn = divmod(scheduled_time, 60)
-    target_time = datetime.time(h, mn)
-    target_dt = datetime.datetime.combine(now.date(), target_time)
-    
-    # Якщо час ще не минув сьогодні і день підходить
-    if target_dt > now and (not weekdays or now.weekday() in weekdays):
-        return int(target_dt.timestamp())
-    
-    # Інакше — завтра або наступний дозволений день
-    next_date = now.date() + datetime.timedelta(days=1)
-    next_dt = datetime.datetime.combine(next_date, target_time)
-    
-    if not weekdays or next_dt.weekday() in weekdays:
-        return int(next_dt.timestamp())
-    
-    # Шукаємо наступний дозволений день
-    current_wd = next_dt.weekday()
-    days_ahead = next((wd - current_wd for wd in sorted(weekdays) if wd > current_wd), None)
-    if days_ahead is None:
-        days_ahead = 7 - current_wd + weekdays[0]
-    
-    target_dt = datetime.datetime.combine(next_date + datetime.timedelta(days=days_ahead), target_time)
-    return int(target_dt.timestamp())
+    return Schedule(0, scheduled_time, weekdays).first_after(time.time())
 
 
 def load_accounts() -> list[dict]:
@@ -244,6 +322,11 @@ def load_accounts() -> list[dict]:
             'api_id': int(api_id),
             'api_hash': api_hash,
             'phone': phone,
+            'flush_ms': int(os.getenv(f'ACCOUNT_{i}_FLUSH_MS', '1000')),
+            'flush_every': int(os.getenv(f'ACCOUNT_{i}_FLUSH_EVERY', '50')),
+            'log_mode': os.getenv(f'ACCOUNT_{i}_LOG_MODE', 'digest'),
+            'log_interval': int(os.getenv(f'ACCOUNT_{i}_LOG_DIGEST_SEC', '60')),
+            'log_level': os.getenv(f'ACCOUNT_{i}_LOG_LEVEL', LOG_LEVEL),
         })
         i += 1
     return accounts
@@ -251,112 +334,497 @@ def load_accounts() -> list[dict]:
 
 # ============ КЛАС АКАУНТА ============
 
+class CatchUp:
+    """
+    Надолуження після простою: ще backlog пропущених відправлень з інтервалом gap,
+    після чого розсилка повертається до розкладу з resume_at.
+    """
+    __slots__ = ('backlog', 'gap', 'resume_at')
+
+    def __init__(self, backlog: int, resume_at: int, gap: int = 0) -> None:
+        self.backlog = backlog
+        self.gap = gap
+        self.resume_at = resume_at
+
+
+class SpamJob:
+    """
+    Стан однієї розсилки в планувальнику. Запис компактний: текст і розклад
+    спільні для всіх розсилок з однаковим вмістом (sys.intern, Schedule.shared),
+    а стан надолуження (catchup) існує лише поки воно триває.
+    """
+    __slots__ = ('tid', 'cid', 'msg', 'total', 'sent', 'schedule', 'original', 'media', 'cname', 'catchup')
+
+    def __init__(self, tid: str, cid: int, msg: str, total: int, sent: int,
+                 schedule: Schedule, original=None, media: int | None = None) -> None:
+        self.tid = tid
+        self.cid = cid
+        self.msg = msg
+        self.total = total
+        self.sent = sent
+        self.schedule = schedule
+        self.original = original
+        self.media = media
+        self.cname: str | None = None
+        self.catchup: CatchUp | None = None
+
+    @classmethod
+    def from_row(cls, r) -> 'SpamJob':
+        return cls(r['task_id'], r['chat_id'], sys.intern(r['message']), r['total_count'], r['sent_count'],
+                   Schedule.from_row(r), media=r['media_id'])
+
+
 class Account:
-    def __init__(self, account_id: str, api_id: int, api_hash: str, phone: str) -> None:
+    def __init__(self, account_id: str, api_id: int, api_hash: str, phone: str,
+                 flush_ms: int = 1000, flush_every: int = 50,
+                 log_mode: str = 'digest', log_interval: int = 60, log_level: str = 'info',
+                 client=None) -> None:
         self.account_id = account_id
         self.phone = phone
         self.username = account_id
-        self.db = DB(account_id)
+        # starting | running | degraded | stopped; boot — тривалість фаз останнього старту (с)
+        self.state = 'starting'
+        self.last_error: str | None = None
+        self.boot: dict[str, float] = {}
+        self.metrics = Metrics(account_id)
+        self.db = AsyncDB(account_id, flush_ms=flush_ms, flush_every=flush_every)
+        self._flush_task: asyncio.Task | None = None
 
         session_dir = os.path.join('data', account_id)
         os.makedirs(session_dir, exist_ok=True)
-
-        self.client = TelegramClient(os.path.join(session_dir, 'session'), api_id, api_hash)
+        writer = get_writer(stdout=LOG_STDOUT, max_bytes=int(LOG_FILE_MB * (1 << 20)),
+                            backups=LOG_FILE_BACKUPS, limit=LOG_QUEUE)
+        self.events = EventLog(writer, account_id, os.path.join(session_dir, 'logs'),
+                               log_level if log_level in LEVELS else 'info')
+
+        # FloodWait не «проспати» всередині Telethon: його обробляє SendGovernor.
+        # client можна передати ззовні (симуляція в benchmarks/sim.py)
+        self.session: SnapshotSession | None = None
+        if client is None:
+            session = self._open_session(session_dir)
+            if isinstance(session, SnapshotSession):
+                self.session = session
+            cls = OutgoingOnlyClient if OUTGOING_ONLY else TelegramClient
+            client = cls(session, api_id, api_hash, flood_sleep_threshold=0)
+        self.client = client
+        self.governor = SendGovernor(SEND_RATE, SEND_BURST)
         self.log_chat: int | str = 'me'
-        self.active_tasks: dict[int, dict[str, asyncio.Task]] = {}
+        self._log_chat_scanned = False
+        self.logs = LogQueue(self._send_log, mode=log_mode, interval=log_interval)
+        self.entities = EntityCache(self.client, self.db if ENTITY_CACHE_PERSIST else None,
+                                    ttl=ENTITY_CACHE_TTL)
+        self.media = MediaCache(self.client, self.db, os.path.join(session_dir, 'media'),
+                                local_max=int(MEDIA_LOCAL_MAX_MB * (1 << 20)), log=self._log)
+        self.scheduler = Scheduler(self._fire, workers=SEND_WORKERS, max_sleep=CLOCK_CHECK_SEC,
+                                   jump_threshold=CLOCK_JUMP_SEC, retarget=self._retarget,
+                                   on_clock=self._on_clock, log=self._log)
         self._register_handlers()
-
-    def _log(self, msg: str) -> None:
-        print(f"[{self.username}] {msg}")
-
-    def _cleanup(self, cid: int, tid: str) -> None:
-        if cid in self.active_tasks:
-            self.active_tasks[cid].pop(tid, None)
-            if not self.active_tasks[cid]:
-                del self.active_tasks[cid]
-
-    def _start(self, cid: int, tid: str, coro) -> asyncio.Task:
-        task = asyncio.create_task(coro)
-        self.active_tasks.setdefault(cid, {})[tid] = task
-        return task
+        self.entities.register()
+
+    def _log(self, msg: str, level: str = 'info', event: str = 'log', **fields) -> None:
+        """Запис у структурований лог акаунта; не блокує (див. event_log.LogWriter)."""
+        self.events.log(level, event, msg, **fields)
+
+    def _open_session(self, session_dir: str):
+        """Сесія за SESSION_BACKEND; стан зі старого session.session переноситься автоматично."""
+        legacy = os.path.join(session_dir, 'session')
+        if SESSION_BACKEND == 'sqlite':
+            return legacy
+        if SESSION_BACKEND == 'db':
+            data = read_session(self.account_id)
+            write = self.db.save_session
+        else:
+            path = os.path.join(session_dir, 'session.json')
+            data = None
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    data = f.read()
+            write = functools.partial(self.db.submit, write_file, path)
+        if data:
+            return SnapshotSession(write, SESSION_SNAPSHOT_SEC, data)
+        if os.path.exists(legacy + '.session'):
+            self._log("Сесію перенесено з session.session", event='session_migrated')
+            return SnapshotSession.from_sqlite(legacy, write, SESSION_SNAPSHOT_SEC)
+        return SnapshotSession(write, SESSION_SNAPSHOT_SEC)
+
+    @contextlib.contextmanager
+    def _api_call(self, method: str):
+        """Тривалість виклику Telegram API — у гістограму userbot_api_latency_seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.metrics.observe('userbot_api_latency_seconds', API_BUCKETS,
+                                 time.perf_counter() - started, (('method', method),))
+
+    def _retarget(self, tid: str, job: SpamJob, when: float, jump: float) -> float | None:
+        """
+        Новий час розсилки після стрибка годинника. Інтервальні зберігають залишок
+        очікування (зсуваються разом з годинником), а прив'язані до часу доби
+        лишаються на своєму часі.
+        """
+        if job.schedule.anchored or (job.sent == 0 and job.schedule.tod is not None):
+            return None
+        if job.catchup is not None:
+            job.catchup.resume_at = int(job.catchup.resume_at + jump)
+        new = int(when + jump)
+        self.db.set_next_fire(tid, new)
+        return new
+
+    def _on_clock(self, jump: float, slept: float, moved: int) -> None:
+        if jump:
+            self.metrics.inc('userbot_clock_jumps_total', (('kind', 'jump'),))
+            self.metrics.set('userbot_clock_jump_seconds', jump)
+            sign = '+' if jump > 0 else '−'
+            self._log(f"Годинник зміщено на {sign}{format_time(int(abs(jump)))}, переплановано розсилок: {moved}",
+                      'warn', 'clock_jump', jump=round(jump, 3), moved=moved)
+        if slept:
+            self.metrics.inc('userbot_clock_jumps_total', (('kind', 'suspend'),))
+            self._log(f"Система спала {format_time(int(slept))}, прострочені відправлення підуть зараз",
+                      'warn', 'suspend', slept=round(slept, 3))
+
+    def _observe_db(self, op: str, seconds: float) -> None:
+        self.metrics.observe('userbot_db_latency_seconds', DB_BUCKETS, seconds, (('op', op),))
+
+    @contextlib.contextmanager
+    def _phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.boot[name] = time.perf_counter() - started
+
+    async def _flush_loop(self) -> None:
+        """Скидає відкладений прогрес не рідше ніж раз на flush_ms."""
+        while True:
+            await asyncio.sleep(self.db.flush_ms / 1000)
+            await self.db.flush()
+            if self.session is not None:
+                self.session.save()
+
+    def _schedule(self, job: SpamJob, first_time: int | None = None) -> None:
+        """Ставить розсилку в розклад на перше відправлення."""
+        if first_time is None:
+            first_time = job.schedule.first_after(time.time())
+        wait = max(0, first_time - int(time.time()))
+        if wait > 0:
+            job.original = None
+            next_dt = datetime.datetime.fromtimestamp(first_time)
+            self._log(f"[{job.tid}] Перше повідомлення: {next_dt.strftime('%d.%m %H:%M')} (через {format_time(wait)})",
+                      event='scheduled', tid=job.tid, planned=first_time)
+        self.scheduler.add(job.tid, first_time, job)
+        self.db.set_next_fire(job.tid, first_time)
+
+    def _rehydrate(self, r, now: int, slot: int) -> bool:
+        """
+        Повертає розсилку з БД у розклад за збереженим next_fire_at.
+        Пропущені за час простою відправлення обробляються політикою catchup;
+        надолуження стартують з інтервалом STARTUP_STAGGER_MS (slot — порядковий номер),
+        але кожне — ще до наступного відправлення своєї розсилки за розкладом.
+        Повертає True, якщо розсилка зайняла слот надолуження.
+        """
+        job = SpamJob.from_row(r)
+        planned = r['next_fire_at']
+        if planned is None:
+            # Розсилка зі старої схеми — як раніше, від поточного моменту
+            self._schedule(job)
+            return False
+        if planned > now:
+            self.scheduler.add(job.tid, planned, job)
+            return False
+
+        missed, upcoming = job.schedule.missed(planned, now, job.total - job.sent)
+        policy = r['catchup'] or CATCHUP_POLICY
+        if policy == 'skip':
+            self.scheduler.add(job.tid, upcoming, job)
+            self.db.set_next_fire(job.tid, upcoming)
+            return False
+
+        job.catchup = cu = CatchUp(1 if policy == 'one' else missed, upcoming)
+        if policy == 'spread':
+            cu.gap = max(1, (upcoming - now) // cu.backlog)
+        # Зсув не виходить за вікно до наступного відправлення за розкладом (не більше одного delay):
+        # коли слотів більше, ніж вміщує вікно, вони йдуть по колу, а не відкладаються на години
+        window = max(1, upcoming - now)
+        when = now + (slot * STARTUP_STAGGER_MS / 1000) % window
+        self.scheduler.add(job.tid, when, job)
+        return True
+
+    def _next_time(self, job: SpamJob, current: int) -> int:
+        """Час наступного відправлення з урахуванням надолуження."""
+        cu = job.catchup
+        if cu is not None:
+            cu.backlog -= 1
+            if cu.backlog:
+                return current + cu.gap
+            job.catchup = None
+            if cu.resume_at > current:
+                return cu.resume_at
+            return job.schedule.missed(cu.resume_at, current, 0)[1]
+        return job.schedule.next_after(current)
 
     async def log(self, msg: str) -> None:
+        """Ставить повідомлення в чергу лог-чату; не чекає на відправлення."""
+        self.logs.put(msg)
+
+    async def _send_log(self, msg: str) -> None:
         try:
             if isinstance(self.log_chat, int):
                 try:
-                    await self.client.send_message(await self.client.get_entity(self.log_chat), msg)
+                    peer = await self.entities.input_peer(self.log_chat)
                 except ValueError:
-                    async for d in self.client.iter_dialogs():
-                        if d.id == self.log_chat:
-                            await self.client.send_message(d, msg)
-                            return
-                    raise
+                    peer = await self._find_log_chat()
+                await self.governor.send(self.client.send_message, peer, msg, retry=True, log=True)
             else:
-                await self.client.send_message(self.log_chat, msg)
+                await self.governor.send(self.client.send_message, self.log_chat, msg, retry=True, log=True)
         except Exception as e:
-            self._log(f"[ERROR] {e}")
+            self._log(f"Лог-чат: {e}", 'error', 'log_chat_error', error=type(e).__name__)
+
+    async def _find_log_chat(self):
+        """Одноразовий пошук лог-чату серед діалогів, якщо get_entity його не знає."""
+        if not self._log_chat_scanned:
+            self._log_chat_scanned = True
+            async for d in self.client.iter_dialogs():
+                if d.id == self.log_chat:
+                    await self.entities.put(d.id, d.entity)
+                    return d.input_entity
+        self._log(f"Лог-чат {self.log_chat} недоступний, пишемо в Збережені", 'error', 'log_chat_missing')
+        return 'me'
 
     async def get_chat_name(self, cid: int) -> str:
+        return await self.entities.name(cid)
+
+    async def _deliver(self, tid: str, job: SpamJob) -> bool:
+        # Розсилку могли зняти, поки вона чекала своєї черги в governor
+        if tid not in self.scheduler:
+            return False
+        if job.original is not None:
+            with self._api_call('edit'):
+                await job.original.edit(job.msg)
+            job.original = None
+        elif job.media is not None:
+            peer = await self.entities.input_peer(job.cid)
+            with self._api_call('media'):
+                await self.media.send(peer, job.msg, job.media)
+        else:
+            peer = await self.entities.input_peer(job.cid)
+            with self._api_call('send'):
+                await self.client.send_message(peer, job.msg)
+        return True
+
+    async def _reply_media(self, e) -> int | None:
+        """media_id фото чи документа з повідомлення, на яке відповідає команда."""
+        if not e.is_reply:
+            return None
+        reply = await e.get_reply_message()
+        return await self.media.capture(reply) if reply and reply.media else None
+
+    async def _fire(self, tid: str, job: SpamJob) -> int | None:
+        """Одне відправлення. Повертає час наступного або None, якщо розсилка завершена."""
+        if job.cname is None:
+            job.cname = await self.get_chat_name(job.cid)
+        # Поки обробник працює, запис у планувальнику ще має запланований час
+        planned = self.scheduler.next_fire(tid)
+
         try:
-            c = await self.client.get_entity(cid)
-            return getattr(c, 'title', None) or getattr(c, 'first_name', f'ID:{cid}')
-        except Exception:
-            return f"ID:{cid}"
-
-    async def _spam(self, cid: int, tid: str, msg: str, delay: int, count: int, 
-                    original=None, scheduled_time: int | None = None, weekdays: list[int] | None = None) -> None:
-        i = 0
-        cname = await self.get_chat_name(cid)
-        
+            if not await self.governor.send(self._deliver, tid, job):
+                return None
+
+            job.sent += 1
+            self.metrics.inc('userbot_sends_total')
+            actual = time.time()
+            if planned is not None:
+                self.metrics.observe('userbot_send_drift_seconds', DRIFT_BUCKETS, max(0.0, actual - planned))
+            if self.events.enabled('debug'):
+                self._log(f"[{tid}] {job.sent}/{job.total}", 'debug', 'sent', tid=tid, chat_id=job.cid,
+                          planned=planned, actual=round(actual, 3), sent=job.sent, total=job.total)
+            current = int(actual)
+            self.logs.event(tid, job.cname, f"📤 [{tid}] {job.sent}/{job.total}\n👤 {job.cname}\n💬 {job.msg}")
+
+            if job.sent >= job.total:
+                await self.db.update_sent_count(tid, job.sent)
+                await self.log(f"✅ [{tid}] Завершено\n👤 {job.cname} · 📊 {job.total}")
+                self._log(f"[{tid}] Завершено", event='finished', tid=tid, total=job.total)
+                await self.db.remove_spam_task(tid)
+                return None
+
+            next_time = self._next_time(job, current)
+            await self.db.update_sent_count(tid, job.sent, next_time)
+            wait_sec = max(0, next_time - int(time.time()))
+            if wait_sec > job.schedule.delay + 3600:
+                ndt = datetime.datetime.fromtimestamp(next_time)
+                self._log(f"[{tid}] Наступне: {ndt.strftime('%d.%m %H:%M')} (через {format_time(wait_sec)})",
+                          event='scheduled', tid=tid, planned=next_time)
+            return next_time
+
+        except errors.FloodWaitError as e:
+            self.metrics.inc('userbot_send_errors_total', (('type', 'FloodWaitError'),))
+            # Розсилка не втрачається: переносимо її на кінець паузи
+            self._log(f"[{tid}] FloodWait {format_time(e.seconds)}, переносимо", 'warn', 'flood_wait',
+                      tid=tid, seconds=e.seconds)
+            return int(time.time()) + e.seconds
+
+        except Exception as e:
+            self.metrics.inc('userbot_send_errors_total', (('type', type(e).__name__),))
+            await self.log(f"❌ [{tid}] Помилка\n👤 {job.cname}\n⚠️ {e}")
+            self._log(f"[{tid}] Помилка: {e}", 'error', 'send_error', tid=tid, planned=planned,
+                      error=type(e).__name__)
+            await self.db.remove_spam_task(tid)
+            return None
+
+    # ============ КЕРУВАННЯ РОЗСИЛКАМИ ============
+    # Спільне для команд у Telegram і control API
+
+    async def create_task(self, cid: int, message: str, count: int, schedule: Schedule,
+                          media_id: int | None = None, original=None) -> str:
+        message, schedule = sys.intern(message), schedule.shared()
+        # Розклад без жодного спрацювання не потрапляє в БД
+        first_time = schedule.first_after(time.time())
+        tid = await self.db.make_task_id()
         try:
-            # Перше відправлення
-            first_time = get_first_send_time(scheduled_time, weekdays)
-            wait = max(0, first_time - int(time.time()))
-            
-            if wait > 0:
-                next_dt = datetime.datetime.fromtimestamp(first_time)
-                self._log(f"[{tid}] Перше повідомлення: {next_dt.strftime('%d.%m %H:%M')} (через {format_time(wait)})")
-                await asyncio.sleep(wait)
-
-            for i in range(1, count + 1):
-                if cid not in self.active_tasks or tid not in self.active_tasks[cid]:
-                    break
-
-                if i == 1 and original and wait == 0:
-                    await original.edit(msg)
-                else:
-                    await self.client.send_message(cid, msg)
-
-                current = int(time.time())
-                await self.log(f"📤 [{tid}] {i}/{count}\n👤 {cname}\n💬 {msg}")
-                self.db.update_sent_count(tid, i)
-
-                if i < count:
-                    next_time = calculate_next_send_time(current, delay, weekdays)  # ← прибрали scheduled_time
-                    wait_sec = max(0, next_time - int(time.time()))
-                    
-                    if wait_sec > delay + 3600:
-                        ndt = datetime.datetime.fromtimestamp(next_time)
-                        self._log(f"[{tid}] Наступне: {ndt.strftime('%d.%m %H:%M')} (через {format_time(wait_sec)})")
-                    
-                    await asyncio.sleep(wait_sec)
-
-            if cid in self.active_tasks and tid in self.active_tasks[cid]:
-                await self.log(f"✅ [{tid}] Завершено\n👤 {cname} · 📊 {count}")
-                self.db.remove_spam_task(tid)
-                self._cleanup(cid, tid)
-
-        except asyncio.CancelledError:
-            self._cleanup(cid, tid)
+            if schedule.cron:
+                await self.db.add_spam_task(tid, cid, message, 0, count, int(time.time()), cron=schedule.cron,
+                                            media_id=media_id)
+            else:
+                weekdays = mask_to_weekdays(schedule.wdmask) if schedule.wdmask != ALL_DAYS else None
+                scheduled_time = schedule.tod // 60 if schedule.tod is not None else None
+                await self.db.add_spam_task(tid, cid, message, schedule.delay, count, int(time.time()),
+                                            weekdays, scheduled_time, media_id=media_id)
+        except BaseException:
+            # Рядок не записано (помилка БД або команду скасовано) — id знову вільний
+            self.db.release_task_id(tid)
             raise
-        except Exception as e:
-            await self.log(f"❌ [{tid}] Помилка\n👤 {cname}\n⚠️ {e}")
-            self.db.remove_spam_task(tid)
-            self._cleanup(cid, tid)
+        self._schedule(SpamJob(tid, cid, message, count, 0, schedule, original, media_id), first_time)
+        return tid
+
+    async def create_from_spec(self, spec: dict) -> str:
+        """
+        Розсилка з JSON control API:
+        {"chat_id", "message", "count", "delay": "1г" або секунди, "time": "14:30", "days": "пн,ср"}
+        або {"chat_id", "message", "count", "cron": "0 9 * * 1-5"}.
+        """
+        cid, count, message = _spec_int(spec.get('chat_id')), _spec_int(spec.get('count')), spec.get('message')
+        if cid is None or count is None or not isinstance(message, str):
+            raise ValueError("потрібні chat_id і count (цілі числа) та message (рядок)")
+        if count <= 0 or not message.strip():
+            raise ValueError("count > 0 і непорожній message")
+        if spec.get('cron'):
+            schedule = Schedule.from_cron(str(spec['cron']))
+            if schedule is None:
+                raise ValueError("невірний cron")
+        else:
+            delay = spec.get('delay')
+            delay = parse_time(delay) if isinstance(delay, str) else _spec_int(delay)
+            if delay is None or delay < MIN_DELAY:
+                raise ValueError(f"delay: секунди (від {MIN_DELAY}) або 30с, 5хв, 2г, 1д")
+            time_of_day = parse_time_of_day(str(spec['time'])) if spec.get('time') else None
+            if spec.get('time') and time_of_day is None:
+                raise ValueError("time: 14:30 або 2:30pm")
+            weekdays = parse_weekdays(str(spec['days'])) if spec.get('days') else None
+            if spec.get('days') and weekdays is None:
+                raise ValueError("days: пн,ср,пт")
+            schedule = Schedule(delay, time_of_day[0] * 60 + time_of_day[1] if time_of_day else None, weekdays)
+        tid = await self.create_task(cid, message, count, schedule)
+        self._log(f"[{tid}] Створено через control API", event='created', tid=tid, source='api')
+        return tid
+
+    async def stop_task(self, tid: str) -> bool:
+        if not await self.db.get_spam_task(tid):
+            return False
+        self.scheduler.remove(tid)
+        await self.db.remove_spam_task(tid)
+        return True
+
+    async def pause_task(self, tid: str) -> bool:
+        if not await self.db.get_spam_task(tid):
+            return False
+        self.scheduler.remove(tid)
+        await self.db.flush()
+        await self.db.set_task_status(tid, 'paused')
+        return True
+
+    async def resume_task(self, tid: str) -> str:
+        """'resumed'; 'finished' — відправляти вже нічого, розсилку видалено; 'missing' — немає або не на паузі."""
+        row = await self.db.get_spam_task(tid)
+        if not row or row['status'] != 'paused':
+            return 'missing'
+        if row['total_count'] - row['sent_count'] <= 0:
+            await self.db.remove_spam_task(tid)
+            return 'finished'
+        # Спершу розбираємо рядок: якщо він зіпсований (ValueError), розсилка лишається на паузі
+        job = SpamJob.from_row(row)
+        await self.db.set_task_status(tid, 'active')
+        self._schedule(job)
+        return 'resumed'
+
+    # --- Стан для control API: лише пам'ять і локальна БД, без запитів до Telegram ---
+
+    def summary(self) -> dict:
+        return {
+            'id': self.account_id,
+            'state': self.state,
+            'error': self.last_error,
+            'name': self.username,
+            'tasks': len(self.scheduler),
+            'sent': self.governor.sent,
+            'boot_s': round(sum(self.boot.values()), 2),
+        }
+
+    def _job_record(self, job: SpamJob, when: float) -> dict:
+        return {
+            'id': job.tid, 'chat_id': job.cid, 'chat': job.cname or self.entities.cached_name(job.cid),
+            'message': job.msg, 'sent': job.sent, 'total': job.total, 'status': 'active',
+            'next_fire': int(when), 'delay': job.schedule.delay, 'cron': job.schedule.cron,
+            'media': job.media is not None, 'backlog': job.catchup.backlog if job.catchup else 0,
+        }
+
+    def _row_record(self, r) -> dict:
+        return {
+            'id': r['task_id'], 'chat_id': r['chat_id'], 'chat': self.entities.cached_name(r['chat_id']),
+            'message': r['message'], 'sent': r['sent_count'], 'total': r['total_count'],
+            'status': r['status'], 'next_fire': r['next_fire_at'] if r['status'] == 'active' else None,
+            'delay': r['delay'], 'cron': r['cron'], 'media': r['media_id'] is not None, 'backlog': 0,
+        }
+
+    async def task_record(self, tid: str) -> dict | None:
+        job = self.scheduler.get(tid)
+        if job is not None:
+            return self._job_record(job, self.scheduler.next_fire(tid))
+        row = await self.db.get_spam_task(tid)
+        return self._row_record(row) if row else None
+
+    async def task_records(self, status: str = 'all', after: str = ''):
+        """
+        Розсилки в порядку id після after: активні — з планувальника, призупинені — з БД.
+        id активних і рядки призупинених завантажуються одразу; генератор лише відкладає
+        побудову записів, тож сторінка з N записів не серіалізує решту.
+        """
+        def key(tid: str) -> tuple[int, str]:
+            # id — числа в рядках: коротший рядок — менше число
+            return len(tid), tid
+
+        start = key(after) if after else (0, '')
+        paused = {}
+        if status != 'active':
+            paused = {r['task_id']: r for r in await self.db.get_all_spam_tasks(status='paused')
+                      if key(r['task_id']) > start}
+        active = [t for t in self.scheduler.keys() if key(t) > start] if status != 'paused' else []
+        order = sorted(itertools.chain(active, paused), key=key)
+
+        def records():
+            for tid in order:
+                r = paused.get(tid)
+                if r is not None:
+                    yield self._row_record(r)
+                    continue
+                job = self.scheduler.get(tid)
+                if job is not None:
+                    yield self._job_record(job, self.scheduler.next_fire(tid))
+        return records()
 
     # ============ ОБРОБНИКИ КОМАНД ============
 
-    async def _handle_spam(self, e) -> None:
+    async def _handle_spam(self, e, args: list[str]) -> None:
         parsed = parse_command(e.raw_text)
         cid = e.chat_id
         
@@ -378,137 +846,193 @@ class Account:
             await e.delete()
             return
 
-        tid = self.db.make_task_id()
+        media_id = await self._reply_media(e)
         scheduled_time = time_of_day[0] * 60 + time_of_day[1] if time_of_day else None
+        schedule = Schedule(delay, scheduled_time, weekdays)
         
-        self.db.add_spam_task(tid, cid, message, delay, count, int(time.time()), weekdays, scheduled_time)
+        # Команду з медіа не редагуємо: медіа надсилається окремим повідомленням
+        should_delete = media_id is not None
+        if weekdays or time_of_day:
+            first_time = schedule.first_after(time.time())
+            should_delete = should_delete or first_time > int(time.time()) + 60
         
-        wd_names = {0:'пн',1:'вт',2:'ср',3:'чт',4:'пт',5:'сб',6:'нд'}
-        info = f"\n📅 {','.join(wd_names[d] for d in weekdays)}" if weekdays else ""
+        tid = await self.create_task(cid, message, count, schedule, media_id,
+                                     None if should_delete else e.message)
+        
+        info = f"\n📅 {','.join(WD_NAMES[d] for d in weekdays)}" if weekdays else ""
         if time_of_day:
             info += f" о {time_of_day[0]:02d}:{time_of_day[1]:02d}"
+        if media_id is not None:
+            info += "\n🖼 з медіа"
         
         await self.log(f"🚀 [{tid}] Запущено{info}\n👤 {await self.get_chat_name(cid)}\n💬 {message}")
-        
-        should_delete = False
-        if weekdays or time_of_day:
-            first_time = get_first_send_time(scheduled_time, weekdays)
-            should_delete = first_time > int(time.time()) + 60
-        
-        self._start(cid, tid, self._spam(cid, tid, message, delay, count, 
-                                         None if should_delete else e.message, 
-                                         scheduled_time, weekdays))
         if should_delete:
             await e.delete()
 
-    async def _handle_stop(self, e) -> None:
-        parts = e.raw_text.strip().split()
-        if len(parts) > 1:
-            tid = parts[1]
-            row = self.db.get_spam_task(tid)
-            if row:
-                t = self.active_tasks.get(row['chat_id'], {}).get(tid)
-                if t:
-                    t.cancel()
-                    await asyncio.sleep(0)
-                self.db.remove_spam_task(tid)
-                self._cleanup(row['chat_id'], tid)
+    async def _handle_cron(self, e, args: list[str]) -> None:
+        # !cron <хв> <год> <день> <міс> <день_тижня> <кількість> <текст>
+        schedule = Schedule.from_cron(' '.join(args[:5])) if len(args) >= 7 else None
+        if not schedule or not args[5].isdigit() or int(args[5]) <= 0:
+            await self.log(
+                "❌ Невірний формат\n\n"
+                "`!cron <хв> <год> <день> <міс> <день_тижня> <кількість> <текст>`\n\n"
+                "Приклад:\n"
+                "`!cron 0 9 * * 1-5 20 Доброго ранку` — о 9:00 у робочі дні"
+            )
+            await e.delete()
+            return
+
+        cid = e.chat_id
+        count = int(args[5])
+        # Текст беремо із сирого повідомлення, щоб зберегти пробіли
+        message = e.raw_text.split(maxsplit=7)[7]
+        media_id = await self._reply_media(e)
+        tid = await self.create_task(cid, message, count, schedule, media_id)
+        media_info = "\n🖼 з медіа" if media_id is not None else ""
+        await self.log(f"🚀 [{tid}] Запущено\n⏰ `{schedule.cron}`{media_info}\n"
+                       f"👤 {await self.get_chat_name(cid)}\n💬 {message}")
+        await e.delete()
+
+    async def _handle_preview(self, e, args: list[str]) -> None:
+        if not args:
+            await self.log("❌ `!preview <id> [кількість]`")
+            await e.delete()
+            return
+        tid = args[0]
+        if len(args) > 1 and (not args[1].isdigit() or int(args[1]) < 1):
+            await self.log("❌ Кількість — ціле число від 1 до 50")
+            await e.delete()
+            return
+        n = min(int(args[1]), 50) if len(args) > 1 else 5
+
+        job = self.scheduler.get(tid)
+        if job:
+            schedule, remaining = job.schedule, job.total - job.sent
+            first = int(self.scheduler.next_fire(tid))
+        else:
+            row = await self.db.get_spam_task(tid)
+            if not row:
+                await self.log(f"❌ [{tid}] не знайдено")
+                await e.delete()
+                return
+            schedule, remaining = Schedule.from_row(row), row['total_count'] - row['sent_count']
+            first = schedule.first_after(time.time())
+
+        n = min(n, remaining)
+        if n <= 0:
+            await self.log(f"ℹ️ [{tid}] завершена")
+            await e.delete()
+            return
+        times = [first] + schedule.next_n(first, n - 1)
+        lines = []
+        for i, ts in enumerate(times, 1):
+            dt = datetime.datetime.fromtimestamp(ts)
+            lines.append(f"{i}. {WD_NAMES[dt.weekday()]} {dt.strftime('%d.%m.%Y %H:%M')}\n")
+        await self.log(f"🗓 [{tid}] Наступні {n}:\n" + "".join(lines))
+        await e.delete()
+
+    async def _handle_stop(self, e, args: list[str]) -> None:
+        if args and args[0].lower() != 'here':
+            tid = args[0]
+            if await self.stop_task(tid):
                 await self.log(f"⛔️ [{tid}] Зупинено")
             else:
                 await self.log(f"❌ [{tid}] не знайдено")
         else:
-            all_t = self.db.get_all_spam_tasks()
-            for ct in self.active_tasks.values():
-                for t in ct.values():
-                    t.cancel()
-            await asyncio.sleep(0)
-            self.active_tasks.clear()
-            for r in all_t:
-                self.db.remove_spam_task(r['task_id'])
-            await self.log(f"⛔️ Зупинено {len(all_t)}")
+            chat_id = self._scope(e, args)
+            removed = await self.db.remove_tasks(chat_id=chat_id)
+            self._unschedule(removed, chat_id)
+            await self.log(f"⛔️ Зупинено {len(removed)}" + await self._scope_label(chat_id))
         await e.delete()
 
-    async def _handle_pause(self, e) -> None:
-        parts = e.raw_text.strip().split()
-        if len(parts) < 2:
+    async def _handle_pause(self, e, args: list[str]) -> None:
+        if not args:
             await self.log("❌ `!pause <id>`")
             await e.delete()
             return
-        tid = parts[1]
-        row = self.db.get_spam_task(tid)
-        if row:
-            t = self.active_tasks.get(row['chat_id'], {}).get(tid)
-            if t:
-                t.cancel()
-                await asyncio.sleep(0)
-            self.db.set_task_status(tid, 'paused')
+        tid = args[0]
+        if await self.pause_task(tid):
             await self.log(f"⏸ [{tid}] Призупинено")
         else:
             await self.log(f"❌ [{tid}] не знайдено")
         await e.delete()
 
-    async def _handle_pauseall(self, e) -> None:
-        all_t = self.db.get_all_spam_tasks(status='active')
-        for ct in self.active_tasks.values():
-            for t in ct.values():
-                t.cancel()
-        await asyncio.sleep(0)
-        for r in all_t:
-            self.db.set_task_status(r['task_id'], 'paused')
-        await self.log(f"⏸ Призупинено {len(all_t)}")
+    async def _handle_pauseall(self, e, args: list[str]) -> None:
+        chat_id = self._scope(e, args)
+        paused = await self.db.set_status_where('active', 'paused', chat_id)
+        self._unschedule(paused, chat_id)
+        await self.log(f"⏸ Призупинено {len(paused)}" + await self._scope_label(chat_id))
         await e.delete()
 
-    async def _handle_continue(self, e) -> None:
-        parts = e.raw_text.strip().split()
-        if len(parts) < 2:
+    async def _handle_continue(self, e, args: list[str]) -> None:
+        if not args:
             await self.log("❌ `!continue <id>`")
             await e.delete()
             return
-        tid = parts[1]
-        row = self.db.get_spam_task(tid)
-        if not row or row['status'] != 'paused':
+        tid = args[0]
+        result = await self.resume_task(tid)
+        if result == 'missing':
             await self.log(f"❌ [{tid}] не знайдено або не призупинена")
-            await e.delete()
-            return
-        
-        remaining = row['total_count'] - row['sent_count']
-        if remaining <= 0:
-            self.db.remove_spam_task(tid)
+        elif result == 'finished':
             await self.log(f"ℹ️ [{tid}] завершена")
-            await e.delete()
-            return
-        
-        self.db.set_task_status(tid, 'active')
-        await self.log(f"▶️ [{tid}] Відновлено")
-        
-        wd = parse_weekdays_from_db(row['weekdays'] if 'weekdays' in row.keys() else None)
-        st = row['scheduled_time'] if 'scheduled_time' in row.keys() else None
-        
-        self._start(row['chat_id'], tid,
-                   self._spam(row['chat_id'], tid, row['message'], row['delay'], remaining,
-                             scheduled_time=st, weekdays=wd))
+        else:
+            await self.log(f"▶️ [{tid}] Відновлено")
         await e.delete()
 
-    async def _handle_continueall(self, e) -> None:
-        paused = self.db.get_all_spam_tasks(status='paused')
+    async def _handle_continueall(self, e, args: list[str]) -> None:
+        chat_id = self._scope(e, args)
+        rows = await self.db.fetch_resumable(chat_id)
         resumed = 0
-        for r in paused:
-            remaining = r['total_count'] - r['sent_count']
-            if remaining > 0:
-                self.db.set_task_status(r['task_id'], 'active')
-                wd = parse_weekdays_from_db(r['weekdays'] if 'weekdays' in r.keys() else None)
-                st = r['scheduled_time'] if 'scheduled_time' in r.keys() else None
-                self._start(r['chat_id'], r['task_id'],
-                           self._spam(r['chat_id'], r['task_id'], r['message'], r['delay'], remaining,
-                                     scheduled_time=st, weekdays=wd))
-                resumed += 1
-            else:
-                self.db.remove_spam_task(r['task_id'])
-        await self.log(f"▶️ Відновлено {resumed}")
+        for r in rows:
+            try:
+                job = SpamJob.from_row(r)
+            except ValueError as err:
+                # fetch_resumable уже зробив рядок активним — повертаємо на паузу
+                await self.db.set_task_status(r['task_id'], 'paused')
+                self._log(f"[{r['task_id']}] Не відновлено: {err}", 'error', 'resume_failed',
+                          tid=r['task_id'], error=str(err))
+                await self.log(f"❌ [{r['task_id']}] Не відновлено: {err}")
+                continue
+            self._schedule(job)
+            resumed += 1
+        await self.log(f"▶️ Відновлено {resumed}" + await self._scope_label(chat_id))
         await e.delete()
 
-    async def _handle_status(self, e) -> None:
-        all_t = self.db.get_all_spam_tasks()
+    # --- Масові команди: `here` обмежує дію поточним чатом ---
+
+    @staticmethod
+    def _scope(e, args: list[str]) -> int | None:
+        return e.chat_id if args and args[0].lower() == 'here' else None
+
+    async def _scope_label(self, chat_id: int | None) -> str:
+        return f" у {await self.get_chat_name(chat_id)}" if chat_id is not None else ""
+
+    def _unschedule(self, ids: list[str], chat_id: int | None) -> None:
+        if chat_id is None:
+            self.scheduler.clear()
+        else:
+            for tid in ids:
+                self.scheduler.remove(tid)
+
+    async def _handle_catchup(self, e, args: list[str]) -> None:
+        policy = args[1].lower() if len(args) > 1 else None
+        if not policy or policy not in CATCHUP_POLICIES + ('default',):
+            await self.log(
+                "❌ `!catchup <id> <skip|one|all|spread|default>`\n\n"
+                "Що робити з відправленнями, пропущеними під час простою:\n"
+                "skip — пропустити, one — одне одразу, all — усі, spread — рівномірно до наступного"
+            )
+            await e.delete()
+            return
+        tid = args[0]
+        if await self.db.set_catchup(tid, None if policy == 'default' else policy):
+            await self.log(f"🔁 [{tid}] Надолуження: {policy}")
+        else:
+            await self.log(f"❌ [{tid}] не знайдено")
+        await e.delete()
+
+    async def _handle_status(self, e, args: list[str]) -> None:
+        all_t = await self.db.get_all_spam_tasks()
         if not all_t:
             await self.log("ℹ️ Немає розсилок")
             await e.delete()
@@ -518,36 +1042,72 @@ class Account:
             st = "▶️" if r['status'] == 'active' else "⏸"
             cn = await self.get_chat_name(r['chat_id'])
             msg_short = r['message'][:40] + ('...' if len(r['message']) > 40 else '')
+            if r['media_id'] is not None:
+                msg_short = "🖼 " + msg_short
             lines.append(
                 f"• [{r['task_id']}] {st} {cn}\n"
                 f"  💬 {msg_short}\n"
                 f"  📊 {r['sent_count']}/{r['total_count']}\n"
             )
+        dbs = self.db.stats()
+        lines.append(f"\n🗄 БД: черга {dbs['queue']} · очікування {dbs['wait_avg_ms']:.1f}/{dbs['wait_max_ms']:.1f} мс")
+        gs = self.governor.stats()
+        lines.append(f"\n🚦 Відправлення: черга {gs['waiting']} · затримано {gs['throttled_s']:.0f}с"
+                     f" · FloodWait {gs['flood_waits']} ({gs['flood_s']}с)")
+        ec = self.entities.stats()
+        lines.append(f"\n👥 Кеш чатів: {ec['size']} · влучань {ec['hits']}/{ec['hits'] + ec['misses']}")
+        ms = self.media.stats()
+        if ms['sends']:
+            lines.append(f"\n🖼 Медіа: {ms['sends']} відправлень · без завантаження {ms['hit_rate']:.0%}"
+                         f" · заощаджено {ms['bytes_saved'] / 1048576:.1f} МБ")
+        seen = getattr(self.client, 'updates_seen', 0)
+        if seen:
+            lines.append(f"\n📭 Оновлення: відкинуто {self.client.updates_dropped}/{seen}")
+        if 'WORKER_SHARD' in os.environ:
+            lines.append(format_workers(supervisor.read_json(supervisor.STATUS_PATH, {})))
         await self.log("📊 Розсилки:\n\n" + "".join(lines))
         await e.delete()
 
-    async def _handle_help(self, e) -> None:
+    async def _handle_help(self, e, args: list[str]) -> None:
         await self.log(
             "🤖 Команди\n\n"
             "📤 `!spam <текст> <затримка> <кількість> [час] [дні]`\n"
-            "⛔️ `!stop <id>` | `!stop`\n"
-            "⏸ `!pause <id>` | `!pauseall`\n"
-            "▶️ `!continue <id>` | `!continueall`\n"
-            "📊 `!status` · 🆔 `!chatid` · ⚙️ `!setlog` · 🚀 `!start`"
+            "⏰ `!cron <хв> <год> <день> <міс> <день_тижня> <кількість> <текст>`\n"
+            "⛔️ `!stop <id>` | `!stop [here]`\n"
+            "⏸ `!pause <id>` | `!pauseall [here]`\n"
+            "▶️ `!continue <id>` | `!continueall [here]`\n"
+            "🗓 `!preview <id> [n]` · 🔁 `!catchup <id> <політика>`\n"
+            "📊 `!status` · ⏱ `!cmdstats` · 📈 `!metrics` · 🔬 `!profile <сек> [cprofile]`\n"
+            "🆔 `!chatid` · ⚙️ `!setlog` · 📝 `!loglevel [рівень]` · 🚀 `!start`"
         )
         await e.delete()
 
-    async def _handle_setlog(self, e) -> None:
+    async def _handle_setlog(self, e, args: list[str]) -> None:
         self.log_chat = e.chat_id
-        self.db.set_config('log_chat_id', e.chat_id)
+        self._log_chat_scanned = False
+        await self.db.set_config('log_chat_id', e.chat_id)
         await self.log(f"✅ Лог-чат: {await self.get_chat_name(e.chat_id)}")
         await e.delete()
 
-    async def _handle_chatid(self, e) -> None:
+    async def _handle_loglevel(self, e, args: list[str]) -> None:
+        if args:
+            level = args[0].lower()
+            if level not in LEVELS:
+                await self.log(f"❌ `!loglevel [{'|'.join(LEVELS)}]`")
+                await e.delete()
+                return
+            self.events.set_level(level)
+            await self.db.set_config('log_level', level)
+        w = self.events.writer
+        await self.log(f"📝 Рівень логу: {self.events.level} · у черзі {w.backlog} · відкинуто {w.dropped}\n"
+                       f"`{self.events.path}`")
+        await e.delete()
+
+    async def _handle_chatid(self, e, args: list[str]) -> None:
         await self.log(f"🆔 {await self.get_chat_name(e.chat_id)}: `{e.chat_id}`")
         await e.delete()
 
-    async def _handle_start(self, e) -> None:
+    async def _handle_start(self, e, args: list[str]) -> None:
         await self.log(
             "👋 Вітаю!\n\n"
             "Бот надсилає повторювані повідомлення.\n\n"
@@ -558,87 +1118,334 @@ class Account:
         )
         await e.delete()
 
+    async def _handle_cmdstats(self, e, args: list[str]) -> None:
+        lines = [
+            f"• !{name}: {st['count']} · сер. {st['avg_ms']:.0f} мс · макс. {st['max_ms']:.0f} мс\n"
+            for name, st in self.router.stats().items() if st['count']
+        ]
+        await self.log("⏱ Команди:\n\n" + ("".join(lines) or "ще не викликались"))
+        await e.delete()
+
+    async def _handle_metrics(self, e, args: list[str]) -> None:
+        await self.collect_gauges()
+        await self.log(format_metrics(self.metrics, WATCHDOG))
+        await e.delete()
+
+    async def _handle_profile(self, e, args: list[str]) -> None:
+        if not args:
+            seconds = 30
+        else:
+            seconds = int(args[0]) if args[0].isdigit() else parse_time(args[0])
+        mode = args[1].lower() if len(args) > 1 else 'stacks'
+        if not seconds or mode not in ('stacks', 'cprofile'):
+            await self.log("❌ `!profile <сек> [cprofile]`")
+            await e.delete()
+            return
+        seconds = min(seconds, PROFILE_MAX_SEC)
+        await e.delete()
+        await self.log(f"🔬 Профілювання {format_time(seconds)} ({mode})...")
+        try:
+            path, top = await profile(seconds, os.path.join('data', self.account_id), mode)
+        except RuntimeError as err:
+            await self.log(f"❌ {err}")
+            return
+        lines = "".join(f"\n• {name}: {share:.0%}" for name, share in top)
+        await self.log(f"🔬 Профіль: `{path}`{lines}")
+
+    async def collect_gauges(self) -> None:
+        """Оновлює показники перед експортом; призупинені рахуються в БД, решта — з пам'яті."""
+        m = self.metrics
+        m.set('userbot_tasks', len(self.scheduler), (('status', 'active'),))
+        if self.state == 'running':
+            m.set('userbot_tasks', await self.db.count_tasks('paused'), (('status', 'paused'),))
+        m.set('userbot_send_queue', self.governor.waiting)
+        m.set('userbot_db_queue', self.db.stats()['queue'])
+        if hasattr(self.client, 'updates_dropped'):
+            m.set('userbot_updates_dropped_total', self.client.updates_dropped)
+
     def _register_handlers(self) -> None:
-        self.client.on(events.NewMessage(outgoing=True, pattern=r'^!spam'))(self._handle_spam)
-        self.client.on(events.NewMessage(outgoing=True, pattern=r'^!stop'))(self._handle_stop)
-        self.client.on(events.NewMessage(outgoing=True, pattern=r'^!pause(?!all)'))(self._handle_pause)
-        self.client.on(events.NewMessage(outgoing=True, pattern=r'^!pauseall'))(self._handle_pauseall)
-        self.client.on(events.NewMessage(outgoing=True, pattern=r'^!continue(?!all)'))(self._handle_continue)
-        self.client.on(events.NewMessage(outgoing=True, pattern=r'^!continueall'))(self._handle_continueall)
-        self.client.on(events.NewMessage(outgoing=True, pattern=r'^!status'))(self._handle_status)
-        self.client.on(events.NewMessage(outgoing=True, pattern=r'^!help'))(self._handle_help)
-        self.client.on(events.NewMessage(outgoing=True, pattern=r'^!setlog'))(self._handle_setlog)
-        self.client.on(events.NewMessage(outgoing=True, pattern=r'^!chatid'))(self._handle_chatid)
-        self.client.on(events.NewMessage(outgoing=True, pattern=r'^!start'))(self._handle_start)
+        self.router = CommandRouter('!')
+        for name, handler in (
+            ('spam', self._handle_spam),
+            ('cron', self._handle_cron),
+            ('preview', self._handle_preview),
+            ('stop', self._handle_stop),
+            ('pause', self._handle_pause),
+            ('pauseall', self._handle_pauseall),
+            ('continue', self._handle_continue),
+            ('continueall', self._handle_continueall),
+            ('catchup', self._handle_catchup),
+            ('status', self._handle_status),
+            ('cmdstats', self._handle_cmdstats),
+            ('metrics', self._handle_metrics),
+            ('profile', self._handle_profile),
+            ('help', self._handle_help),
+            ('setlog', self._handle_setlog),
+            ('loglevel', self._handle_loglevel),
+            ('chatid', self._handle_chatid),
+            ('start', self._handle_start),
+        ):
+            self.router.add(name, handler)
+        self.router.register(self.client)
 
     async def start(self) -> None:
-        init_db(self.account_id)
-        saved = self.db.get_config('log_chat_id', default=None)
-        if saved and saved != 'me':
-            self.log_chat = int(saved)
-
-        await self.client.start(phone=self.phone)
-        me = await self.client.get_me()
-        self.username = f"@{me.username}" if me.username else me.first_name
-        self._log("✅ Запущено")
-
-        if isinstance(self.log_chat, int):
-            async for d in self.client.iter_dialogs(limit=100):
-                if d.id == self.log_chat:
-                    self._log(f"✅ Лог-чат: {d.name}")
-                    break
-
-        for r in self.db.get_all_spam_tasks(status='active'):
-            remaining = r['total_count'] - r['sent_count']
-            if remaining > 0:
-                wd = parse_weekdays_from_db(r['weekdays'] if 'weekdays' in r.keys() else None)
-                st = r['scheduled_time'] if 'scheduled_time' in r.keys() else None
-                self._start(r['chat_id'], r['task_id'],
-                           self._spam(r['chat_id'], r['task_id'], r['message'], r['delay'], remaining,
-                                     scheduled_time=st, weekdays=wd))
-                self._log(f"✅ [{r['task_id']}] відновлено")
+        """
+        Старт акаунта по фазах: db, connect, auth, dialogs, rehydrate.
+        Тривалість кожної — в self.boot. Повторний виклик після помилки безпечний.
+        """
+        self.state = 'starting'
+        self.boot.clear()
+        # Метрики належать циклу: замір з потоку БД передається сюди
+        self.db.set_observer(self._observe_db, asyncio.get_running_loop())
+        with self._phase('db'):
+            await self.db.init()
+            await self.entities.load()
+            await self.media.prune()
+            level = await self.db.get_config('log_level', default=None)
+            if level in LEVELS:
+                self.events.set_level(level)
+            saved = await self.db.get_config('log_chat_id', default=None)
+            if saved and saved != 'me':
+                self.log_chat = int(saved)
+
+        with self._phase('connect'):
+            await self.client.connect()
+        with self._phase('auth'):
+            if await self.client.is_user_authorized():
+                await self.client.start(phone=self.phone)
             else:
-                self.db.remove_spam_task(r['task_id'])
-
+                async with _LOGIN_LOCK:
+                    await self.client.start(phone=self.phone)
+            me = await self.client.get_me()
+        self.username = self.events.name = f"@{me.username}" if me.username else me.first_name
+        self._log("✅ Запущено", event='started')
+        self.logs.start()
+
+        with self._phase('dialogs'):
+            # Назва лог-чату — з кешу сутностей, без сканування діалогів
+            if isinstance(self.log_chat, int):
+                self._log(f"✅ Лог-чат: {await self.get_chat_name(self.log_chat)}", event='log_chat')
+
+        self.scheduler.start()
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        with self._phase('rehydrate'):
+            now = int(time.time())
+            finished, restored, slot = [], 0, 0
+            rows = await self.db.get_all_spam_tasks(status='active')
+            # Порядок надолуження — за збереженим next_fire_at: рестарт не перемішує чергу,
+            # а найдовше прострочені йдуть першими
+            rows.sort(key=lambda r: (r['next_fire_at'] or 0, r['task_id']))
+            for r in rows:
+                if r['total_count'] - r['sent_count'] > 0:
+                    try:
+                        slot += self._rehydrate(r, now, slot)
+                    except ValueError as e:
+                        # Один зіпсований рядок не повинен зупиняти весь акаунт
+                        self._log(f"[{r['task_id']}] Пропущено при відновленні: {e}", 'error',
+                                  'restore_failed', tid=r['task_id'], error=str(e))
+                        continue
+                    restored += 1
+                else:
+                    finished.append(r['task_id'])
+            if finished:
+                await self.db.remove_tasks(finished)
+        if restored:
+            self._log(f"✅ Відновлено розсилок: {restored} (надолуження: {slot})", event='restored',
+                      restored=restored, catchup=slot)
+
+        self.state = 'running'
+        self.last_error = None
+        self._log("⏱ Старт " + format_boot(self.boot), event='boot',
+                  phases={k: round(v, 3) for k, v in self.boot.items()})
         await self.log("✅ Userbot запущено\n`!help` — довідка")
 
-    def stop(self) -> None:
-        for ct in self.active_tasks.values():
-            for t in ct.values():
-                t.cancel()
+    async def stop(self) -> None:
+        self.scheduler.stop()
+        if self._flush_task:
+            self._flush_task.cancel()
+        await self.media.close()
+        await self.db.flush()
+        await self.logs.close()
 
 
 # ============ MAIN ============
 
-async def main() -> None:
+async def main() -> int | None:
     accounts_cfg = load_accounts()
     if not accounts_cfg:
         print("[ERROR] Не знайдено акаунтів в .env")
         return
 
+    # Під супервізором процес бере лише свою частину акаунтів
+    shard = os.getenv('WORKER_SHARD')
+    if shard is not None:
+        count = int(os.getenv('WORKER_COUNT', '1'))
+        accounts_cfg = [c for i, c in enumerate(accounts_cfg) if i % count == int(shard)]
+        if not accounts_cfg:
+            return
+
     accounts = [Account(**c) for c in accounts_cfg]
     print(f"[INFO] Завантажено {len(accounts)} акаунт(ів)")
 
-    stop_event = asyncio.Event()
+    global WATCHDOG
+    if LOOP_WATCHDOG:
+        WATCHDOG = LoopWatchdog(threshold=LOOP_LAG_WARN_MS / 1000, log=accounts[0]._log)
+        WATCHDOG.start()
+    profile_task = None
+    if PROFILE_ON_START > 0:
+        async def _profile_start() -> None:
+            path, _ = await profile(min(PROFILE_ON_START, PROFILE_MAX_SEC), os.path.join('data', accounts[0].account_id))
+            accounts[0]._log(f"Профіль старту: {path}", event='profile', path=path)
+        profile_task = asyncio.create_task(_profile_start())
 
-    async def _shutdown(sig: signal.Signals) -> None:
-        print(f"[INFO] {sig.name}, зберігаємо стан...")
+    stop_event = asyncio.Event()
+    closing = asyncio.Event()
+    start_limit = asyncio.Semaphore(max(1, START_CONCURRENCY))
+
+    async def _run_account(a: Account, settled: asyncio.Event) -> None:
+        """Стартує акаунт; при помилці позначає його degraded і повторює з backoff."""
+        attempt = 0
+        while True:
+            try:
+                async with start_limit:
+                    await a.start()
+                settled.set()
+                return
+            except Exception as e:
+                a.state = 'degraded'
+                a.last_error = f"{type(e).__name__}: {e}"
+                settled.set()
+            delay = min(START_RETRY_MAX, START_RETRY_BASE * 2 ** attempt)
+            attempt += 1
+            a._log(f"Старт не вдався ({a.last_error}), повтор через {format_time(delay)}", 'error',
+                   'start_failed', error=a.last_error, retry_in=delay)
+            with contextlib.suppress(Exception):
+                await a.client.disconnect()
+            await asyncio.sleep(delay)
+
+    # settled — перша спроба старту акаунта завершилась (успішно чи ні)
+    settled = [asyncio.Event() for _ in accounts]
+    starters = [asyncio.create_task(_run_account(a, ev)) for a, ev in zip(accounts, settled)]
+
+    health_task = None
+    if shard is not None:
+        health_task = asyncio.create_task(_health_loop(int(shard), accounts))
+
+    exporter = None
+    if METRICS_PORT or METRICS_FILE:
+        n = int(shard) if shard is not None else 0
+        metrics_file = METRICS_FILE
+        if METRICS_FILE and shard is not None:
+            # metrics.prom -> metrics.0.prom: textfile collector читає лише *.prom
+            root, ext = os.path.splitext(METRICS_FILE)
+            metrics_file = f"{root}.{n}{ext}"
+        exporter = MetricsExporter(accounts, CONTROL_HOST, METRICS_PORT + n if METRICS_PORT else 0,
+                                   metrics_file or None, METRICS_INTERVAL,
+                                   [WATCHDOG.metrics] if WATCHDOG else [], accounts[0]._log)
+        print(f"[INFO] Метрики: {', '.join(await exporter.start())}")
+
+    api = None
+    if CONTROL_PORT or CONTROL_SOCKET:
+        # Під супервізором кожен воркер слухає свій порт/сокет: CONTROL_PORT + shard, CONTROL_SOCKET.shard
+        n = int(shard) if shard is not None else 0
+        socket_path = f"{CONTROL_SOCKET}.{n}" if CONTROL_SOCKET and shard is not None else CONTROL_SOCKET
+        api = ControlAPI({a.account_id: a for a in accounts}, CONTROL_HOST,
+                         CONTROL_PORT + n if CONTROL_PORT else 0, socket_path or None, CONTROL_TOKEN or None)
+        print(f"[INFO] Control API: {await api.start()}")
+
+    async def _shutdown(reason: str) -> None:
+        # Сигнал може прийти двічі: від терміналу і від супервізора
+        if closing.is_set():
+            return
+        closing.set()
+        print(f"[INFO] {reason}, зберігаємо стан...")
+        if health_task:
+            health_task.cancel()
+        if profile_task and not profile_task.done():
+            profile_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await profile_task
+        if api:
+            await api.close()
+        if exporter:
+            await exporter.close()
+        if WATCHDOG:
+            WATCHDOG.stop()
+        for t, ev in zip(starters, settled):
+            t.cancel()
+            ev.set()
         for a in accounts:
-            a.stop()
+            await a.stop()
         await asyncio.gather(*[a.client.disconnect() for a in accounts])
+        for a in accounts:
+            await a.db.close()
+            a.state = 'stopped'
+        if shard is not None:
+            _write_health(int(shard), accounts)
+        close_writer()
         print("[INFO] Виходимо")
         stop_event.set()
 
     loop = asyncio.get_event_loop()
     for sig in (signal.SIGTERM, signal.SIGINT):
-        loop.add_signal_handler(sig, lambda s=sig: asyncio.create_task(_shutdown(s)))
+        loop.add_signal_handler(sig, lambda s=sig: asyncio.create_task(_shutdown(s.name)))
 
+    started = time.perf_counter()
+    await asyncio.gather(*[ev.wait() for ev in settled])
+    running = sum(a.state == 'running' for a in accounts)
+    print(f"[INFO] Запущено {running}/{len(accounts)} акаунт(ів) за {time.perf_counter() - started:.2f}с")
     for a in accounts:
-        await a.start()
+        if a.state != 'running':
+            print(f"[WARN] {a.account_id}: {a.state}" + (f" ({a.last_error})" if a.last_error else ""))
+
+    async def _clients_lost() -> None:
+        """
+        Завершується, коли клієнти всіх запущених акаунтів від'єднались назавжди
+        (відкликана сесія, скинутий ключ авторизації) — як run_until_disconnected раніше.
+        Акаунти, що піднялись пізніше (повторний старт), додаються до спостереження.
+        """
+        watched: set[str] = set()
+        while True:
+            live = [a for a in accounts if a.state == 'running' and a.account_id not in watched]
+            if not live:
+                if watched:
+                    return
+                # Жоден акаунт ще не запустився — чекаємо на повторні спроби старту
+                await asyncio.sleep(START_RETRY_BASE)
+                continue
+            watched.update(a.account_id for a in live)
+            await asyncio.gather(*[a.client.run_until_disconnected() for a in live], return_exceptions=True)
 
     print("[INFO] ⛔️ Ctrl+C для виходу")
-    await asyncio.gather(*[a.client.run_until_disconnected() for a in accounts])
+    lost = asyncio.create_task(_clients_lost())
+    stopped = asyncio.create_task(stop_event.wait())
+    await asyncio.wait([lost, stopped], return_when=asyncio.FIRST_COMPLETED)
+    if not closing.is_set():
+        # Без клієнтів процес нічого не робить: виходимо з помилкою, щоб супервізор або systemd перезапустили його
+        await _shutdown("Усі клієнти від'єднались")
+        return 1
+    lost.cancel()
+    await stop_event.wait()
+    return None
+
+
+async def _health_loop(shard: int, accounts: list[Account]) -> None:
+    while True:
+        _write_health(shard, accounts)
+        await asyncio.sleep(WORKER_HEALTH_SEC)
+
+
+def _write_health(shard: int, accounts: list[Account]) -> None:
+    """Звіт воркера для супервізора: стан кожного акаунта."""
+    supervisor.write_json(supervisor.health_path(shard), {
+        'ts': time.time(),
+        'pid': os.getpid(),
+        'accounts': {a.account_id: a.summary() for a in accounts},
+    })
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
\ No newline at end of file
+    if PROCESS_WORKERS > 1 and 'WORKER_SHARD' not in os.environ:
+        sys.exit(supervisor.run(max(1, min(PROCESS_WORKERS, len(load_accounts())))))
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,181 @@
+# media_cache.py
+import asyncio
+import os
+
+from telethon import errors
+from telethon.tl import types
+
+from event_log import print_log
+
+
+class _Media:
+    __slots__ = ('kind', 'file_id', 'access_hash', 'file_reference', 'size', 'path', 'src_chat', 'src_msg')
+
+    def __init__(self, kind: str, file_id: int, access_hash: int, file_reference: bytes, size: int,
+                 path: str | None, src_chat: int | None, src_msg: int | None) -> None:
+        self.kind = kind
+        self.file_id = file_id
+        self.access_hash = access_hash
+        self.file_reference = file_reference
+        self.size = size
+        self.path = path
+        self.src_chat = src_chat
+        self.src_msg = src_msg
+
+    def input(self):
+        if self.kind == 'photo':
+            return types.InputPhoto(self.file_id, self.access_hash, self.file_reference)
+        return types.InputDocument(self.file_id, self.access_hash, self.file_reference)
+
+
+def message_ref(msg) -> tuple[str, int, int, bytes, int] | None:
+    """(kind, id, access_hash, file_reference, розмір) фото чи документа з повідомлення."""
+    media = getattr(msg, 'media', None)
+    if isinstance(media, types.MessageMediaPhoto) and isinstance(media.photo, types.Photo):
+        kind, obj = 'photo', media.photo
+    elif isinstance(media, types.MessageMediaDocument) and isinstance(media.document, types.Document):
+        kind, obj = 'document', media.document
+    else:
+        return None
+    size = (msg.file.size if msg.file else 0) or 0
+    return kind, obj.id, obj.access_hash, obj.file_reference, size
+
+
+class MediaCache:
+    """
+    Медіа розсилок: файл завантажується в Telegram один раз, далі кожне
+    відправлення посилається на нього через file_reference, збережений у БД.
+    Коли Telegram відповідає FileReferenceExpired, посилання оновлюється з
+    вихідного повідомлення, а якщо його вже немає — файл перезавантажується
+    з локальної копії (data/<акаунт>/media).
+
+    Для створення розсилки достатньо id і access_hash файлу: локальна копія
+    завантажується у фоні і лише для файлів до local_max байт — команда не чекає
+    на завантаження великого відео.
+    """
+
+    def __init__(self, client, db, folder: str, local_max: int = 20 << 20, log=print_log) -> None:
+        self.client = client
+        self.db = db
+        self.folder = folder
+        self.local_max = local_max
+        self._log = log
+        self._items: dict[int, _Media] = {}
+        self._downloads: dict[int, asyncio.Task] = {}
+        self.hits = 0
+        self.refreshes = 0
+        self.uploads = 0
+        self.bytes_saved = 0
+
+    async def prune(self) -> None:
+        """Видаляє медіа, на які вже не посилається жодна розсилка."""
+        for path in await self.db.prune_media():
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    async def capture(self, msg) -> int | None:
+        """Запам'ятовує медіа повідомлення. Повертає media_id або None, якщо медіа не підтримується."""
+        ref = message_ref(msg)
+        if ref is None:
+            return None
+        kind, file_id, access_hash, file_reference, size = ref
+        media_id = await self.db.find_media(kind, file_id)
+        if media_id is not None:
+            return media_id
+        media_id = await self.db.add_media(kind, file_id, access_hash, file_reference, size, None,
+                                           msg.chat_id, msg.id)
+        if size <= self.local_max:
+            task = asyncio.create_task(self._download(media_id, msg, os.path.join(self.folder, f"{kind}_{file_id}")))
+            self._downloads[media_id] = task
+            task.add_done_callback(lambda _: self._downloads.pop(media_id, None))
+        return media_id
+
+    async def _download(self, media_id: int, msg, target: str) -> None:
+        """Фонове завантаження локальної копії — запасного варіанту, коли посилання вже не оновити."""
+        path = None
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            path = await self.client.download_media(msg, file=target)
+            if path and await self.db.set_media_path(media_id, path):
+                m = self._items.get(media_id)
+                if m is not None:
+                    m.path = path
+                return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._log(f"Медіа {media_id}: локальну копію не збережено: {e}", 'warn', 'media_download_failed',
+                      media_id=media_id, error=type(e).__name__)
+        finally:
+            # Скасоване або непотрібне (розсилку вже видалено) завантаження не лишає файлів
+            if path is None and os.path.exists(target):
+                os.remove(target)
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    async def close(self) -> None:
+        for task in list(self._downloads.values()):
+            task.cancel()
+        await asyncio.gather(*self._downloads.values(), return_exceptions=True)
+
+    async def _get(self, media_id: int) -> _Media:
+        m = self._items.get(media_id)
+        if m is None:
+            r = await self.db.get_media(media_id)
+            if r is None:
+                raise ValueError(f"медіа {media_id} не знайдено")
+            m = _Media(r['kind'], r['file_id'], r['access_hash'], r['file_reference'], r['size'],
+                       r['path'], r['src_chat'], r['src_msg'])
+            self._items[media_id] = m
+        return m
+
+    async def _update(self, media_id: int, m: _Media, ref, src) -> None:
+        _, m.file_id, m.access_hash, m.file_reference, _ = ref
+        m.src_chat, m.src_msg = src.chat_id, src.id
+        await self.db.update_media_ref(media_id, m.file_id, m.access_hash, m.file_reference,
+                                       m.src_chat, m.src_msg)
+
+    async def send(self, peer, text: str, media_id: int):
+        m = await self._get(media_id)
+        try:
+            msg = await self.client.send_message(peer, text, file=m.input())
+            self.hits += 1
+            self.bytes_saved += m.size
+            return msg
+        except errors.FileReferenceExpiredError:
+            pass
+
+        # Свіже посилання з вихідного повідомлення
+        if m.src_chat is not None:
+            try:
+                src = await self.client.get_messages(m.src_chat, ids=m.src_msg)
+                ref = message_ref(src) if src else None
+                if ref and ref[1] == m.file_id:
+                    await self._update(media_id, m, ref, src)
+                    msg = await self.client.send_message(peer, text, file=m.input())
+                    self.refreshes += 1
+                    self.bytes_saved += m.size
+                    return msg
+            except (errors.FileReferenceExpiredError, ValueError, errors.RPCError):
+                pass
+
+        # Останній варіант — завантажити локальну копію ще раз; надіслане повідомлення
+        # стає новим джерелом посилання
+        if not m.path or not os.path.exists(m.path):
+            raise ValueError(f"медіа {media_id}: посилання застаріло, локальної копії немає")
+        msg = await self.client.send_message(peer, text, file=m.path)
+        self.uploads += 1
+        ref = message_ref(msg)
+        if ref is not None:
+            await self._update(media_id, m, ref, msg)
+        return msg
+
+    def stats(self) -> dict:
+        sends = self.hits + self.refreshes + self.uploads
+        return {
+            'sends': sends,
+            'hit_rate': (self.hits + self.refreshes) / sends if sends else 0.0,
+            'refreshes': self.refreshes,
+            'uploads': self.uploads,
+            'bytes_saved': self.bytes_saved,
+        }
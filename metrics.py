@@ -0,0 +1,226 @@
+# metrics.py
+import asyncio
+import bisect
+import os
+import time
+
+from event_log import print_log
+
+# Межі кошиків гістограм (с)
+DRIFT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+API_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+_HELP = {
+    'userbot_sends_total': ('counter', 'Успішні відправлення розсилок'),
+    'userbot_send_errors_total': ('counter', 'Помилки відправлень за типом винятку'),
+    'userbot_send_drift_seconds': ('histogram', 'Запізнення відправлення відносно запланованого часу'),
+    'userbot_api_latency_seconds': ('histogram', 'Тривалість викликів Telegram API'),
+    'userbot_db_latency_seconds': ('histogram', 'Тривалість операцій БД разом з очікуванням у черзі'),
+    'userbot_tasks': ('gauge', 'Розсилки за статусом'),
+    'userbot_send_queue': ('gauge', 'Відправлення, що чекають на дозвіл governor'),
+    'userbot_db_queue': ('gauge', 'Операції в черзі потоку БД'),
+    'userbot_updates_dropped_total': ('counter', 'Вхідні оновлення, відкинуті до обробки'),
+    'userbot_clock_jumps_total': ('counter', 'Стрибки настінного годинника (jump) і пробудження після сну (suspend)'),
+    'userbot_clock_jump_seconds': ('gauge', 'Величина останнього стрибка годинника'),
+    'userbot_loop_lag_seconds': ('histogram', 'Запізнення пробудження event loop'),
+    'userbot_loop_blocked_total': ('counter', 'Епізоди, коли event loop не відповідав довше порогу'),
+}
+
+
+class Histogram:
+    """Фіксовані кошики: observe — bisect і два додавання, без алокацій."""
+    __slots__ = ('bounds', 'counts', 'sum', 'count', 'max')
+
+    def __init__(self, bounds: tuple) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Оцінка квантиля: верхня межа кошика, куди він потрапляє."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+
+def _num(v: float) -> str:
+    """Значення без втрати точності: {:g} лишає 6 значущих цифр і ламає rate() великих лічильників."""
+    v = float(v)
+    if v != v:
+        return 'NaN'
+    if v in (float('inf'), float('-inf')):
+        return '+Inf' if v > 0 else '-Inf'
+    if v.is_integer() and abs(v) < 2 ** 53:
+        return str(int(v))
+    return repr(v)
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+
+class Metrics:
+    """
+    Лічильники, гістограми й показники одного акаунта.
+    Ключ — (назва, кортеж пар міток); мітка account додається при експорті.
+    account_id=None — метрики процесу, без мітки account.
+    """
+
+    def __init__(self, account_id: str | None) -> None:
+        self.account_id = account_id
+        self.counters: dict[tuple, float] = {}
+        self.histograms: dict[tuple, Histogram] = {}
+        self.gauges: dict[tuple, float] = {}
+
+    def inc(self, name: str, labels: tuple = (), value: float = 1) -> None:
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def histogram(self, name: str, bounds: tuple, labels: tuple = ()) -> Histogram:
+        key = (name, labels)
+        h = self.histograms.get(key)
+        if h is None:
+            h = self.histograms[key] = Histogram(bounds)
+        return h
+
+    def observe(self, name: str, bounds: tuple, value: float, labels: tuple = ()) -> None:
+        self.histogram(name, bounds, labels).observe(value)
+
+    def set(self, name: str, value: float, labels: tuple = ()) -> None:
+        self.gauges[(name, labels)] = value
+
+    def total(self, name: str) -> float:
+        return sum(v for (n, _), v in self.counters.items() if n == name)
+
+    def merged(self, name: str) -> Histogram | None:
+        """Гістограма name, зведена по всіх мітках."""
+        merged = None
+        for (n, _), h in list(self.histograms.items()):
+            if n != name:
+                continue
+            if merged is None:
+                merged = Histogram(h.bounds)
+            merged.counts = [a + b for a, b in zip(merged.counts, h.counts)]
+            merged.sum += h.sum
+            merged.count += h.count
+            merged.max = max(merged.max, h.max)
+        return merged
+
+
+def render(registries: list[Metrics]) -> str:
+    """Prometheus text format 0.0.4 для всіх акаунтів процесу."""
+    series: dict[str, list[str]] = {}
+    for m in registries:
+        acc = (('account', m.account_id),) if m.account_id is not None else ()
+        for (name, labels), v in list(m.counters.items()) + list(m.gauges.items()):
+            series.setdefault(name, []).append(f"{name}{_labels(acc + labels)} {_num(v)}")
+        for (name, labels), h in list(m.histograms.items()):
+            lines = series.setdefault(name, [])
+            cumulative = 0
+            for bound, n in zip(h.bounds + ('+Inf',), h.counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels(acc + labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(acc + labels)} {_num(h.sum)}")
+            lines.append(f"{name}_count{_labels(acc + labels)} {h.count}")
+    out = []
+    for name, lines in series.items():
+        kind, text = _HELP.get(name, ('untyped', name))
+        out.append(f"# HELP {name} {text}")
+        out.append(f"# TYPE {name} {kind}")
+        out.extend(lines)
+    return '\n'.join(out) + '\n'
+
+
+class MetricsExporter:
+    """
+    Віддає метрики акаунтів процесу: HTTP на 127.0.0.1:port (будь-який шлях, зазвичай /metrics)
+    і/або файл, що перезаписується раз на interval секунд (textfile collector node_exporter).
+    Перед кожним експортом акаунти оновлюють свої показники (collect_gauges).
+    Помилки запису файлу йдуть у log (сигнатура Account._log).
+    """
+
+    def __init__(self, accounts: list, host: str = '127.0.0.1', port: int = 0,
+                 path: str | None = None, interval: float = 15.0, extra: list[Metrics] = (),
+                 log=print_log) -> None:
+        self.accounts = accounts
+        self._log = log
+        self.extra = list(extra)
+        self.host = host
+        self.port = port
+        self.path = path
+        self.interval = interval
+        self._server: asyncio.AbstractServer | None = None
+        self._task: asyncio.Task | None = None
+
+    async def text(self) -> str:
+        for a in self.accounts:
+            await a.collect_gauges()
+        return render([a.metrics for a in self.accounts] + self.extra)
+
+    async def start(self) -> list[str]:
+        where = []
+        if self.port:
+            self._server = await asyncio.start_server(self._serve, self.host, self.port)
+            host, port = self._server.sockets[0].getsockname()[:2]
+            where.append(f"http://{host}:{port}/metrics")
+        if self.path:
+            self._task = asyncio.create_task(self._file_loop())
+            where.append(self.path)
+        return where
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self.path:
+            await self._write_file()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            await reader.readuntil(b'\r\n\r\n')
+            data = (await self.text()).encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                         b"Content-Length: %d\r\nConnection: close\r\n\r\n%s" % (len(data), data))
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _write_file(self) -> None:
+        data = await self.text()
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+
+    async def _file_loop(self) -> None:
+        while True:
+            started = time.monotonic()
+            try:
+                await self._write_file()
+            except Exception as e:
+                self._log(f"Метрики: {e}", 'error', 'metrics_error', path=self.path, error=type(e).__name__)
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
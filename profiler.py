@@ -0,0 +1,249 @@
+# profiler.py
+import asyncio
+import collections
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+
+from event_log import print_log
+from metrics import Metrics
+
+LAG_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+# Лист стеку, коли цикл просто чекає на події
+_IDLE_LEAF = 'selectors.py:select'
+
+
+def frame_label(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def collapse(frame) -> str:
+    """Стек у форматі collapsed stacks (flamegraph.pl, speedscope): корінь;...;лист."""
+    parts = []
+    while frame is not None:
+        parts.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(parts))
+
+
+def _site(frame) -> str:
+    """Місце блокування: найглибший кадр коду бота, а якщо його немає — найглибший взагалі."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    f = frame
+    while f is not None:
+        if os.path.dirname(os.path.abspath(f.f_code.co_filename)) == here:
+            return f"{os.path.basename(f.f_code.co_filename)}:{f.f_lineno} {f.f_code.co_name}"
+        f = f.f_back
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+
+
+class LoopWatchdog:
+    """
+    Сторож event loop. Корутина-пульс прокидається кожні interval секунд і пише
+    запізнення пробудження в гістограму userbot_loop_lag_seconds. Окремий потік
+    перевіряє пульс: якщо цикл не відповідає довше threshold, він знімає стек
+    потоку циклу — тобто ловить код, що блокує, на місці, без asyncio debug.
+    log — логер із сигнатурою Account._log; викликається в потоці циклу.
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.25, log=print_log) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self._log = log
+        self.metrics = Metrics(None)
+        self._lag = self.metrics.histogram('userbot_loop_lag_seconds', LAG_BUCKETS)
+        # місце -> [кількість, сумарний час (с), найдовше (с)]
+        self.blocks: dict[str, list] = {}
+        self._beat = time.monotonic()
+        self._loop_thread = threading.get_ident()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+        self._running = False
+
+    def start(self) -> None:
+        self._loop_thread = threading.get_ident()
+        self._loop = asyncio.get_running_loop()
+        self._beat = time.monotonic()
+        self._running = True
+        self._task = asyncio.create_task(self._pulse())
+        self._thread = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _pulse(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._lag.observe(max(0.0, loop.time() - expected))
+
+    def _watch(self) -> None:
+        step = self.interval / 2
+        beat, site, stalled = None, None, 0.0
+        while self._running:
+            time.sleep(step)
+            now_beat = self._beat
+            stale = time.monotonic() - now_beat - self.interval
+            if stale > self.threshold:
+                if beat != now_beat:
+                    # Новий епізод: місце блокування — зі стеку в цю мить
+                    frame = sys._current_frames().get(self._loop_thread)
+                    beat, site = now_beat, _site(frame) if frame is not None else '?'
+                stalled = stale
+            elif beat is not None and now_beat != beat:
+                self._record(site, stalled)
+                beat, site = None, None
+
+    def _record(self, site: str, seconds: float) -> None:
+        st = self.blocks.setdefault(site, [0, 0.0, 0.0])
+        st[0] += 1
+        st[1] += seconds
+        st[2] = max(st[2], seconds)
+        self.metrics.inc('userbot_loop_blocked_total')
+        # Логер не потокобезпечний: запис передаємо циклу, який уже відновився
+        msg = f"Цикл заблоковано на {seconds:.2f}с: {site}"
+        with contextlib.suppress(RuntimeError):
+            self._loop.call_soon_threadsafe(
+                lambda: self._log(msg, 'warn', 'loop_blocked', site=site, seconds=round(seconds, 3)))
+
+    def top(self, n: int = 5) -> list[tuple[str, int, float, float]]:
+        """Місця блокувань за сумарним часом: (місце, кількість, сума, максимум)."""
+        items = sorted(list(self.blocks.items()), key=lambda kv: -kv[1][1])[:n]
+        return [(site, c, total, mx) for site, (c, total, mx) in items]
+
+
+def _top(stacks: collections.Counter, n: int) -> list[tuple[str, int]]:
+    """Функції за власним часом (лист стеку); простій циклу — окремим рядком."""
+    leaves = collections.Counter()
+    for stack, count in stacks.items():
+        leaf = stack.rsplit(';', 1)[-1]
+        leaves['(простій)' if leaf == _IDLE_LEAF else leaf] += count
+    return leaves.most_common(n)
+
+
+class SignalSampler:
+    """
+    Семплер за SIGPROF: таймер рахує процесорний час, обробник виконується в
+    головному потоці між інструкціями і бачить саме той кадр, що займає CPU.
+    Потребує, щоб цикл працював у головному потоці (звичайний asyncio.run).
+    """
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.stacks: collections.Counter = collections.Counter()
+        self.samples = 0
+        self._previous = None
+
+    @staticmethod
+    def available() -> bool:
+        return hasattr(signal, 'setitimer') and threading.current_thread() is threading.main_thread()
+
+    def _sample(self, signum, frame) -> None:
+        if frame is not None:
+            self.stacks[collapse(frame)] += 1
+            self.samples += 1
+
+    def start(self) -> None:
+        self._previous = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self) -> None:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self._previous or signal.SIG_DFL)
+
+    def top(self, n: int = 5) -> list[tuple[str, int]]:
+        return _top(self.stacks, n)
+
+
+class StackSampler(threading.Thread):
+    """
+    Запасний семплер: потік кожні interval секунд знімає стек іншого потоку.
+    Зміщений у бік простою — GIL дістається йому переважно, коли цикл чекає в select.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005) -> None:
+        super().__init__(name='stack-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: collections.Counter = collections.Counter()
+        self.samples = 0
+        self._done = threading.Event()
+
+    def run(self) -> None:
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+                self.samples += 1
+
+    def stop(self) -> None:
+        self._done.set()
+        self.join()
+
+    def top(self, n: int = 5) -> list[tuple[str, int]]:
+        return _top(self.stacks, n)
+
+
+_profiling = threading.Lock()
+
+
+async def profile(seconds: float, folder: str, mode: str = 'stacks',
+                  interval: float = 0.005) -> tuple[str, list[tuple[str, float]]]:
+    """
+    Профілює потік event loop протягом seconds (усі акаунти процесу).
+    stacks — семплер процесорного часу, файл *.collapsed; cprofile — cProfile, файл *.pstats (дорожче).
+    Повертає шлях до файлу і топ функцій (назва, частка часу).
+    """
+    if not _profiling.acquire(blocking=False):
+        raise RuntimeError("профілювання вже триває")
+    try:
+        os.makedirs(folder, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        if mode == 'cprofile':
+            prof = cProfile.Profile()
+            prof.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                prof.disable()
+            path = os.path.join(folder, f"profile-{stamp}.pstats")
+            prof.dump_stats(path)
+            stats = pstats.Stats(prof, stream=io.StringIO())
+            total = sum(st[2] for st in stats.stats.values()) or 1.0
+            own = collections.Counter()
+            for (fn, _, name), st in stats.stats.items():
+                # очікування подій у селекторі — простій, а не робота
+                idle = fn == '~' and "of 'select." in name
+                own['(простій)' if idle else f"{os.path.basename(fn)}:{name}"] += st[2]
+            return path, [(name, t / total) for name, t in own.most_common(5)]
+
+        if SignalSampler.available():
+            sampler = SignalSampler(interval)
+        else:
+            sampler = StackSampler(threading.get_ident(), interval)
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            sampler.stop()
+        path = os.path.join(folder, f"profile-{stamp}.collapsed")
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        samples = sampler.samples or 1
+        return path, [(name, n / samples) for name, n in sampler.top()]
+    finally:
+        _profiling.release()
@@ -0,0 +1,57 @@
+# router.py
+import time
+from typing import Awaitable, Callable
+
+from telethon import events
+
+# Обробник отримує подію і вже розібрані аргументи команди
+CommandHandler = Callable[[object, list[str]], Awaitable[None]]
+
+
+class CommandRouter:
+    """
+    Один обробник вихідних повідомлень замість окремого NewMessage на кожну команду.
+    Все, що не починається з префікса, відкидається перевіркою одного символу;
+    решта диспетчеризується за назвою команди через словник.
+    """
+
+    def __init__(self, prefix: str = '!') -> None:
+        self.prefix = prefix
+        self._routes: dict[str, CommandHandler] = {}
+        # назва -> [кількість викликів, сумарний час (с), максимальний час (с)]
+        self._stats: dict[str, list] = {}
+
+    def add(self, name: str, handler: CommandHandler) -> None:
+        self._routes[name] = handler
+        self._stats[name] = [0, 0.0, 0.0]
+
+    def register(self, client) -> None:
+        client.on(events.NewMessage(outgoing=True))(self._dispatch)
+
+    async def _dispatch(self, e) -> None:
+        text = e.raw_text
+        if not text or text[0] != self.prefix:
+            return
+        parts = text[1:].split()
+        if not parts:
+            return
+        handler = self._routes.get(parts[0].lower())
+        if handler is None:
+            return
+
+        started = time.perf_counter()
+        try:
+            await handler(e, parts[1:])
+        finally:
+            elapsed = time.perf_counter() - started
+            st = self._stats[parts[0].lower()]
+            st[0] += 1
+            st[1] += elapsed
+            if elapsed > st[2]:
+                st[2] = elapsed
+
+    def stats(self) -> dict[str, dict]:
+        return {
+            name: {'count': n, 'avg_ms': total / n * 1000 if n else 0.0, 'max_ms': mx * 1000}
+            for name, (n, total, mx) in self._stats.items()
+        }
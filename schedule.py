@@ -0,0 +1,274 @@
+# schedule.py
+import bisect
+import datetime
+import time
+
+ALL_DAYS = 0x7f
+
+# Межі полів cron: хвилина, година, день місяця, місяць, день тижня
+_CRON_LIMITS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+# Спільні екземпляри розкладів: (delay, tod, wdmask, cron) -> Schedule
+_SHARED: dict[tuple, 'Schedule'] = {}
+# Той самий кеш за сирими полями рядка БД, щоб не компілювати розклад для кожної розсилки
+_BY_ROW: dict[tuple, 'Schedule'] = {}
+
+
+def weekdays_to_mask(weekdays: list[int] | None) -> int:
+    if not weekdays:
+        return ALL_DAYS
+    mask = 0
+    for wd in weekdays:
+        mask |= 1 << wd
+    return mask
+
+
+def mask_to_weekdays(mask: int) -> list[int]:
+    return [wd for wd in range(7) if mask >> wd & 1]
+
+
+def _parse_cron_field(field: str, lo: int, hi: int) -> set[int] | None:
+    values = set()
+    for part in field.split(','):
+        step = 1
+        if '/' in part:
+            part, step_s = part.split('/', 1)
+            if not step_s.isdigit() or int(step_s) == 0:
+                return None
+            step = int(step_s)
+        if part == '*':
+            a, b = lo, hi
+        elif '-' in part:
+            a_s, b_s = part.split('-', 1)
+            if not (a_s.isdigit() and b_s.isdigit()):
+                return None
+            a, b = int(a_s), int(b_s)
+        elif part.isdigit():
+            a = b = int(part)
+            if step > 1:
+                b = hi
+        else:
+            return None
+        if a < lo or b > hi or a > b:
+            return None
+        values.update(range(a, b + 1, step))
+    return values
+
+
+class Schedule:
+    """
+    Скомпільований розклад розсилки.
+
+    Інтервальний: затримка + опціональний час доби першого відправлення + дні тижня.
+    Cron: набір хвилин доби + маски днів місяця, місяців і днів тижня.
+    Дні тижня — бітова маска (біт 0 = понеділок). Час доби збирається через
+    локальний календар, тож переходи на літній/зимовий час не зсувають його.
+    Розклад незмінний після створення: розсилки з однаковим розкладом ділять
+    один екземпляр (shared).
+    """
+    __slots__ = ('delay', 'tod', 'wdmask', 'cron', '_times', '_dommask', '_monmask',
+                 '_dom_any', '_dow_any', '_ahead')
+
+    def __init__(self, delay: int, scheduled_time: int | None = None,
+                 weekdays: list[int] | None = None) -> None:
+        self.delay = delay
+        # Час доби в секундах від півночі
+        self.tod = scheduled_time * 60 if scheduled_time is not None else None
+        self.wdmask = weekdays_to_mask(weekdays)
+        self.cron: str | None = None
+        self._times: list[int] | None = None
+        self._dommask = 0
+        self._monmask = 0
+        self._dom_any = True
+        self._dow_any = True
+        # Для кожного дня тижня: скільки днів до найближчого дозволеного (включно з ним)
+        self._ahead = tuple(
+            next(k for k in range(7) if self.wdmask >> ((wd + k) % 7) & 1) for wd in range(7)
+        )
+
+    @classmethod
+    def from_cron(cls, expr: str) -> 'Schedule | None':
+        """
+        Компілює cron-вираз з 5 полів: хвилина година день місяць день_тижня.
+        None — вираз невірний або не спрацьовує ніколи (31 лютого тощо).
+        """
+        fields = expr.split()
+        if len(fields) != 5:
+            return None
+        parsed = [_parse_cron_field(f, lo, hi) for f, (lo, hi) in zip(fields, _CRON_LIMITS)]
+        if any(p is None for p in parsed):
+            return None
+        minutes, hours, doms, months, dows = parsed
+        # cron: 0 і 7 — неділя; у нас неділя = 6
+        weekdays = sorted({(d - 1) % 7 for d in dows})
+        sched = cls(0, None, weekdays)
+        sched.cron = ' '.join(fields)
+        sched._times = sorted(h * 3600 + m * 60 for h in hours for m in minutes)
+        sched._dommask = sum(1 << d for d in doms)
+        sched._monmask = sum(1 << m for m in months)
+        sched._dom_any = fields[2] == '*'
+        sched._dow_any = fields[4] == '*'
+        try:
+            sched._cron_after(time.time())
+        except ValueError:
+            return None
+        return sched
+
+    @classmethod
+    def from_row(cls, r) -> 'Schedule':
+        cron = r['cron'] if 'cron' in r.keys() else None
+        key = (r['delay'], r['scheduled_time'], r['weekdays'], cron)
+        sched = _BY_ROW.get(key)
+        if sched is not None:
+            return sched
+        if cron:
+            sched = cls.from_cron(cron)
+            if sched is None:
+                raise ValueError(f"cron '{cron}' невірний або не спрацьовує")
+        else:
+            weekdays = [int(d) for d in r['weekdays'].split(',')] if r['weekdays'] else None
+            sched = cls(r['delay'], r['scheduled_time'], weekdays)
+        sched = _BY_ROW[key] = sched.shared()
+        return sched
+
+    def shared(self) -> 'Schedule':
+        """Спільний екземпляр для такого самого розкладу (цей, якщо його ще немає)."""
+        return _SHARED.setdefault((self.delay, self.tod, self.wdmask, self.cron), self)
+
+    @property
+    def anchored(self) -> bool:
+        """Спрацювання прив'язані до часу доби (cron або щоденні о фіксованій годині), а не до інтервалу."""
+        return self.cron is not None or (self.tod is not None and self.delay > 0 and self.delay % 86400 == 0)
+
+    @property
+    def weekdays(self) -> list[int] | None:
+        return None if self.wdmask == ALL_DAYS else mask_to_weekdays(self.wdmask)
+
+    # --- Локальний час ---
+
+    @staticmethod
+    def _at(day: datetime.date, seconds: int) -> int:
+        """Мітка часу для локального часу доби seconds у день day."""
+        dt = datetime.datetime.combine(day, datetime.time()) + datetime.timedelta(seconds=seconds)
+        return int(dt.timestamp())
+
+    def _day_allowed(self, day: datetime.date) -> bool:
+        if not self._monmask >> day.month & 1:
+            return False
+        dow_ok = bool(self.wdmask >> day.weekday() & 1)
+        dom_ok = bool(self._dommask >> day.day & 1)
+        # Семантика cron: якщо обмежені обидва поля, достатньо збігу одного
+        if self._dom_any:
+            return dow_ok
+        if self._dow_any:
+            return dom_ok
+        return dow_ok or dom_ok
+
+    def _cron_after(self, ts: float) -> int:
+        dt = datetime.datetime.fromtimestamp(ts)
+        day = dt.date()
+        sec = dt.hour * 3600 + dt.minute * 60 + dt.second
+        i = bisect.bisect_right(self._times, sec)
+        # Пошук не далі ніж на 8 років уперед (29 лютого в неділю тощо)
+        for _ in range(366 * 8):
+            if self._day_allowed(day):
+                for t in self._times[i:]:
+                    cand = self._at(day, t)
+                    if cand > ts:
+                        return cand
+            day += datetime.timedelta(days=1)
+            i = 0
+        raise ValueError(f"cron '{self.cron}' не має жодного спрацювання")
+
+    # --- Обчислення часу ---
+
+    def first_after(self, now: float) -> int:
+        """Час першого відправлення для розсилки, запущеної в момент now."""
+        if self.cron:
+            return self._cron_after(now)
+        dt = datetime.datetime.fromtimestamp(now)
+        today = dt.date()
+        if self.tod is None:
+            # Без фіксованого часу — одразу, якщо день підходить, інакше о 00:00 дозволеного дня
+            ahead = self._ahead[today.weekday()]
+            if ahead == 0:
+                return int(now)
+            return self._at(today + datetime.timedelta(days=ahead), 0)
+        # Фіксований час: сьогодні, якщо ще не минув, інакше найближчий дозволений день
+        if self.wdmask >> today.weekday() & 1:
+            target = self._at(today, self.tod)
+            if target > now:
+                return target
+        tomorrow = today + datetime.timedelta(days=1)
+        ahead = self._ahead[tomorrow.weekday()]
+        return self._at(tomorrow + datetime.timedelta(days=ahead), self.tod)
+
+    def next_after(self, ts: float) -> int:
+        """Наступне відправлення після відправлення в момент ts."""
+        if self.cron:
+            return self._cron_after(ts)
+        nxt = int(ts) + self.delay
+        if self.anchored:
+            # Щоденна розсилка о фіксованій годині: той самий час доби через delay днів
+            # за календарем, тож перехід на літній час і запізнення відправлення його не зсувають
+            day = datetime.datetime.fromtimestamp(nxt).date()
+            nxt = min((self._at(day + datetime.timedelta(days=k), self.tod) for k in (-1, 0, 1)),
+                      key=lambda t: abs(t - int(ts) - self.delay))
+        if self.wdmask == ALL_DAYS:
+            return nxt
+        dt = datetime.datetime.fromtimestamp(nxt)
+        ahead = self._ahead[dt.weekday()]
+        if ahead == 0:
+            return nxt
+        # Зсуваємо на наступний дозволений день, зберігаючи час доби
+        return int((dt + datetime.timedelta(days=ahead)).timestamp())
+
+    def missed(self, planned: float, now: float, limit: int) -> tuple[int, int]:
+        """
+        Скільки спрацювань припало на проміжок [planned, now] (не більше limit)
+        і найближче спрацювання після now.
+        """
+        if planned > now:
+            return 0, int(planned)
+        if not self.cron and self.wdmask == ALL_DAYS and self.delay > 0 and not self.anchored:
+            n = int((now - planned) // self.delay) + 1
+            return min(n, limit), int(planned) + n * self.delay
+        n, ts = 0, int(planned)
+        while ts <= now:
+            if n >= limit:
+                # Далі рахувати не потрібно — лише знайти наступне спрацювання тієї ж сітки
+                return n, self._next_past(ts, now)
+            n += 1
+            ts = self.next_after(ts)
+        return n, ts
+
+    def _next_past(self, ts: int, now: float) -> int:
+        """
+        Перше спрацювання після now на сітці, що йде від ts (як кроки next_after).
+        У межах дозволеного дня інтервальні кроки — просто +delay, тож їх пропускаємо
+        арифметично: ітерацій не більше, ніж днів у проміжку.
+        """
+        if self.cron:
+            return self._cron_after(now)
+        while ts <= now:
+            if not self.anchored and self.delay > 0:
+                day = datetime.datetime.fromtimestamp(ts).date()
+                if self.wdmask >> day.weekday() & 1:
+                    bound = min(int(now), self._at(day + datetime.timedelta(days=1), 0) - 1)
+                    if bound > ts:
+                        ts += (bound - ts) // self.delay * self.delay
+            ts = self.next_after(ts)
+        return ts
+
+    def next_n(self, ts: float, n: int) -> list[int]:
+        """n наступних спрацювань після ts."""
+        if n <= 0:
+            return []
+        if not self.cron and self.wdmask == ALL_DAYS and not self.anchored:
+            base = int(ts)
+            return list(range(base + self.delay, base + self.delay * n + 1, self.delay))
+        out = []
+        for _ in range(n):
+            ts = self.next_after(ts)
+            out.append(ts)
+        return out
@@ -0,0 +1,250 @@
+# scheduler.py
+import asyncio
+import collections
+import heapq
+import itertools
+import time
+from typing import Any, Awaitable, Callable
+
+from event_log import print_log
+
+# Обробник отримує (ключ, payload) і повертає час наступного спрацювання або None
+Handler = Callable[[str, Any], Awaitable[float | None]]
+# Спостерігач отримує (ключ, запланований час, фактичний час запуску обробника)
+Observer = Callable[[str, float, float], None]
+# Після стрибка годинника: (ключ, payload, старий час, стрибок) -> новий час або None (залишити)
+Retarget = Callable[[str, Any, float, float], float | None]
+# Звіт про стрибок: (стрибок годинника, сон системи, скільки записів переплановано)
+ClockObserver = Callable[[float, float, int], None]
+
+# Годинник, що йде й під час сну системи (Linux): відрізняє сон від переведення годинника
+_BOOTTIME = getattr(time, 'CLOCK_BOOTTIME', None)
+
+
+def _wall() -> float:
+    # time.time шукається при кожному виклику: симуляція (benchmarks/sim.py) підмінює його вже після імпорту
+    return time.time()
+
+
+def _boottime() -> float | None:
+    return time.clock_gettime(_BOOTTIME) if _BOOTTIME is not None else None
+
+
+class _Entry:
+    __slots__ = ('when', 'seq', 'key', 'payload', 'alive')
+
+    def __init__(self, when: float, seq: int, key: str, payload) -> None:
+        self.when = when
+        self.seq = seq
+        self.key = key
+        self.payload = payload
+        self.alive = True
+
+    def __lt__(self, other: '_Entry') -> bool:
+        return (self.when, self.seq) < (other.when, other.seq)
+
+
+class Scheduler:
+    """
+    Планувальник на мін-купі дедлайнів.
+    Один таймер на весь акаунт: прокидається лише до найближчого дедлайну
+    і віддає спрацювання обмеженому пулу воркерів.
+
+    Дедлайни — настінний час (clock), а таймер — монотонний, тому спить він
+    шматками не довше max_sleep і на кожному пробудженні звіряє обидва годинники.
+    Якщо їх різниця змінилась більше ніж на jump_threshold (переведення годинника,
+    крок NTP), записи перераховуються через retarget; сон системи (CLOCK_BOOTTIME)
+    стрибком не вважається — прострочені записи просто спрацьовують.
+    Помилки обробника пишуться через log (сигнатура Account._log).
+    """
+
+    def __init__(self, handler: Handler, workers: int = 4, clock: Callable[[], float] | None = None,
+                 resolution: float = 0.05, observer: Observer | None = None,
+                 max_sleep: float = 60.0, jump_threshold: float = 2.0,
+                 retarget: Retarget | None = None, on_clock: ClockObserver | None = None,
+                 log: Callable[..., None] = print_log) -> None:
+        self._handler = handler
+        self._log = log
+        self.observer = observer
+        self.retarget = retarget
+        self.on_clock = on_clock
+        self._clock = clock = clock or _wall
+        self._max_sleep = max_sleep
+        self._jump_threshold = jump_threshold
+        # Різниця настінного і монотонного годинників та показ CLOCK_BOOTTIME на момент звірки
+        self._offset = clock() - time.monotonic()
+        self._mono = time.monotonic()
+        self._boot = _boottime()
+        # Дедлайни ближчі за resolution обробляються одним пробудженням
+        self._resolution = resolution
+        self._workers_n = max(1, workers)
+        self._heap: list[_Entry] = []
+        self._entries: dict[str, _Entry] = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._ready: collections.deque[_Entry] = collections.deque()
+        self._has_ready = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    # --- Керування записами ---
+
+    def add(self, key: str, when: float, payload) -> None:
+        """Додає або переплановує запис."""
+        # when пораховано за поточним годинником: стрибок до цієї миті не має його зсунути
+        self.check_clock()
+        old = self._entries.get(key)
+        if old is not None:
+            old.alive = False
+        entry = _Entry(when, next(self._seq), key, payload)
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+        if self._heap[0] is entry:
+            self._wakeup.set()
+
+    def remove(self, key: str):
+        """Знімає запис з розкладу. Повертає payload або None."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        entry.alive = False
+        return entry.payload
+
+    def clear(self) -> list:
+        """Знімає всі записи. Повертає їх payload."""
+        payloads = []
+        for entry in self._entries.values():
+            entry.alive = False
+            payloads.append(entry.payload)
+        self._entries.clear()
+        self._heap.clear()
+        self._ready.clear()
+        return payloads
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        return entry.payload if entry else None
+
+    def next_fire(self, key: str) -> float | None:
+        entry = self._entries.get(key)
+        return entry.when if entry else None
+
+    def keys(self) -> list[str]:
+        """Ключі всіх записів (копія: розклад можна змінювати під час обходу)."""
+        return list(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # --- Годинник ---
+
+    def check_clock(self) -> float:
+        """
+        Звіряє настінний годинник з монотонним. Якщо він стрибнув, перераховує
+        записи в купі й повертає стрибок (с), інакше 0.
+        """
+        mono = time.monotonic()
+        shift = self._clock() - mono - self._offset
+        if abs(shift) <= self._jump_threshold:
+            self._mono = mono
+            self._boot = _boottime()
+            return 0.0
+        boot = _boottime()
+        slept = 0.0
+        if boot is not None and self._boot is not None:
+            # Монотонний годинник стоїть під час сну системи, CLOCK_BOOTTIME — ні
+            slept = (boot - self._boot) - (mono - self._mono)
+            if slept <= self._jump_threshold:
+                slept = 0.0
+        jump = shift - slept
+        self._offset += shift
+        self._mono, self._boot = mono, boot
+        moved = 0
+        if abs(jump) > self._jump_threshold:
+            if self.retarget is not None:
+                for entry in self._heap:
+                    if not entry.alive:
+                        continue
+                    when = self.retarget(entry.key, entry.payload, entry.when, jump)
+                    if when is not None and when != entry.when:
+                        entry.when = when
+                        moved += 1
+                if moved:
+                    heapq.heapify(self._heap)
+        else:
+            jump = 0.0
+        if self.on_clock is not None:
+            self.on_clock(jump, slept, moved)
+        return jump
+
+    # --- Цикл ---
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks.append(asyncio.create_task(self._run()))
+        for _ in range(self._workers_n):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        self._tasks.clear()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        heap = self._heap
+        ready = self._ready
+        wakeup = self._wakeup
+        while True:
+            wakeup.clear()
+            self.check_clock()
+            now = self._clock()
+            horizon = now + self._resolution
+            # Віддаємо воркерам усе, що вже настало, за один прохід
+            while heap and (not heap[0].alive or heap[0].when <= horizon):
+                entry = heapq.heappop(heap)
+                if entry.alive:
+                    ready.append(entry)
+            if ready:
+                self._has_ready.set()
+            # Навіть без записів прокидаємось шматками, щоб звірка годинника не застарівала
+            delay = heap[0].when - now if heap else self._max_sleep
+            timer = loop.call_later(min(delay, self._max_sleep), wakeup.set)
+            try:
+                await wakeup.wait()
+            finally:
+                timer.cancel()
+
+    async def _worker(self) -> None:
+        ready = self._ready
+        while True:
+            if not ready:
+                self._has_ready.clear()
+                await self._has_ready.wait()
+                continue
+            entry = ready.popleft()
+            if not entry.alive:
+                continue
+            if self.observer is not None:
+                self.observer(entry.key, entry.when, self._clock())
+            try:
+                nxt = await self._handler(entry.key, entry.payload)
+            except Exception as e:
+                self._log(f"[{entry.key}] Помилка планувальника: {e}", 'error', 'scheduler_error',
+                          tid=entry.key, error=type(e).__name__)
+                nxt = None
+            # Запис могли зняти або перепланувати поки працював обробник
+            if self._entries.get(entry.key) is not entry:
+                continue
+            if nxt is None:
+                del self._entries[entry.key]
+                entry.alive = False
+            else:
+                entry.when = nxt
+                entry.seq = next(self._seq)
+                heapq.heappush(self._heap, entry)
+                if self._heap[0] is entry:
+                    self._wakeup.set()
@@ -0,0 +1,171 @@
+# session_store.py
+import base64
+import datetime
+import json
+import os
+import time
+
+from telethon import utils
+from telethon.crypto import AuthKey
+from telethon.sessions import MemorySession, SQLiteSession
+from telethon.tl import types
+
+
+def write_file(path: str, data: bytes) -> None:
+    """Атомарний запис: tmp + fsync + rename."""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class SnapshotSession(MemorySession):
+    """
+    Сесія Telethon у пам'яті зі знімками на диск.
+    Зміни DC і ключа авторизації записуються одразу, решта (сутності,
+    стан оновлень) — не частіше ніж раз на interval секунд і при закритті.
+    Запис виконує write(data) — у Account він іде через потік БД акаунта.
+    """
+
+    def __init__(self, write, interval: float = 60.0, data: bytes | None = None) -> None:
+        super().__init__()
+        self._write = write
+        self.interval = interval
+        # id -> (id, hash, username, phone, name); MemorySession тримає множину
+        # кортежів і шукає по ній перебором
+        self._entities: dict[int, tuple] = {}
+        self._dirty = False
+        self._urgent = False
+        self._last_snapshot = time.monotonic()
+        self.snapshots = 0
+        if data:
+            self._load(data)
+
+    def _load(self, data: bytes) -> None:
+        st = json.loads(data)
+        self._dc_id = st['dc_id'] or 0
+        self._server_address = st['server_address']
+        self._port = st['port']
+        self._auth_key = AuthKey(base64.b64decode(st['auth_key'])) if st['auth_key'] else None
+        self._takeout_id = st['takeout_id']
+        self._entities = {row[0]: tuple(row) for row in st['entities']}
+        for eid, (pts, qts, date, seq, unread) in st['update_states'].items():
+            self._update_states[int(eid)] = types.updates.State(
+                pts, qts, datetime.datetime.fromtimestamp(date, datetime.timezone.utc), seq, unread)
+
+    @classmethod
+    def from_sqlite(cls, path: str, write, interval: float = 60.0) -> 'SnapshotSession':
+        """Переносить стан зі звичайного файлу сесії Telethon (*.session)."""
+        old = SQLiteSession(path)
+        try:
+            s = cls(write, interval)
+            s._dc_id, s._server_address, s._port = old.dc_id, old.server_address, old.port
+            s._auth_key = old.auth_key
+            s._takeout_id = old.takeout_id
+            for eid, state in old.get_update_states():
+                s._update_states[eid] = state
+            c = old._cursor()
+            for row in c.execute('select id, hash, username, phone, name from entities'):
+                s._entities[row[0]] = tuple(row)
+            c.close()
+        finally:
+            old.close()
+        s._urgent = True
+        return s
+
+    # --- Зміни, що мають потрапити на диск ---
+
+    def set_dc(self, dc_id, server_address, port):
+        super().set_dc(dc_id, server_address, port)
+        self._urgent = True
+
+    @MemorySession.auth_key.setter
+    def auth_key(self, value):
+        self._auth_key = value
+        self._urgent = True
+
+    @MemorySession.takeout_id.setter
+    def takeout_id(self, value):
+        self._takeout_id = value
+        self._urgent = True
+
+    def set_update_state(self, entity_id, state):
+        super().set_update_state(entity_id, state)
+        self._dirty = True
+
+    def process_entities(self, tlo):
+        for row in self._entities_to_rows(tlo):
+            if self._entities.get(row[0]) != row:
+                self._entities[row[0]] = row
+                self._dirty = True
+
+    # --- Пошук сутностей ---
+
+    def get_entity_rows_by_id(self, id, exact=True):
+        if exact:
+            row = self._entities.get(id)
+            return (row[0], row[1]) if row else None
+        for pid in (utils.get_peer_id(types.PeerUser(id)),
+                    utils.get_peer_id(types.PeerChat(id)),
+                    utils.get_peer_id(types.PeerChannel(id))):
+            row = self._entities.get(pid)
+            if row:
+                return row[0], row[1]
+        return None
+
+    def _find(self, index: int, value):
+        for row in self._entities.values():
+            if row[index] == value:
+                return row[0], row[1]
+        return None
+
+    def get_entity_rows_by_username(self, username):
+        return self._find(2, username)
+
+    def get_entity_rows_by_phone(self, phone):
+        return self._find(3, phone)
+
+    def get_entity_rows_by_name(self, name):
+        return self._find(4, name)
+
+    # --- Знімки ---
+
+    def encode(self) -> bytes:
+        """Знімок сесії в JSON: DC, ключ авторизації, сутності, стан оновлень."""
+        key = self._auth_key.key if self._auth_key and self._auth_key.key else None
+        return json.dumps({
+            'dc_id': self._dc_id,
+            'server_address': self._server_address,
+            'port': self._port,
+            'auth_key': base64.b64encode(key).decode() if key else None,
+            'takeout_id': self._takeout_id,
+            'entities': list(self._entities.values()),
+            'update_states': {
+                str(eid): [s.pts, s.qts, s.date.timestamp(), s.seq, s.unread_count]
+                for eid, s in self._update_states.items()
+            },
+        }, ensure_ascii=False).encode()
+
+    def snapshot(self) -> None:
+        self._dirty = self._urgent = False
+        self._last_snapshot = time.monotonic()
+        self.snapshots += 1
+        self._write(self.encode())
+
+    def save(self) -> None:
+        """Telethon викликає save() часто; пишемо лише термінове або раз на interval."""
+        if self._urgent or (self._dirty and time.monotonic() - self._last_snapshot >= self.interval):
+            self.snapshot()
+
+    def close(self) -> None:
+        if self._dirty or self._urgent:
+            self.snapshot()
+
+    def delete(self) -> None:
+        # Вихід з акаунта (log_out): ключ більше не дійсний
+        self._auth_key = None
+        self._entities.clear()
+        self._update_states.clear()
+        self.snapshot()
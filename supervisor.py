@@ -0,0 +1,174 @@
+# supervisor.py
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+HEALTH_DIR = os.path.join('data', 'workers')
+STATUS_PATH = os.path.join(HEALTH_DIR, 'status.json')
+
+
+def health_path(shard: int) -> str:
+    return os.path.join(HEALTH_DIR, f'worker_{shard}.json')
+
+
+def write_json(path: str, data) -> None:
+    """Атомарний запис: читач ніколи не побачить половину файлу."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def read_json(path: str, default=None):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+class _Worker:
+    __slots__ = ('shard', 'proc', 'started', 'restarts', 'last_exit', 'backoff', 'restart_at')
+
+    def __init__(self, shard: int) -> None:
+        self.shard = shard
+        self.proc: subprocess.Popen | None = None
+        self.started = 0.0
+        self.restarts = 0
+        self.last_exit: int | None = None
+        self.backoff = 0.0
+        self.restart_at = 0.0
+
+
+class Supervisor:
+    """
+    Розподіляє акаунти між N процесами-воркерами (кожен — окремий event loop).
+    Воркер — той самий main.py з WORKER_SHARD/WORKER_COUNT у середовищі:
+    він бере акаунти з індексом i % WORKER_COUNT == WORKER_SHARD.
+
+    SIGTERM/SIGINT пересилаються воркерам (вони зберігають стан як звичайно),
+    воркер, що впав, перезапускається з наростаючою паузою, а стан усіх
+    воркерів збирається в data/workers/status.json.
+    """
+
+    def __init__(self, workers: int, argv: list[str], restart_base: float = 5.0,
+                 restart_max: float = 300.0, interval: float = 30.0, grace: float = 30.0) -> None:
+        self.argv = argv
+        self.restart_base = restart_base
+        self.restart_max = restart_max
+        self.interval = interval
+        self.grace = grace
+        self.workers = [_Worker(i) for i in range(workers)]
+        self._stopping: signal.Signals | None = None
+
+    def _log(self, msg: str) -> None:
+        print(f"[SUPERVISOR] {msg}", flush=True)
+
+    def _spawn(self, w: _Worker) -> None:
+        env = dict(os.environ, WORKER_SHARD=str(w.shard), WORKER_COUNT=str(len(self.workers)),
+                   PROCESS_WORKERS='1')
+        w.proc = subprocess.Popen(self.argv, env=env)
+        w.started = time.monotonic()
+        self._log(f"Воркер {w.shard} запущено (pid {w.proc.pid})")
+
+    def _on_signal(self, signum, frame) -> None:
+        sig = signal.Signals(signum)
+        if self._stopping is None:
+            self._log(f"{sig.name}, зупиняємо воркери...")
+        self._stopping = sig
+        for w in self.workers:
+            if w.proc and w.proc.poll() is None:
+                w.proc.send_signal(signum)
+
+    def _reap(self, w: _Worker) -> None:
+        code = w.proc.poll()
+        if code is None:
+            return
+        w.last_exit = code
+        w.proc = None
+        if code == 0:
+            # Штатний вихід (наприклад, на воркер не припало акаунтів) — не перезапускаємо
+            self._log(f"Воркер {w.shard} завершився")
+            return
+        # Якщо воркер падає одразу після старту — подвоюємо паузу, інакше починаємо спочатку
+        uptime = time.monotonic() - w.started
+        w.backoff = self.restart_base if uptime > self.restart_max else min(
+            self.restart_max, max(self.restart_base, w.backoff * 2))
+        w.restart_at = time.monotonic() + w.backoff
+        self._log(f"[ERROR] Воркер {w.shard} впав (код {code}), перезапуск через {w.backoff:.0f}с")
+
+    def status(self) -> dict:
+        """Зведений стан: процеси воркерів + їхні звіти про акаунти."""
+        now = time.time()
+        workers = []
+        for w in self.workers:
+            health = read_json(health_path(w.shard), {})
+            workers.append({
+                'shard': w.shard,
+                'pid': w.proc.pid if w.proc else None,
+                'alive': w.proc is not None and w.proc.poll() is None,
+                'restarts': w.restarts,
+                'last_exit': w.last_exit,
+                'health_age_s': round(now - health['ts'], 1) if 'ts' in health else None,
+                'accounts': health.get('accounts', {}),
+            })
+        return {'ts': now, 'workers': workers}
+
+    def _report(self) -> None:
+        st = self.status()
+        write_json(STATUS_PATH, st)
+        alive = sum(w['alive'] for w in st['workers'])
+        accounts = [a for w in st['workers'] for a in w['accounts'].values()]
+        running = sum(a.get('state') == 'running' for a in accounts)
+        restarts = sum(w['restarts'] for w in st['workers'])
+        self._log(f"Воркери {alive}/{len(st['workers'])} · акаунти {running}/{len(accounts)} running"
+                  f" · перезапусків {restarts}")
+
+    def run(self) -> int:
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, self._on_signal)
+        for w in self.workers:
+            self._spawn(w)
+
+        next_report = time.monotonic() + self.interval
+        while self._stopping is None:
+            time.sleep(1)
+            now = time.monotonic()
+            for w in self.workers:
+                if w.proc is not None:
+                    self._reap(w)
+                elif w.last_exit and now >= w.restart_at and self._stopping is None:
+                    w.restarts += 1
+                    self._spawn(w)
+            if now >= next_report:
+                self._report()
+                next_report = now + self.interval
+            if all(w.proc is None and not w.last_exit for w in self.workers):
+                break
+
+        # Чекаємо штатного завершення воркерів, потім — SIGKILL
+        deadline = time.monotonic() + self.grace
+        for w in self.workers:
+            if w.proc is None:
+                continue
+            try:
+                w.proc.wait(timeout=max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                self._log(f"[ERROR] Воркер {w.shard} не завершився за {self.grace:.0f}с, SIGKILL")
+                w.proc.kill()
+                w.proc.wait()
+        self._report()
+        self._log("Виходимо")
+        return 0
+
+
+def run(workers: int) -> int:
+    argv = [sys.executable, '-u', os.path.abspath(sys.argv[0])]
+    return Supervisor(workers, argv,
+                      restart_base=float(os.getenv('WORKER_RESTART_BASE', '5')),
+                      restart_max=float(os.getenv('WORKER_RESTART_MAX', '300')),
+                      interval=float(os.getenv('WORKER_HEALTH_SEC', '30'))).run()
@@ -0,0 +1,83 @@
+"""
+Акаунт у віртуальному часі (benchmarks/sim.py): годинники підмінені разом,
+тож планувальник не повинен бачити стрибків, а відправлення — йти за розкладом.
+
+    python -m pytest -q tests
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from sim import FakeClient, VirtualClock, run_virtual  # noqa: E402
+
+
+def _run(clock: VirtualClock, scenario):
+    import event_log
+    try:
+        return run_virtual(scenario, clock)
+    finally:
+        event_log.close_writer()
+
+
+def test_no_clock_jumps_under_virtual_clock(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    import main
+    from schedule import Schedule
+
+    client = FakeClient(latency=0.05)
+
+    async def scenario():
+        acc = main.Account('sim', 0, '', '', client=client)
+        await acc.start()
+        assert acc.scheduler._clock() == main.time.time()
+        await acc.create_task(5, 'hello', 10, Schedule(600))
+        await asyncio.sleep(1790)
+        jumps = acc.metrics.total('userbot_clock_jumps_total')
+        await acc.stop()
+        await acc.db.close()
+        return jumps
+
+    assert _run(VirtualClock(), scenario) == 0
+    # 0, 600, 1200 с
+    assert _task_sends(client) == 3
+
+
+def test_restart_catches_up_in_virtual_time(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    import main
+    from schedule import Schedule
+
+    clock = VirtualClock()
+    first = FakeClient(latency=0.05)
+
+    async def before():
+        acc = main.Account('sim', 0, '', '', client=first)
+        await acc.start()
+        await acc.create_task(5, 'hello', 10, Schedule(600))
+        await asyncio.sleep(10)
+        await acc.stop()
+        await acc.db.close()
+
+    _run(clock, before)
+    # Простій: пропущено кілька відправлень, політика one надсилає одне одразу
+    clock.advance(3600)
+    second = FakeClient(latency=0.05)
+
+    async def after():
+        acc = main.Account('sim', 0, '', '', client=second)
+        await acc.start()
+        await asyncio.sleep(60)
+        jumps = acc.metrics.total('userbot_clock_jumps_total')
+        await acc.stop()
+        await acc.db.close()
+        return jumps
+
+    assert _run(clock, after) == 0
+    assert _task_sends(second) == 1
+
+
+def _task_sends(client: FakeClient) -> int:
+    """Відправлення розсилки в чат 5, без повідомлень лог-чату."""
+    return sum(1 for kind, _, peer, _ in client.calls if kind == 'send' and peer == 5)
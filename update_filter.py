@@ -0,0 +1,47 @@
+# update_filter.py
+from telethon import TelegramClient
+from telethon.tl import types
+
+# Оновлення, на які підписаний EntityCache (events.Raw)
+_PEER_UPDATES = (types.UpdateUserName, types.UpdateUser, types.UpdateChannel, types.UpdateChat)
+_NEW_MESSAGE = (types.UpdateNewMessage, types.UpdateNewChannelMessage)
+_SHORT_MESSAGE = (types.UpdateShortMessage, types.UpdateShortChatMessage)
+
+
+def is_relevant(update) -> bool:
+    """
+    Чи потрібне оновлення обробникам бота: вихідні повідомлення (команди),
+    зміна назви чату (EntityCache) і зміни користувачів/чатів.
+    """
+    if isinstance(update, _NEW_MESSAGE):
+        m = update.message
+        if isinstance(m, types.Message):
+            return m.out
+        return isinstance(m, types.MessageService) and isinstance(m.action, types.MessageActionChatEditTitle)
+    if isinstance(update, _SHORT_MESSAGE):
+        return update.out
+    return isinstance(update, _PEER_UPDATES)
+
+
+class OutgoingOnlyClient(TelegramClient):
+    """
+    TelegramClient, що відкидає непотрібні оновлення одразу після MessageBox.
+    pts/qts і розриви послідовності MessageBox відстежує як завжди, але
+    відкинуті оновлення не стають задачами _dispatch_update, а користувачі
+    з них не потрапляють у кеш сутностей і далі в сесію.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.updates_seen = 0
+        self.updates_dropped = 0
+
+    def _preprocess_updates(self, updates, users, chats):
+        kept = [u for u in updates if is_relevant(u)]
+        self.updates_seen += len(updates)
+        self.updates_dropped += len(updates) - len(kept)
+        if not kept:
+            # access_hash каналів потрібен MessageBox для getChannelDifference
+            self._mb_entity_cache.extend((), chats)
+            return kept
+        return super()._preprocess_updates(kept, users, chats)